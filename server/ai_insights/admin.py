@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import Insight
 
-# Register your models here.
+
+@admin.register(Insight)
+class InsightAdmin(admin.ModelAdmin):
+    """Admin configuration for Insight model"""
+    list_display = ('user', 'backend', 'generated_at', 'updated_at')
+    list_filter = ('backend',)
+    search_fields = ('user__email',)
+    readonly_fields = ('user', 'text', 'features', 'fingerprint', 'source_version', 'backend', 'generated_at', 'updated_at')
@@ -0,0 +1,67 @@
+"""
+Language model backends. `AI_INSIGHTS_BACKEND` selects one by dotted
+path; by default Gemini is used when GEMINI_API_KEY is set and the local
+stub otherwise (development, tests).
+"""
+import json
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+PROMPT = """Tu es un conseiller financier bienveillant.
+Voici le résumé des finances d'un utilisateur (montants en {currency}) :
+{features}
+Donne un seul conseil court et encourageant (2 phrases maximum) sur ses habitudes
+de dépenses ou ses économies possibles. Réponds dans la langue « {language} »."""
+
+
+class BaseBackend:
+    name = 'base'
+
+    def generate(self, features):
+        """Return the insight text for a feature summary"""
+        raise NotImplementedError
+
+
+class StubBackend(BaseBackend):
+    """Deterministic text built from the features, without any network call"""
+    name = 'stub'
+
+    def generate(self, features):
+        if features['anomalies']:
+            anomaly = features['anomalies'][0]
+            return (
+                f"Vos dépenses « {anomaly['category']} » ont atteint {anomaly['amount']:.2f} "
+                f"{features['currency']} le mois dernier, contre {anomaly['usual']:.2f} habituellement."
+            )
+        if features['top_categories']:
+            top = features['top_categories'][0]
+            return f"« {top['category']} » représente {top['share']:.0f} % de vos dépenses du mois dernier."
+        return "Continuez à enregistrer vos transactions pour recevoir des conseils personnalisés."
+
+
+class GeminiBackend(BaseBackend):
+    name = 'gemini'
+
+    def __init__(self):
+        # Optional dependency, only needed when this backend is used
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+
+    def generate(self, features):
+        prompt = PROMPT.format(
+            currency=features['currency'],
+            language=features['language'],
+            features=json.dumps(features, ensure_ascii=False),
+        )
+        response = self.model.generate_content(prompt, request_options={'timeout': 30})
+        return response.text.strip()
+
+
+def get_backend():
+    path = settings.AI_INSIGHTS_BACKEND
+    if not path:
+        path = 'ai_insights.backends.GeminiBackend' if settings.GEMINI_API_KEY else 'ai_insights.backends.StubBackend'
+    return import_string(path)()
@@ -0,0 +1,106 @@
+"""
+Compact per-user feature summary sent to the language model.
+
+Everything is read from the monthly rollups, so the cost does not depend
+on the number of transactions, and the summary holds a few dozen numbers
+instead of the raw history.
+"""
+import hashlib
+import json
+from decimal import Decimal
+
+from analytics import services
+
+TREND_MONTHS = 6
+TOP_CATEGORIES = 5
+# A category is anomalous when last month exceeds its usual level by this ratio...
+ANOMALY_RATIO = Decimal('1.5')
+# ...and by at least this amount
+ANOMALY_MIN_DELTA = 50
+
+
+def rounded(value):
+    return round(float(value), 2)
+
+
+def build_features(user, today_month=None):
+    """
+    Month-to-date totals, the income/expense trend, the top expense
+    categories of the last complete month and the categories that grew
+    abnormally compared with the three months before.
+    """
+    current = today_month or services.month_start()
+    last = services.shift_month(current, -1)
+    reference_start = services.shift_month(last, -3)
+
+    month_to_date = services.monthly_totals(user, current)
+    trend = services.trend_series(user, TREND_MONTHS, end_month=last)
+    last_month = services.category_breakdown(user, last, current)
+    reference = {
+        row['category']: row['total'] / 3
+        for row in services.category_breakdown(user, reference_start, last)
+    }
+
+    anomalies = []
+    for row in last_month:
+        usual = reference.get(row['category'], 0)
+        if row['total'] - usual >= ANOMALY_MIN_DELTA and row['total'] >= usual * ANOMALY_RATIO:
+            anomalies.append({
+                'category': row['category'],
+                'amount': rounded(row['total']),
+                'usual': rounded(usual),
+            })
+
+    income = sum(point['income'] for point in trend)
+    expense = sum(point['expense'] for point in trend)
+    return {
+        'currency': user.currency,
+        'language': user.language,
+        'month_to_date': {
+            'month': current.date().isoformat(),
+            'income': rounded(month_to_date['income']),
+            'expense': rounded(month_to_date['expense']),
+        },
+        'trend': [
+            {
+                'month': point['month'].isoformat(),
+                'income': rounded(point['income']),
+                'expense': rounded(point['expense']),
+            }
+            for point in trend
+        ],
+        'savings_rate': round(float((income - expense) / income * 100), 1) if income else None,
+        'top_categories': [
+            {'category': row['category'], 'amount': rounded(row['total']), 'share': round(row['share'], 1)}
+            for row in last_month[:TOP_CATEGORIES]
+        ],
+        'anomalies': anomalies,
+    }
+
+
+def material(features):
+    """
+    The part of the features that should change the advice: amounts to
+    the nearest 10, percentages to the unit, and only the month of the
+    month-to-date totals (they grow with every purchase). Day-to-day
+    movements keep the same fingerprint and never trigger a new generation.
+    """
+    def coarse(value):
+        if isinstance(value, float):
+            return round(value / 10) * 10
+        if isinstance(value, dict):
+            return {key: coarse(item) for key, item in value.items() if key != 'share'}
+        if isinstance(value, list):
+            return [coarse(item) for item in value]
+        return value
+
+    summary = coarse(features)
+    summary['month_to_date'] = features['month_to_date']['month']
+    if features.get('savings_rate') is not None:
+        summary['savings_rate'] = round(features['savings_rate'])
+    return summary
+
+
+def fingerprint(features):
+    payload = json.dumps(material(features), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -0,0 +1,7 @@
+from core import jobs
+from .services import REFRESH_JOB, refresh_insight
+
+
+@jobs.register(REFRESH_JOB)
+def refresh(payload):
+    return refresh_insight(payload['user_id'], payload.get('version'), payload.get('force', False))
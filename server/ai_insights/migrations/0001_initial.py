@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Insight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True, default='', verbose_name='Conseil')),
+                ('features', models.JSONField(blank=True, default=dict, verbose_name='Résumé analysé')),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=64, verbose_name='Empreinte du résumé')),
+                ('source_version', models.BigIntegerField(blank=True, help_text='Version du cache utilisateur au moment du dernier rafraîchissement', null=True, verbose_name='Version des données')),
+                ('backend', models.CharField(blank=True, default='', max_length=50, verbose_name='Moteur')),
+                ('generated_at', models.DateTimeField(blank=True, null=True, verbose_name='Généré le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='insight', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Conseil IA',
+                'verbose_name_plural': 'Conseils IA',
+            },
+        ),
+    ]
@@ -1,3 +1,35 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class Insight(models.Model):
+    """
+    Latest AI-generated insight of a user, with the feature summary it was
+    generated from. Refreshed in the background by the job queue; reading
+    it is a single lookup on the unique user index.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='insight',
+        verbose_name="Utilisateur"
+    )
+    text = models.TextField(blank=True, default='', verbose_name="Conseil")
+    features = models.JSONField(default=dict, blank=True, verbose_name="Résumé analysé")
+    fingerprint = models.CharField(max_length=64, blank=True, default='', verbose_name="Empreinte du résumé")
+    source_version = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Version des données",
+        help_text="Version du cache utilisateur au moment du dernier rafraîchissement"
+    )
+    backend = models.CharField(max_length=50, blank=True, default='', verbose_name="Moteur")
+    generated_at = models.DateTimeField(null=True, blank=True, verbose_name="Généré le")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    class Meta:
+        verbose_name = "Conseil IA"
+        verbose_name_plural = "Conseils IA"
+
+    def __str__(self):
+        return f"{self.user} - {self.generated_at}"
@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import Insight
+
+
+class InsightSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Insight
+        fields = ('text', 'features', 'backend', 'generated_at')
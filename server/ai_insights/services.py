@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core import jobs
+from .backends import get_backend
+from .features import build_features, fingerprint
+from .models import Insight
+
+REFRESH_JOB = 'ai_insights.refresh'
+
+
+def request_refresh(user_id, version, force=False):
+    """Queue a background refresh; at most one is pending per user"""
+    return jobs.enqueue(
+        REFRESH_JOB,
+        {'user_id': user_id, 'version': version, 'force': force},
+        key=f'{REFRESH_JOB}:{user_id}',
+    )
+
+
+def refresh_insight(user_id, version=None, force=False):
+    """
+    Recompute the user's feature summary and call the language model only
+    if its fingerprint changed (or when forced). Runs in the worker.
+    """
+    user = get_user_model().objects.get(pk=user_id)
+    features = build_features(user)
+    features_fingerprint = fingerprint(features)
+    insight, _ = Insight.objects.get_or_create(user=user)
+
+    generated = force or not insight.text or features_fingerprint != insight.fingerprint
+    if generated:
+        backend = get_backend()
+        insight.text = backend.generate(features)
+        insight.backend = backend.name
+        insight.generated_at = timezone.now()
+    insight.features = features
+    insight.fingerprint = features_fingerprint
+    insight.source_version = version
+    insight.save()
+    return {'generated': generated}
@@ -1,3 +1,101 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from analytics.services import month_start, shift_month
+from authentication.models import User
+from core import jobs
+from core.models import Job
+from transactions.categories import category_for
+from transactions.models import Transaction
+from wallets.models import Wallet
+from .backends import StubBackend
+from .features import build_features, fingerprint
+from .models import Insight
+
+
+class CountingBackend(StubBackend):
+    calls = 0
+
+    def generate(self, features):
+        CountingBackend.calls += 1
+        return super().generate(features)
+
+
+@override_settings(AI_INSIGHTS_BACKEND='ai_insights.tests.CountingBackend')
+class InsightTests(TestCase):
+    url = '/api/ai/insights/'
+
+    def setUp(self):
+        cache.clear()
+        CountingBackend.calls = 0
+        self.user = User.objects.create_user(
+            username='user@monely.test', email='user@monely.test', password='MonelyPass123!', name='Test'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.last_month = shift_month(month_start(), -1)
+        for months_ago in range(1, 5):
+            self.spend(shift_month(month_start(), -months_ago), 'Courses', '200')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def spend(self, month, category, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=self.user, wallet=self.wallet, name=category, amount=Decimal(amount),
+                type='expense', category=category_for(self.user, category), date=month.replace(day=10),
+            )
+
+    def test_features_and_anomalies(self):
+        self.spend(self.last_month, 'Restaurants', '300')
+        features = build_features(self.user)
+        self.assertEqual(features['top_categories'][0], {'category': 'Restaurants', 'amount': 300.0, 'share': 60.0})
+        self.assertEqual(features['anomalies'], [{'category': 'Restaurants', 'amount': 300.0, 'usual': 0.0}])
+        self.assertEqual(len(features['trend']), 6)
+
+    def test_fingerprint_ignores_small_changes(self):
+        before = fingerprint(build_features(self.user))
+        self.spend(self.last_month, 'Courses', '2')
+        self.assertEqual(fingerprint(build_features(self.user)), before)
+        self.spend(self.last_month, 'Courses', '150')
+        self.assertNotEqual(fingerprint(build_features(self.user)), before)
+
+    def test_refresh_in_background(self):
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['status'], response.data['stale']), ('pending', True))
+        # A second read does not queue a second refresh
+        self.client.get(self.url)
+        self.assertEqual(Job.objects.filter(status='queued').count(), 1)
+
+        jobs.run_pending('worker')
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual((response.data['status'], response.data['stale']), ('ready', False))
+        self.assertTrue(response.data['text'])
+        self.assertEqual(CountingBackend.calls, 1)
+
+    def test_model_called_only_on_material_change(self):
+        self.client.get(self.url)
+        jobs.run_pending('worker')
+
+        # New data, same material summary: refreshed without calling the model
+        self.spend(self.last_month, 'Courses', '1')
+        self.assertTrue(self.client.get(self.url).data['stale'])
+        jobs.run_pending('worker')
+        self.assertFalse(self.client.get(self.url).data['stale'])
+        self.assertEqual(CountingBackend.calls, 1)
+
+        self.spend(self.last_month, 'Restaurants', '400')
+        self.client.get(self.url)
+        jobs.run_pending('worker')
+        self.assertEqual(CountingBackend.calls, 2)
+        self.assertIn('Restaurants', Insight.objects.get(user=self.user).text)
+
+    def test_forced_refresh(self):
+        self.client.get(self.url)
+        jobs.run_pending('worker')
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+        jobs.run_pending('worker')
+        self.assertEqual(CountingBackend.calls, 2)
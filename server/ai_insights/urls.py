@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import InsightView
+
+urlpatterns = [
+    path('insights/', InsightView.as_view(), name='ai_insights'),
+]
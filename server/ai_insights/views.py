@@ -1,3 +1,38 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from core.cache import get_user_version
+from . import services
+from .models import Insight
+from .serializers import InsightSerializer
+
+
+class InsightView(APIView):
+    """
+    GET returns the stored insight with one indexed read. When the user's
+    data changed since it was computed (their cache version moved), a
+    background refresh is queued and `stale` is true; the model is only
+    called again if the feature summary changed materially.
+    POST forces a new generation in the background.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        version, _ = get_user_version(request.user.pk)
+        insight = Insight.objects.filter(user=request.user).first()
+        stale = insight is None or insight.source_version != version
+        if stale:
+            services.request_refresh(request.user.pk, version)
+
+        data = InsightSerializer(insight).data if insight else {
+            'text': '', 'features': {}, 'backend': '', 'generated_at': None,
+        }
+        data['status'] = 'ready' if insight and insight.text else 'pending'
+        data['stale'] = stale
+        return Response(data)
+
+    def post(self, request):
+        version, _ = get_user_version(request.user.pk)
+        services.request_refresh(request.user.pk, version, force=True)
+        return Response({'status': 'pending'}, status=status.HTTP_202_ACCEPTED)
@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import MonthlyRollup
 
-# Register your models here.
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    """Admin configuration for MonthlyRollup model"""
+    list_display = ('month', 'user', 'wallet', 'category', 'type', 'total', 'count')
+    list_filter = ('type', 'month')
+    search_fields = ('user__email', 'category__name')
+    ordering = ('-month',)
+    readonly_fields = ('user', 'wallet', 'month', 'category', 'type', 'total', 'count')
+
+    def get_queryset(self, request):
+        """Optimize queryset with select_related"""
+        qs = super().get_queryset(request)
+        return qs.select_related('user', 'wallet', 'category')
@@ -0,0 +1,208 @@
+"""
+Balance history of the wallets and of the total net worth.
+
+Only the current balance is stored, so the balance at the end of a period
+is the current one minus every flow recorded after that period. Flows are
+aggregated per wallet and period in the database (the monthly rollups for
+monthly periods, a GROUP BY on the truncated date otherwise) and the
+series is rebuilt by walking back from the current balance. Whatever the
+length of the history, at most `points` points are returned.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Q, Sum, When
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+
+from transactions.models import Transaction
+from wallets.models import Wallet
+from wallets.rates import Converter
+from .services import ZERO, user_rollups
+
+GRANULARITIES = ('auto', 'daily', 'weekly', 'monthly')
+DEFAULT_POINTS = 60
+# Periods built before downsampling: ten years of days
+MAX_PERIODS = 3660
+# SQLite sums decimals as floats: flows are rounded back to the cent
+CENT = Decimal('0.01')
+
+
+class HistoryRangeError(ValueError):
+    """Raised when the range holds more than MAX_PERIODS periods of the granularity"""
+
+
+def period_start(day, granularity):
+    if granularity == 'daily':
+        return day
+    if granularity == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period(start, granularity):
+    if granularity == 'daily':
+        return start + timedelta(days=1)
+    if granularity == 'weekly':
+        return start + timedelta(days=7)
+    index = start.year * 12 + start.month
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def periods(date_from, date_to, granularity):
+    """Start dates of the periods covering [date_from, date_to]"""
+    starts = []
+    start = period_start(date_from, granularity)
+    while start <= date_to:
+        starts.append(start)
+        start = next_period(start, granularity)
+    return starts
+
+
+def period_count(date_from, date_to, granularity):
+    """len(periods(...)), without building them"""
+    start = period_start(date_from, granularity)
+    if granularity == 'daily':
+        return (date_to - start).days + 1
+    if granularity == 'weekly':
+        return (date_to - start).days // 7 + 1
+    return (date_to.year - start.year) * 12 + date_to.month - start.month + 1
+
+
+def pick_granularity(date_from, date_to, points):
+    """Finest granularity giving at most `points` periods"""
+    for granularity in ('daily', 'weekly'):
+        if period_count(date_from, date_to, granularity) <= points:
+            return granularity
+    return 'monthly'
+
+
+def rollup_flows(user, start, wallet_ids):
+    """Net flow per (wallet, month) from `start` on, read from the monthly rollups"""
+    signed = Case(
+        When(type__in=('income', 'transfer_in'), then=F('total')),
+        default=-F('total'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    rows = (
+        user_rollups(user).filter(month__gte=start, wallet__in=wallet_ids)
+        .values('wallet', 'month')
+        .annotate(net=Sum(signed))
+    )
+    return {(row['wallet'], row['month']): row['net'].quantize(CENT) for row in rows}
+
+
+def transaction_flows(user, start, wallet_ids, granularity):
+    """Net flow per (wallet, day or week) from `start` on, grouped by the database"""
+    tz = timezone.get_current_timezone()
+    trunc = TruncDay if granularity == 'daily' else TruncWeek
+    since = timezone.make_aware(datetime.combine(start, time.min), tz)
+    base = Transaction.objects.filter(user=user, date__gte=since).order_by().annotate(
+        period=trunc('date', tzinfo=tz)
+    )
+    outgoing = Case(
+        When(type='income', then=F('amount')),
+        When(Q(type='expense') | Q(type='transfer', receiver_wallet__isnull=False), then=-F('amount')),
+        default=ZERO,
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    sides = (
+        base.filter(wallet__in=wallet_ids)
+        .values('wallet', 'period').annotate(net=Sum(outgoing)),
+        base.filter(type='transfer', receiver_wallet__in=wallet_ids)
+        .values('receiver_wallet', 'period').annotate(net=Sum('amount')),
+    )
+    flows = {}
+    for rows, wallet_field in zip(sides, ('wallet', 'receiver_wallet')):
+        for row in rows:
+            key = (row[wallet_field], timezone.localtime(row['period'], tz).date())
+            flows[key] = flows.get(key, ZERO) + row['net'].quantize(CENT)
+    return flows
+
+
+def downsample(count, points):
+    """Indices of at most `points` evenly spaced items, first and last included"""
+    if count <= points:
+        return list(range(count))
+    if points == 1:
+        return [count - 1]
+    return sorted({round(i * (count - 1) / (points - 1)) for i in range(points)})
+
+
+def balance_history(user, date_from=None, date_to=None, granularity='auto', wallet=None,
+                    points=DEFAULT_POINTS):
+    """
+    Closing balance of each period between `date_from` (default: first
+    transaction) and `date_to` (default: today), per wallet in its own
+    currency and in total in the user's currency, at each date's rate.
+    """
+    date_to = date_to or timezone.localdate()
+    if date_from is None:
+        first = Transaction.objects.filter(user=user).order_by('date').values_list('date', flat=True).first()
+        date_from = min(timezone.localdate(first), date_to) if first else date_to
+    if granularity == 'auto':
+        granularity = pick_granularity(date_from, date_to, points)
+    if period_count(date_from, date_to, granularity) > MAX_PERIODS:
+        raise HistoryRangeError(f"Au plus {MAX_PERIODS} périodes : réduire la plage ou élargir la granularité.")
+
+    wallets = Wallet.objects.filter(user=user).order_by('id')
+    if wallet is not None:
+        wallets = wallets.filter(pk=wallet)
+    wallets = list(wallets.only('id', 'name', 'currency', 'balance'))
+    wallet_ids = [item.pk for item in wallets]
+
+    starts = periods(date_from, date_to, granularity)
+    if granularity == 'monthly':
+        flows = rollup_flows(user, starts[0], wallet_ids)
+    else:
+        flows = transaction_flows(user, starts[0], wallet_ids, granularity)
+
+    # Flows after the last period (including future-dated ones) come off first
+    last_end = next_period(starts[-1], granularity)
+    after = {wallet_id: ZERO for wallet_id in wallet_ids}
+    by_period = {}
+    for (wallet_id, start), net in flows.items():
+        if start >= last_end:
+            after[wallet_id] += net
+        else:
+            by_period.setdefault(start, {})
+            by_period[start][wallet_id] = by_period[start].get(wallet_id, ZERO) + net
+
+    # Walk back from the current balances: the closing balance of a period
+    # is the opening balance of the next one
+    closing = {item.pk: item.balance - after[item.pk] for item in wallets}
+    balances = []
+    for start in reversed(starts):
+        balances.append(dict(closing))
+        for wallet_id, net in by_period.get(start, {}).items():
+            closing[wallet_id] -= net
+    balances.reverse()
+
+    kept = downsample(len(starts), points)
+    dates = [min(next_period(starts[i], granularity) - timedelta(days=1), date_to) for i in kept]
+    converter = Converter(user.currency)
+    return {
+        'granularity': granularity,
+        'date_from': date_from,
+        'date_to': date_to,
+        'currency': user.currency,
+        'results': [
+            {
+                'date': day,
+                'balance': converter.total(((item.currency, balances[i][item.pk]) for item in wallets), day),
+            }
+            for day, i in zip(dates, kept)
+        ],
+        'wallets': [
+            {
+                'id': item.pk,
+                'name': item.name,
+                'currency': item.currency,
+                'results': [
+                    {'date': day, 'balance': balances[i][item.pk]}
+                    for day, i in zip(dates, kept)
+                ],
+            }
+            for item in wallets
+        ],
+    }
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from analytics.models import MonthlyRollup
+from analytics.rollups import compute_from_transactions
+from transactions.models import Transaction
+from wallets.models import Budget, Wallet
+from wallets.budgets import refresh_budget
+from wallets.stats import refresh_wallet_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the monthly analytics rollups and the wallet statistics from raw transactions, "
+        "or check the rollups with --check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only process this user id")
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Compare the stored rollups with the raw transactions without writing"
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['user']:
+            users = users.filter(pk=options['user'])
+
+        mismatched_users = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            if options['check']:
+                expected = compute_from_transactions(Transaction.objects.filter(user_id=user_id))
+                mismatches = self.compare(user_id, expected)
+                if mismatches:
+                    mismatched_users += 1
+                    for key, stored, wanted in mismatches:
+                        self.stdout.write(f"user={user_id} {key}: stored={stored} expected={wanted}")
+            else:
+                self.rebuild(user_id)
+
+        if options['check']:
+            if mismatched_users:
+                raise CommandError(f"{mismatched_users} utilisateur(s) avec des agrégats incohérents.")
+            self.stdout.write(self.style.SUCCESS("Agrégats cohérents."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Agrégats reconstruits."))
+
+    def rebuild(self, user_id):
+        """
+        Replace the user's rollups. The ledger updates the wallet rows of
+        every write: with them locked, no write lands between reading the
+        transactions and replacing the rows.
+        """
+        with transaction.atomic():
+            list(Wallet.objects.select_for_update().filter(user_id=user_id).values_list('pk', flat=True))
+            expected = compute_from_transactions(Transaction.objects.filter(user_id=user_id))
+            MonthlyRollup.objects.filter(user_id=user_id).delete()
+            MonthlyRollup.objects.bulk_create(
+                [
+                    MonthlyRollup(
+                        user_id=key[0], wallet_id=key[1], month=key[2], category_id=key[3],
+                        type=key[4], total=total, count=count,
+                    )
+                    for key, (total, count) in expected.items()
+                ],
+                batch_size=1000,
+            )
+            refresh_wallet_stats(Wallet.objects.filter(user_id=user_id))
+            for budget in Budget.objects.filter(user_id=user_id):
+                refresh_budget(budget)
+
+    def compare(self, user_id, expected):
+        stored = {
+            (row.user_id, row.wallet_id, row.month, row.category_id, row.type): (row.total, row.count)
+            for row in MonthlyRollup.objects.filter(user_id=user_id).exclude(count=0, total=0)
+        }
+        return [
+            (key, stored.get(key), expected.get(key))
+            for key in sorted(set(stored) | set(expected), key=str)
+            if stored.get(key) != expected.get(key)
+        ]
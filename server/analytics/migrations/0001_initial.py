@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wallets', '0003_alter_wallet_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mois')),
+                ('category', models.CharField(max_length=100, verbose_name='Catégorie')),
+                ('type', models.CharField(choices=[('income', 'Revenu'), ('expense', 'Dépense'), ('transfer_out', 'Transfert sortant'), ('transfer_in', 'Transfert entrant')], max_length=12, verbose_name='Type')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('count', models.IntegerField(default=0, verbose_name='Nombre de transactions')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='wallets.wallet', verbose_name='Portefeuille')),
+            ],
+            options={
+                'verbose_name': 'Agrégat mensuel',
+                'verbose_name_plural': 'Agrégats mensuels',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['user', 'month'], name='analytics_m_user_id_ad3db0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'wallet', 'month', 'category', 'type'), name='unique_monthly_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from analytics.rollups import compute_from_transactions
+
+
+def backfill(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyRollup = apps.get_model('analytics', 'MonthlyRollup')
+    expected = compute_from_transactions(Transaction.objects.all())
+    MonthlyRollup.objects.bulk_create(
+        [
+            MonthlyRollup(
+                user_id=key[0], wallet_id=key[1], month=key[2], category=key[3],
+                type=key[4], total=total, count=count,
+            )
+            for key, (total, count) in expected.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('transactions', '0002_transaction_receiver_wallet_alter_transaction_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from analytics.rollups import compute_from_transactions
+
+
+def clear(apps, schema_editor):
+    apps.get_model('analytics', 'MonthlyRollup').objects.using(schema_editor.connection.alias).delete()
+
+
+def backfill(apps, schema_editor):
+    """Recompute the rollups per category id; same as 0002_backfill_monthly_rollups"""
+    db = schema_editor.connection.alias
+    Transaction = apps.get_model('transactions', 'Transaction')
+    MonthlyRollup = apps.get_model('analytics', 'MonthlyRollup')
+    expected = compute_from_transactions(Transaction.objects.using(db).all())
+    MonthlyRollup.objects.using(db).bulk_create(
+        [
+            MonthlyRollup(
+                user_id=key[0], wallet_id=key[1], month=key[2], category_id=key[3],
+                type=key[4], total=total, count=count,
+            )
+            for key, (total, count) in expected.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_backfill_monthly_rollups'),
+        ('transactions', '0007_category'),
+    ]
+
+    # Rollups are rebuilt from the transactions rather than converted, so
+    # names merged by 0007_category merge their rollups too. Migrating back
+    # leaves them empty: run `manage.py rebuild_rollups` afterwards.
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='monthlyrollup',
+            name='unique_monthly_rollup',
+        ),
+        migrations.RunPython(clear, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='monthlyrollup',
+            name='category',
+        ),
+        migrations.AddField(
+            model_name='monthlyrollup',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.RunPython(backfill, clear),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'wallet', 'month', 'category', 'type'), name='unique_monthly_rollup'),
+        ),
+    ]
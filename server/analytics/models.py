@@ -1,3 +1,56 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+
+class MonthlyRollup(models.Model):
+    """
+    Pre-aggregated monthly totals per wallet, category and type.
+    Maintained incrementally by the Transaction write path so dashboards
+    read O(months) rows instead of scanning the whole history.
+    """
+    TYPE_CHOICES = [
+        ('income', 'Revenu'),
+        ('expense', 'Dépense'),
+        ('transfer_out', 'Transfert sortant'),
+        ('transfer_in', 'Transfert entrant'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='monthly_rollups',
+        verbose_name="Utilisateur"
+    )
+    wallet = models.ForeignKey(
+        'wallets.Wallet',
+        on_delete=models.CASCADE,
+        related_name='monthly_rollups',
+        verbose_name="Portefeuille"
+    )
+    month = models.DateField(verbose_name="Mois")
+    category = models.ForeignKey(
+        'transactions.Category',
+        on_delete=models.CASCADE,
+        related_name='monthly_rollups',
+        verbose_name="Catégorie"
+    )
+    type = models.CharField(max_length=12, choices=TYPE_CHOICES, verbose_name="Type")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+    count = models.IntegerField(default=0, verbose_name="Nombre de transactions")
+
+    class Meta:
+        verbose_name = "Agrégat mensuel"
+        verbose_name_plural = "Agrégats mensuels"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'wallet', 'month', 'category', 'type'],
+                name='unique_monthly_rollup',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.category_id} {self.type}: {self.total} ({self.count})"
@@ -0,0 +1,147 @@
+"""
+Incremental maintenance of MonthlyRollup.
+
+Every write to a Transaction is expressed as a set of removed and added
+rows; their contributions are coalesced per rollup key and applied with
+`total = total + delta` updates: a single INSERT ... ON CONFLICT DO UPDATE
+per chunk of keys on PostgreSQL and SQLite, one UPDATE per key elsewhere.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import MonthlyRollup
+
+
+def month_of(value):
+    """First day of the (local) month of a datetime"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def rollup_entries(tx):
+    """
+    Yield the (key, amount) contributions of a transaction.
+    Transfers count as an outflow of the source wallet and an inflow of
+    the receiver; transfers without a receiver do not move money.
+    """
+    month = month_of(tx.date)
+    if tx.type in ('income', 'expense'):
+        yield (tx.user_id, tx.wallet_id, month, tx.category_id, tx.type), tx.amount
+    elif tx.type == 'transfer' and tx.receiver_wallet_id:
+        yield (tx.user_id, tx.wallet_id, month, tx.category_id, 'transfer_out'), tx.amount
+        yield (tx.user_id, tx.receiver_wallet_id, month, tx.category_id, 'transfer_in'), tx.amount
+
+
+def collect_deltas(added=(), removed=(), deltas=None):
+    """
+    Coalesce the contributions of added and removed rows per rollup key.
+    Pass `deltas` to keep accumulating into an existing mapping.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for sign, rows in ((1, added), (-1, removed)):
+        for tx in rows:
+            for key, amount in rollup_entries(tx):
+                deltas[key][0] += sign * amount
+                deltas[key][1] += sign
+    return deltas
+
+
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+UPSERT_CHUNK = 500
+
+
+def apply_deltas(deltas):
+    """Apply coalesced deltas, creating missing rollup rows on the fly"""
+    changes = [
+        (key, total, count) for key, (total, count) in deltas.items() if total or count
+    ]
+    connection = connections[router.db_for_write(MonthlyRollup)]
+    if connection.vendor in UPSERT_VENDORS:
+        for start in range(0, len(changes), UPSERT_CHUNK):
+            upsert(connection, changes[start:start + UPSERT_CHUNK])
+        return
+
+    for (user_id, wallet_id, month, category_id, type), total, count in changes:
+        lookup = dict(user_id=user_id, wallet_id=wallet_id, month=month, category_id=category_id, type=type)
+        updated = MonthlyRollup.objects.filter(**lookup).update(
+            total=F('total') + total, count=F('count') + count
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                MonthlyRollup.objects.create(total=total, count=count, **lookup)
+        except IntegrityError:
+            # Another writer created the row in between
+            MonthlyRollup.objects.filter(**lookup).update(
+                total=F('total') + total, count=F('count') + count
+            )
+
+
+def upsert(connection, changes):
+    """Add the deltas of many keys in one statement, inserting missing rows"""
+    quote = connection.ops.quote_name
+    table = quote(MonthlyRollup._meta.db_table)
+    key_columns = ', '.join(quote(column) for column in ('user_id', 'wallet_id', 'month', 'category_id', 'type'))
+    total, count = quote('total'), quote('count')
+    sql = (
+        f"INSERT INTO {table} ({key_columns}, {total}, {count}) VALUES "
+        + ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(changes))
+        + f" ON CONFLICT ({key_columns}) DO UPDATE SET"
+        f" {total} = {table}.{total} + EXCLUDED.{total},"
+        f" {count} = {table}.{count} + EXCLUDED.{count}"
+    )
+    ops = connection.ops
+    params = []
+    for (user_id, wallet_id, month, category_id, type), delta_total, delta_count in changes:
+        params.extend((
+            user_id, wallet_id, ops.adapt_datefield_value(month), category_id, type,
+            ops.adapt_decimalfield_value(delta_total), delta_count,
+        ))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def record_changes(added=(), removed=()):
+    """Update the rollups for transactions that were added and/or removed"""
+    apply_deltas(collect_deltas(added, removed))
+
+
+def compute_from_transactions(queryset):
+    """
+    Aggregate raw transactions into {key: (total, count)} with GROUP BY.
+    Used to rebuild the rollups from scratch and to check them.
+    """
+    base = queryset.order_by().annotate(month=TruncMonth('date'))
+    expected = defaultdict(lambda: [Decimal('0'), 0])
+
+    def add(rows, wallet_field, type):
+        for row in rows:
+            key = (row['user_id'], row[wallet_field], timezone.localtime(row['month']).date(),
+                   row['category'], type or row['type'])
+            expected[key][0] += row['total']
+            expected[key][1] += row['count']
+
+    add(
+        base.filter(type__in=('income', 'expense'))
+        .values('user_id', 'wallet_id', 'month', 'category', 'type')
+        .annotate(total=Sum('amount'), count=Count('id')),
+        'wallet_id', None,
+    )
+    transfers = base.filter(type='transfer', receiver_wallet__isnull=False)
+    add(
+        transfers.values('user_id', 'wallet_id', 'month', 'category')
+        .annotate(total=Sum('amount'), count=Count('id')),
+        'wallet_id', 'transfer_out',
+    )
+    add(
+        transfers.values('user_id', 'receiver_wallet_id', 'month', 'category')
+        .annotate(total=Sum('amount'), count=Count('id')),
+        'receiver_wallet_id', 'transfer_in',
+    )
+    return {key: tuple(value) for key, value in expected.items()}
@@ -0,0 +1,100 @@
+from rest_framework import serializers
+
+from transactions.models import Transaction
+from transactions.serializers import CategoryField
+from wallets.models import Wallet, SavingGoal
+
+
+class MonthlySummarySerializer(serializers.Serializer):
+    """Income/expense totals for one month"""
+    month = serializers.DateField()
+    currency = serializers.CharField()
+    income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class CategoryBreakdownSerializer(serializers.Serializer):
+    """Total spent (or earned) in one category"""
+    category = serializers.CharField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    count = serializers.IntegerField()
+    share = serializers.FloatField()
+
+
+class TrendPointSerializer(serializers.Serializer):
+    """One month of the income/expense trend series"""
+    month = serializers.DateField()
+    income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class DashboardWalletSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Wallet
+        fields = ('id', 'name', 'type', 'balance', 'currency', 'color', 'icon')
+
+
+class DashboardTransactionSerializer(serializers.ModelSerializer):
+    wallet_name = serializers.CharField(source='wallet.name', read_only=True)
+    category = CategoryField(read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ('id', 'name', 'amount', 'category', 'type', 'status', 'date', 'icon', 'wallet', 'wallet_name')
+
+
+class DashboardGoalSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(source='progress_percentage', read_only=True)
+
+    class Meta:
+        model = SavingGoal
+        fields = ('id', 'name', 'target_amount', 'current_amount', 'progress', 'deadline', 'color')
+
+
+class UpcomingExpenseSerializer(serializers.Serializer):
+    """Next occurrence of a fixed expense"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    currency = serializers.CharField()
+    periodicity = serializers.CharField()
+    due_date = serializers.DateField()
+
+
+class DashboardSerializer(serializers.Serializer):
+    """Combined dashboard snapshot"""
+    currency = serializers.CharField()
+    total_balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+    wallets = DashboardWalletSerializer(many=True)
+    recent_transactions = DashboardTransactionSerializer(many=True)
+    month = MonthlySummarySerializer()
+    goals = DashboardGoalSerializer(many=True)
+    upcoming_fixed_expenses = UpcomingExpenseSerializer(many=True)
+    # Currencies without any known rate, counted as is in the totals
+    unconverted_currencies = serializers.ListField(child=serializers.CharField())
+
+
+class BalancePointSerializer(serializers.Serializer):
+    """Closing balance of one period"""
+    date = serializers.DateField()
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class WalletBalanceHistorySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    currency = serializers.CharField()
+    results = BalancePointSerializer(many=True)
+
+
+class BalanceHistorySerializer(serializers.Serializer):
+    """Total net worth series and one series per wallet"""
+    granularity = serializers.CharField()
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    currency = serializers.CharField()
+    results = BalancePointSerializer(many=True)
+    wallets = WalletBalanceHistorySerializer(many=True)
@@ -0,0 +1,214 @@
+import calendar
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from transactions.models import Category, Transaction
+from wallets.models import Wallet, SavingGoal, FixedExpense
+from wallets.rates import Converter
+from .models import MonthlyRollup
+
+
+ZERO = Decimal('0.00')
+
+
+def month_start(value=None):
+    """Return the aware datetime of the first instant of the month containing `value`"""
+    value = timezone.localtime(value) if value else timezone.localtime()
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def shift_month(start, months):
+    """Move a month start forward (or backward) by a number of months"""
+    index = start.year * 12 + start.month - 1 + months
+    naive = datetime(index // 12, index % 12 + 1, 1)
+    return timezone.make_aware(naive, timezone.get_current_timezone())
+
+
+def user_rollups(user, start=None, end=None, wallet=None):
+    """
+    Base queryset for aggregations, reading the monthly rollups.
+    Filters on user then month so the (user, month) index drives the scan,
+    and clears the model ordering so it does not leak into the GROUP BY.
+    """
+    qs = MonthlyRollup.objects.filter(user=user)
+    if start is not None:
+        qs = qs.filter(month__gte=start.date())
+    if end is not None:
+        qs = qs.filter(month__lt=end.date())
+    if wallet is not None:
+        qs = qs.filter(wallet=wallet)
+    return qs.order_by()
+
+
+def month_rate_date(month):
+    """Conversion date of a month's flows: its last day, or today for the current month"""
+    last_day = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    return min(last_day, timezone.localdate())
+
+
+def monthly_totals(user, start, wallet=None):
+    """
+    Income, expenses and net flow for the month starting at `start`, in the
+    user's currency: summed per wallet currency, then converted once each.
+    """
+    rows = list(user_rollups(user, start, shift_month(start, 1), wallet).values('wallet__currency').annotate(
+        income=Sum('total', filter=Q(type='income')),
+        expense=Sum('total', filter=Q(type='expense')),
+        count=Sum('count', filter=~Q(type='transfer_in')),
+    ))
+    converter = Converter(user.currency, month_rate_date(start.date()))
+    income = converter.total((row['wallet__currency'], row['income']) for row in rows)
+    expense = converter.total((row['wallet__currency'], row['expense']) for row in rows)
+    return {
+        'month': start.date(),
+        'currency': user.currency,
+        'income': income,
+        'expense': expense,
+        'net': income - expense,
+        'count': sum(row['count'] or 0 for row in rows),
+    }
+
+
+def category_breakdown(user, start, end, type='expense', wallet=None):
+    """Totals per category over [start, end) in the user's currency, largest first"""
+    converter = Converter(user.currency, month_rate_date(shift_month(end, -1).date()))
+    by_category = {}
+    # Grouped by category id; the few names are read afterwards
+    for row in (
+        user_rollups(user, start, end, wallet)
+        .filter(type=type, count__gt=0)
+        .values('category_id', 'wallet__currency')
+        .annotate(total=Sum('total'), count=Sum('count'))
+    ):
+        item = by_category.setdefault(row['category_id'], {'total': ZERO, 'count': 0})
+        item['total'] += converter.convert(row['total'], row['wallet__currency'])
+        item['count'] += row['count']
+    names = dict(Category.objects.filter(pk__in=by_category).values_list('pk', 'name')) if by_category else {}
+    for category_id, item in by_category.items():
+        item['category'] = names[category_id]
+
+    rows = sorted(by_category.values(), key=lambda item: item['total'], reverse=True)
+    grand_total = sum((row['total'] for row in rows), ZERO)
+    for row in rows:
+        row['share'] = float(row['total'] / grand_total * 100) if grand_total else 0.0
+    return rows
+
+
+def trend_series(user, months, end_month=None, wallet=None):
+    """
+    Income/expense series over the last `months` months (oldest first),
+    each month converted at its own rate. Months without any transaction
+    are returned with zero totals.
+    """
+    end_month = end_month or month_start()
+    start = shift_month(end_month, -(months - 1))
+    rows = (
+        user_rollups(user, start, shift_month(end_month, 1), wallet)
+        .values('month', 'wallet__currency')
+        .annotate(
+            income=Sum('total', filter=Q(type='income')),
+            expense=Sum('total', filter=Q(type='expense')),
+        )
+    )
+    converter = Converter(user.currency)
+    by_month = {}
+    for row in rows:
+        day = month_rate_date(row['month'])
+        totals = by_month.setdefault(row['month'], {'income': ZERO, 'expense': ZERO})
+        totals['income'] += converter.convert(row['income'] or ZERO, row['wallet__currency'], day)
+        totals['expense'] += converter.convert(row['expense'] or ZERO, row['wallet__currency'], day)
+
+    series = []
+    for offset in range(months):
+        month = shift_month(start, offset).date()
+        totals = by_month.get(month, {'income': ZERO, 'expense': ZERO})
+        series.append({
+            'month': month,
+            'income': totals['income'],
+            'expense': totals['expense'],
+            'net': totals['income'] - totals['expense'],
+        })
+    return series
+
+
+def upcoming_fixed_expenses(user, days, today=None):
+    """Next occurrence of each fixed expense due within `days` days, soonest first"""
+    return due_within(FixedExpense.objects.filter(user=user).order_by(), days, today)
+
+
+def due_within(expenses, days, today=None):
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=days)
+    upcoming = []
+    for expense in expenses:
+        due_date = expense.next_occurrence(today)
+        if due_date <= horizon:
+            upcoming.append({
+                'id': expense.pk,
+                'name': expense.name,
+                'amount': expense.amount,
+                'currency': expense.currency,
+                'periodicity': expense.periodicity,
+                'due_date': due_date,
+            })
+    upcoming.sort(key=lambda item: item['due_date'])
+    return upcoming
+
+
+def recent_transactions(user, count):
+    return (
+        Transaction.objects.filter(user=user)
+        .select_related('wallet', 'category')
+        .only(
+            'id', 'name', 'amount', 'category', 'category__name', 'type', 'status', 'date', 'icon',
+            'wallet', 'wallet__name',
+        )[:count]
+    )
+
+
+def dashboard_totals(user, wallets):
+    """Converted total balance and month-to-date totals of the dashboard"""
+    converter = Converter(user.currency)
+    return {
+        'currency': user.currency,
+        'total_balance': converter.total((wallet.currency, wallet.balance) for wallet in wallets),
+        'month': monthly_totals(user, month_start()),
+        'unconverted_currencies': sorted(converter.unconverted),
+    }
+
+
+def dashboard_snapshot(user, recent=5, upcoming_days=30):
+    """
+    Everything the dashboard renders, one query per section:
+    wallets (and their total in the user's currency), latest transactions,
+    month-to-date totals from the rollups, saving goals and upcoming fixed
+    expenses.
+    """
+    wallets = list(Wallet.objects.filter(user=user))
+    return {
+        **dashboard_totals(user, wallets),
+        'wallets': wallets,
+        'recent_transactions': list(recent_transactions(user, recent)),
+        'goals': list(SavingGoal.objects.filter(user=user)),
+        'upcoming_fixed_expenses': upcoming_fixed_expenses(user, upcoming_days),
+    }
+
+
+async def adashboard_snapshot(user, recent=5, upcoming_days=30):
+    """
+    dashboard_snapshot through the async ORM. The totals (a rollup
+    aggregate and memoized rate lookups) run in one sync_to_async call.
+    """
+    wallets = [wallet async for wallet in Wallet.objects.filter(user=user)]
+    expenses = [expense async for expense in FixedExpense.objects.filter(user=user).order_by()]
+    return {
+        **await sync_to_async(dashboard_totals)(user, wallets),
+        'wallets': wallets,
+        'recent_transactions': [tx async for tx in recent_transactions(user, recent)],
+        'goals': [goal async for goal in SavingGoal.objects.filter(user=user)],
+        'upcoming_fixed_expenses': due_within(expenses, upcoming_days),
+    }
@@ -1,3 +1,328 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from transactions.categories import category_for
+from transactions.models import Transaction
+from wallets import rates
+from wallets.models import FixedExpense, SavingGoal, Wallet
+from .history import balance_history
+from .models import MonthlyRollup
+
+
+def create_user(email='user@monely.test'):
+    return User.objects.create_user(username=email, email=email, password='MonelyPass123!', name='Test')
+
+
+class AnalyticsEndpointTests(TestCase):
+    """Monthly summary, category breakdown and trend endpoints"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.checking = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.add(self.checking, '2000', 'income', 'Salaire', date(2024, 3, 1))
+        self.add(self.checking, '300', 'expense', 'Courses', date(2024, 3, 5))
+        self.add(self.checking, '100', 'expense', 'Courses', date(2024, 3, 12))
+        self.add(self.savings, '600', 'expense', 'Loyer', date(2024, 3, 20))
+        self.add(self.checking, '50', 'transfer', 'Virement', date(2024, 3, 21), receiver_wallet=self.savings)
+        self.add(self.checking, '80', 'expense', 'Courses', date(2024, 1, 15))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, wallet, amount, type, category, day, **kwargs):
+        Transaction.objects.create(
+            user=self.user, wallet=wallet, name='Transaction', amount=Decimal(amount), type=type,
+            category=category_for(self.user, category),
+            date=timezone.make_aware(datetime(day.year, day.month, day.day, 12)), **kwargs
+        )
+
+    def test_summary(self):
+        data = self.client.get('/api/analytics/summary/', {'month': '2024-03'}).data
+        self.assertEqual(
+            (data['income'], data['expense'], data['net'], data['count']),
+            ('2000.00', '1000.00', '1000.00', 5),
+        )
+        data = self.client.get('/api/analytics/summary/', {'month': '2024-03', 'wallet': self.savings.pk}).data
+        self.assertEqual((data['income'], data['expense'], data['count']), ('0.00', '600.00', 1))
+
+    def test_categories(self):
+        response = self.client.get('/api/analytics/categories/', {'month': '2024-03'})
+        self.assertEqual(response.data['type'], 'expense')
+        self.assertEqual(
+            [(row['category'], row['total'], row['count'], row['share']) for row in response.data['results']],
+            [('Loyer', '600.00', 1, 60.0), ('Courses', '400.00', 2, 40.0)],
+        )
+        income = self.client.get('/api/analytics/categories/', {'month': '2024-03', 'type': 'income'}).data
+        self.assertEqual([(row['category'], row['share']) for row in income['results']], [('Salaire', 100.0)])
+        checking = self.client.get(
+            '/api/analytics/categories/', {'month': '2024-03', 'wallet': self.checking.pk}
+        ).data
+        self.assertEqual([row['category'] for row in checking['results']], ['Courses'])
+        self.assertEqual(self.client.get('/api/analytics/categories/', {'month': '2023-01'}).data['results'], [])
+
+    def test_trends(self):
+        data = self.client.get('/api/analytics/trends/', {'month': '2024-03', 'months': 4}).data
+        self.assertEqual(data['months'], 4)
+        # Months without transactions are zero-filled
+        self.assertEqual([(row['month'], row['expense']) for row in data['results']], [
+            ('2023-12-01', '0.00'), ('2024-01-01', '80.00'), ('2024-02-01', '0.00'), ('2024-03-01', '1000.00'),
+        ])
+        self.assertEqual(data['results'][-1]['net'], '1000.00')
+        data = self.client.get(
+            '/api/analytics/trends/', {'month': '2024-03', 'months': 3, 'wallet': self.savings.pk}
+        ).data
+        self.assertEqual([row['expense'] for row in data['results']], ['0.00', '0.00', '600.00'])
+
+    def test_validation(self):
+        for url, params, field in [
+            ('/api/analytics/summary/', {'month': '2024-13'}, 'month'),
+            ('/api/analytics/summary/', {'month': 'mars'}, 'month'),
+            ('/api/analytics/summary/', {'wallet': 'abc'}, 'wallet'),
+            ('/api/analytics/categories/', {'type': 'transfer'}, 'type'),
+            ('/api/analytics/trends/', {'months': 0}, 'months'),
+            ('/api/analytics/trends/', {'months': 37}, 'months'),
+            ('/api/analytics/trends/', {'months': 'six'}, 'months'),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, (url, params))
+            self.assertIn(field, response.data)
+
+
+class RollupMaintenanceTests(TestCase):
+    """Monthly rollups follow every write, and rebuild_rollups --check spots drift"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.checking = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+
+    def add(self, amount, type='expense', category='Courses', day=date(2024, 3, 10), **kwargs):
+        kwargs.setdefault('wallet', self.checking)
+        return Transaction.objects.create(
+            user=self.user, name='Transaction', amount=Decimal(amount), type=type,
+            category=category_for(self.user, category),
+            date=timezone.make_aware(datetime(day.year, day.month, day.day, 12)), **kwargs
+        )
+
+    def rollups(self):
+        return {
+            (row.wallet.name, row.month, row.category.name, row.type): (row.total, row.count)
+            for row in MonthlyRollup.objects.exclude(count=0, total=0).select_related('wallet', 'category')
+        }
+
+    def check(self):
+        out = StringIO()
+        call_command('rebuild_rollups', check=True, stdout=out)
+        return out.getvalue()
+
+    def test_create_update_delete(self):
+        march, april = date(2024, 3, 1), date(2024, 4, 1)
+        tx = self.add('30')
+        self.add('20')
+        self.assertEqual(self.rollups(), {('Courant', march, 'Courses', 'expense'): (Decimal('50'), 2)})
+
+        # Another month, wallet, category and amount at once
+        tx.date = timezone.make_aware(datetime(2024, 4, 2, 12))
+        tx.wallet = self.savings
+        tx.category = category_for(self.user, 'Loisirs')
+        tx.amount = Decimal('45')
+        tx.save()
+        self.assertEqual(self.rollups(), {
+            ('Courant', march, 'Courses', 'expense'): (Decimal('20'), 1),
+            ('Épargne', april, 'Loisirs', 'expense'): (Decimal('45'), 1),
+        })
+
+        transfer = self.add('100', type='transfer', category='Virement', receiver_wallet=self.savings)
+        self.assertEqual(self.rollups()[('Courant', march, 'Virement', 'transfer_out')], (Decimal('100'), 1))
+        self.assertEqual(self.rollups()[('Épargne', march, 'Virement', 'transfer_in')], (Decimal('100'), 1))
+        self.assertIn('Agrégats cohérents', self.check())
+
+        tx.delete()
+        transfer.delete()
+        self.assertEqual(self.rollups(), {('Courant', march, 'Courses', 'expense'): (Decimal('20'), 1)})
+        self.assertIn('Agrégats cohérents', self.check())
+
+    def test_check_detects_drift(self):
+        self.add('30')
+        self.add('500', type='income', category='Salaire')
+        MonthlyRollup.objects.filter(type='income').update(total=F('total') + 1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', check=True, stdout=StringIO())
+        # Missing rows are drift too
+        MonthlyRollup.objects.filter(type='expense').delete()
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', check=True, stdout=out)
+        self.assertIn('stored=None', out.getvalue())
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertIn('Agrégats cohérents', self.check())
+        self.assertEqual(self.rollups()[('Courant', date(2024, 3, 1), 'Salaire', 'income')], (Decimal('500'), 1))
+
+
+class BalanceHistoryTests(TestCase):
+    """Balance series rebuilt backwards from the current balances"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.checking = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.add(self.checking, '1000', 'income', date(2024, 1, 10))
+        self.add(self.checking, '200', 'expense', date(2024, 2, 5))
+        self.add(self.checking, '300', 'transfer', date(2024, 2, 20), receiver_wallet=self.savings)
+        self.add(self.savings, '50', 'expense', date(2024, 3, 3))
+        # After the requested range: must not show up in the series
+        self.add(self.checking, '100', 'income', date(2024, 4, 2))
+
+    def add(self, wallet, amount, type, day, **kwargs):
+        Transaction.objects.create(
+            user=self.user, wallet=wallet, name='Transaction', amount=Decimal(amount), type=type,
+            category=category_for(self.user, 'Divers'), date=timezone.make_aware(datetime(day.year, day.month, day.day, 12)), **kwargs
+        )
+
+    def balances(self, result):
+        return [point['balance'] for point in result['results']]
+
+    def test_monthly_from_rollups(self):
+        result = balance_history(self.user, date(2024, 1, 1), date(2024, 3, 31), granularity='monthly')
+        self.assertEqual([point['date'] for point in result['results']], [
+            date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31),
+        ])
+        self.assertEqual(self.balances(result), [Decimal('1000'), Decimal('800'), Decimal('750')])
+        checking, savings = result['wallets']
+        self.assertEqual(self.balances(checking), [Decimal('1000'), Decimal('500'), Decimal('500')])
+        self.assertEqual(self.balances(savings), [Decimal('0'), Decimal('300'), Decimal('250')])
+
+    def test_daily_and_weekly_match_monthly(self):
+        daily = balance_history(self.user, date(2024, 1, 1), date(2024, 3, 31), granularity='daily', points=500)
+        self.assertEqual(len(daily['results']), 91)
+        by_day = dict(zip([point['date'] for point in daily['results']], self.balances(daily)))
+        self.assertEqual(by_day[date(2024, 1, 9)], Decimal('0'))
+        self.assertEqual(by_day[date(2024, 2, 5)], Decimal('800'))
+        self.assertEqual(by_day[date(2024, 3, 31)], Decimal('750'))
+
+        weekly = balance_history(self.user, date(2024, 1, 1), date(2024, 3, 31), granularity='weekly')
+        # Weeks end on Sundays, the last one is clipped to date_to
+        self.assertEqual(weekly['results'][0]['date'], date(2024, 1, 7))
+        self.assertEqual(weekly['results'][-1], {'date': date(2024, 3, 31), 'balance': Decimal('750')})
+
+    def test_fixed_size_series(self):
+        result = balance_history(self.user, date(2020, 1, 1), date(2024, 3, 31), granularity='daily', points=10)
+        self.assertEqual(len(result['results']), 10)
+        self.assertEqual(result['results'][0], {'date': date(2020, 1, 1), 'balance': Decimal('0')})
+        self.assertEqual(result['results'][-1]['balance'], Decimal('750'))
+        # Long ranges fall back on the monthly rollups
+        self.assertEqual(balance_history(self.user, date(2020, 1, 1), date(2024, 3, 31))['granularity'], 'monthly')
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/analytics/balance-history/'
+        response = client.get(url, {'wallet': self.savings.pk, 'date_from': '2024-01-01', 'date_to': '2024-03-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['granularity'], 'weekly')
+        self.assertEqual(len(response.data['wallets']), 1)
+        self.assertEqual(response.data['results'][-1]['balance'], '250.00')
+        # Without bounds the series covers the whole history up to today
+        self.assertEqual(client.get(url).data['date_from'], '2024-01-10')
+
+        other = Wallet.objects.create(user=create_user('other@monely.test'), name='Autre', type='checking')
+        self.assertEqual(client.get(url, {'wallet': other.pk}).status_code, 400)
+        self.assertEqual(client.get(url, {'granularity': 'hourly'}).status_code, 400)
+        self.assertEqual(client.get(url, {'date_from': '2024-03-01', 'date_to': '2024-01-01'}).status_code, 400)
+
+    def test_endpoint_bounds(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/analytics/balance-history/'
+        self.assertEqual(client.get(url, {'date_to': '9999-12-31'}).status_code, 400)
+        self.assertEqual(client.get(url, {'date_from': '0001-01-01'}).status_code, 400)
+        self.assertEqual(client.get(url, {'date_from': '9000-01-01'}).status_code, 400)
+        # Too many days to build: a coarser granularity is required
+        daily = client.get(url, {'date_from': '1900-01-01', 'granularity': 'daily'})
+        self.assertEqual(daily.status_code, 400)
+        self.assertIn('granularity', daily.data)
+        monthly = client.get(url, {'date_from': '1900-01-01'})
+        self.assertEqual(monthly.status_code, 200)
+        self.assertEqual(monthly.data['granularity'], 'monthly')
+        self.assertEqual(monthly.data['results'][-1]['balance'], '850.00')
+
+
+class DashboardTests(TestCase):
+    """Dashboard snapshot in one request"""
+    url = '/api/dashboard/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking', currency='USD')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.now = timezone.now()
+
+    def add(self, amount, type, category='Courses', **kwargs):
+        kwargs.setdefault('date', self.now)
+        return Transaction.objects.create(
+            user=self.user, wallet=self.wallet, name='Transaction', amount=Decimal(amount), type=type,
+            category=category_for(self.user, category), **kwargs
+        )
+
+    def test_payload(self):
+        self.add('1000', 'income', 'Salaire')
+        latest = self.add('40', 'expense', date=self.now + timedelta(seconds=1))
+        SavingGoal.objects.create(user=self.user, name='Vacances', target_amount=Decimal('500'),
+                                  current_amount=Decimal('125'), deadline=date(2030, 1, 1))
+        FixedExpense.objects.create(user=self.user, wallet=self.wallet, name='Loyer', amount=Decimal('800'),
+                                    currency='USD', start_date=timezone.localdate() + timedelta(days=3))
+        FixedExpense.objects.create(user=self.user, name='Assurance', amount=Decimal('90'), currency='USD',
+                                    periodicity='yearly', start_date=timezone.localdate() + timedelta(days=60))
+
+        data = self.client.get(self.url, {'recent': 1}).data
+        self.assertEqual(data['total_balance'], '960.00')
+        self.assertEqual((data['month']['income'], data['month']['expense']), ('1000.00', '40.00'))
+        self.assertEqual([(tx['id'], tx['category'], tx['wallet_name']) for tx in data['recent_transactions']],
+                         [(latest.pk, 'Courses', 'Courant')])
+        self.assertEqual(data['goals'][0]['progress'], 25.0)
+        self.assertEqual([item['name'] for item in data['upcoming_fixed_expenses']], ['Loyer'])
+        self.assertEqual(self.client.get(self.url, {'recent': 50}).status_code, 400)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False, EXCHANGE_RATES_CHECK_INTERVAL=3600)
+    def test_query_count_does_not_grow(self):
+        self.add('10', 'expense')
+        # Wallets, month totals, latest transactions, goals and fixed expenses
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        for index in range(10):
+            Wallet.objects.create(user=self.user, name=f'Compte {index}', type='savings', currency='EUR')
+            self.add('5', 'expense', f'Catégorie {index}')
+            SavingGoal.objects.create(user=self.user, name=f'Objectif {index}', target_amount=Decimal('10'),
+                                      deadline=date(2030, 1, 1))
+        # Plus the rate lookups of the new currency (none stored: before and after today), once for all its
+        # wallets; the version of the rate table is read at most once per interval
+        rates.forget_rates_version()
+        rates.rates_version()
+        with self.assertNumQueries(7):
+            self.client.get(self.url)
+
+    def test_new_day_revalidates(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            # Same data version, but month-to-date totals and due dates moved on
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], first['ETag'])
+            self.assertEqual(
+                self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 200
+            )
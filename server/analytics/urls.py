@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import MonthlySummaryView, CategoryBreakdownView, TrendView, BalanceHistoryView
+
+urlpatterns = [
+    path('summary/', MonthlySummaryView.as_view(), name='analytics_summary'),
+    path('categories/', CategoryBreakdownView.as_view(), name='analytics_categories'),
+    path('trends/', TrendView.as_view(), name='analytics_trends'),
+    path('balance-history/', BalanceHistoryView.as_view(), name='analytics_balance_history'),
+]
@@ -1,3 +1,187 @@
-from django.shortcuts import render
+from datetime import date, datetime, timedelta
 
-# Create your views here.
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.async_views import AsyncReadView
+from core.cache import cached_response
+from . import history, services
+from .serializers import (
+    MonthlySummarySerializer, CategoryBreakdownSerializer, TrendPointSerializer,
+    DashboardSerializer, BalanceHistorySerializer,
+)
+
+MAX_TREND_MONTHS = 36
+MAX_RECENT_TRANSACTIONS = 20
+MAX_UPCOMING_DAYS = 90
+MAX_HISTORY_POINTS = 500
+# Balance history bounds: future-dated transactions are at most a year ahead
+MIN_HISTORY_DATE = date(1900, 1, 1)
+MAX_HISTORY_DAYS_AHEAD = 366
+
+
+def parse_month(request):
+    """Read `?month=YYYY-MM`, defaulting to the current month"""
+    value = request.query_params.get('month')
+    if not value:
+        return services.month_start()
+    try:
+        naive = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise ValidationError({'month': "Format attendu : AAAA-MM."})
+    return timezone.make_aware(naive, timezone.get_current_timezone())
+
+
+def parse_bounded_int(request, name, default, maximum):
+    """Read an optional positive integer query parameter capped at `maximum`"""
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Nombre entier attendu."})
+    if not 1 <= value <= maximum:
+        raise ValidationError({name: f"Doit être compris entre 1 et {maximum}."})
+    return value
+
+
+def parse_date(request, name):
+    """Read an optional `?<name>=YYYY-MM-DD` parameter"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({name: "Format attendu : AAAA-MM-JJ."})
+
+
+def parse_wallet(request):
+    """Read the optional `?wallet=<id>` filter"""
+    value = request.query_params.get('wallet')
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({'wallet': "Identifiant de portefeuille invalide."})
+
+
+class MonthlySummaryView(APIView):
+    """Income, expenses and net flow for one month"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        totals = services.monthly_totals(
+            request.user, parse_month(request), wallet=parse_wallet(request)
+        )
+        return Response(MonthlySummarySerializer(totals).data)
+
+
+class CategoryBreakdownView(APIView):
+    """Per-category totals for one month, largest first"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        type = request.query_params.get('type', 'expense')
+        if type not in ('income', 'expense'):
+            raise ValidationError({'type': "Valeurs possibles : income, expense."})
+        start = parse_month(request)
+        rows = services.category_breakdown(
+            request.user, start, services.shift_month(start, 1),
+            type=type, wallet=parse_wallet(request)
+        )
+        return Response({
+            'month': start.date(),
+            'type': type,
+            'results': CategoryBreakdownSerializer(rows, many=True).data,
+        })
+
+
+class TrendView(APIView):
+    """Income/expense series over the last N months"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        months = parse_bounded_int(request, 'months', 6, MAX_TREND_MONTHS)
+        series = services.trend_series(
+            request.user, months, end_month=parse_month(request), wallet=parse_wallet(request)
+        )
+        return Response({
+            'months': months,
+            'results': TrendPointSerializer(series, many=True).data,
+        })
+
+
+class BalanceHistoryView(APIView):
+    """
+    Closing balance per period, per wallet and in total, rebuilt backwards
+    from the current balances. Query parameters: `date_from` (default: first
+    transaction), `date_to` (default: today), `granularity`
+    (auto|daily|weekly|monthly), `points` (at most 60 by default) and `wallet`.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        granularity = request.query_params.get('granularity', 'auto')
+        if granularity not in history.GRANULARITIES:
+            raise ValidationError({'granularity': f"Valeurs possibles : {', '.join(history.GRANULARITIES)}."})
+        points = parse_bounded_int(request, 'points', history.DEFAULT_POINTS, MAX_HISTORY_POINTS)
+        date_from, date_to = parse_date(request, 'date_from'), parse_date(request, 'date_to')
+        if date_from and date_from < MIN_HISTORY_DATE:
+            raise ValidationError({'date_from': f"Au plus tôt le {MIN_HISTORY_DATE.isoformat()}."})
+        latest = timezone.localdate() + timedelta(days=MAX_HISTORY_DAYS_AHEAD)
+        if date_to and date_to > latest:
+            raise ValidationError({'date_to': f"Au plus tard le {latest.isoformat()}."})
+        if date_from and date_from > (date_to or timezone.localdate()):
+            raise ValidationError({'date_from': "Doit précéder date_to."})
+        wallet = parse_wallet(request)
+        if wallet is not None and not request.user.wallets.filter(pk=wallet).exists():
+            raise ValidationError({'wallet': "Portefeuille introuvable."})
+
+        def build():
+            try:
+                result = history.balance_history(
+                    request.user, date_from, date_to, granularity=granularity, wallet=wallet, points=points
+                )
+            except history.HistoryRangeError as exc:
+                raise ValidationError({'granularity': str(exc)})
+            return Response(BalanceHistorySerializer(result).data)
+
+        # The default date_to is today
+        return cached_response(request, build, dated=date_to is None)
+
+
+class DashboardView(APIView):
+    """
+    Single round-trip snapshot for the dashboard screens.
+    Query parameters: `recent` (latest transactions, default 5) and
+    `upcoming_days` (fixed expenses horizon, default 30).
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        # Month-to-date totals and upcoming expenses move with the date
+        return cached_response(request, lambda: self.build(request), dated=True)
+
+    def build(self, request):
+        snapshot = services.dashboard_snapshot(
+            request.user,
+            recent=parse_bounded_int(request, 'recent', 5, MAX_RECENT_TRANSACTIONS),
+            upcoming_days=parse_bounded_int(request, 'upcoming_days', 30, MAX_UPCOMING_DAYS),
+        )
+        return Response(DashboardSerializer(snapshot).data)
+
+
+class AsyncDashboardView(AsyncReadView):
+    """DashboardView served through the async ORM"""
+    cache_dated = True
+
+    async def build(self, request):
+        snapshot = await services.adashboard_snapshot(
+            request.user,
+            recent=parse_bounded_int(request, 'recent', 5, MAX_RECENT_TRANSACTIONS),
+            upcoming_days=parse_bounded_int(request, 'upcoming_days', 30, MAX_UPCOMING_DAYS),
+        )
+        return DashboardSerializer(snapshot).data
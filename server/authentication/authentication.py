@@ -0,0 +1,104 @@
+"""
+JWT authentication without a per-request user query.
+
+The user is built from the token's claims (see tokens.py) when a shared
+cache lets every worker see profile changes. Otherwise, and for tokens
+without claims or issued before the last profile change, it comes from an
+in-process cache of user rows kept `JWT_USER_CACHE_TTL` seconds, so an
+authenticated request needs no authentication query in the common case:
+only the cache read of the profile change time.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import tokens
+
+MAX_CACHED_USERS = 10_000
+
+
+class UserCache:
+    """Recently loaded users of this process, dropped when their profile changes"""
+
+    def __init__(self, max_size=MAX_CACHED_USERS):
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, user_model, user_id, changed_at=None):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(user_id)
+        if entry is not None:
+            loaded_at, user = entry
+            fresh = now - loaded_at < settings.JWT_USER_CACHE_TTL
+            if fresh and (changed_at is None or changed_at < loaded_at):
+                # Views may modify request.user: every request gets its own copy
+                return copy.copy(user)
+
+        try:
+            user = user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except user_model.DoesNotExist:
+            raise AuthenticationFailed("Utilisateur introuvable.", code='user_not_found')
+        with self.lock:
+            self.entries[user_id] = (now, user)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return copy.copy(user)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+def full_user(user):
+    """The user with every field loaded in one query, if it was built from token claims"""
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=deferred)
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user from the token claims, or from the user cache"""
+
+    def get_user(self, validated_token):
+        user_id = self.user_id(validated_token)
+        changed_at = tokens.profile_changed_at(user_id)
+        if tokens.trusts_claims(validated_token, changed_at):
+            return tokens.token_user(validated_token)
+        return self.check_user(user_cache.get(self.user_model, user_id, changed_at))
+
+    async def aget_user(self, validated_token):
+        user_id = self.user_id(validated_token)
+        changed_at = await tokens.aprofile_changed_at(user_id)
+        if tokens.trusts_claims(validated_token, changed_at):
+            return tokens.token_user(validated_token)
+        user = await sync_to_async(user_cache.get)(self.user_model, user_id, changed_at)
+        return self.check_user(user)
+
+    def user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Le jeton ne contient pas d'identifiant utilisateur.")
+
+    def check_user(self, user):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("Utilisateur inactif.", code='user_inactive')
+        return user
@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from core import jobs
+
+
+@jobs.register('authentication.flush_tokens', every=timedelta(days=1))
+def flush_tokens(payload):
+    """Delete expired tokens (and their blacklist entries) so the revocation filter stays small"""
+    deleted, _ = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return {'tokens': deleted}
@@ -1,3 +1,111 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .authentication import user_cache
+from .models import User
+from .revocation import BloomFilter, revocations
+from .tokens import AccessToken, RefreshToken, token_user
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        items = [f'jti-{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+
+
+@override_settings(JWT_TRUST_TOKEN_CLAIMS=True)
+class StatelessJWTTests(TestCase):
+    """Authenticated requests read the user from the token claims"""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        # Rolled back users would be served to later tests reusing their ids
+        self.addCleanup(user_cache.clear)
+        revocations.reset()
+        self.user = User.objects.create_user(
+            email='jwt@example.com', username='jwt', name='JWT', password='MonelyTest123!', currency='EUR'
+        )
+
+    def login(self):
+        response = APIClient().post(
+            '/api/auth/login/', {'email': 'jwt@example.com', 'password': 'MonelyTest123!'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def client_for(self, access):
+        return APIClient(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_claims_spare_the_user_query(self):
+        client = self.client_for(self.login()['access'])
+        client.get('/api/wallets/wallets/')
+        with self.assertNumQueries(1):
+            # Only the count of wallets (none): nothing for the user or the blacklist
+            response = client.get('/api/wallets/wallets/', {'page': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/auth/profile/').json()['email'], 'jwt@example.com')
+
+    def test_claims_user_keeps_the_id_type(self):
+        # Compared with foreign keys by the views: '5' would not match 5
+        user = token_user(AccessToken(self.login()['access']))
+        self.assertEqual((user.pk, user.currency), (self.user.pk, 'EUR'))
+
+    def test_profile_change_falls_back_to_the_row(self):
+        tokens = self.login()
+        client = self.client_for(tokens['access'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.currency = 'USD'
+            self.user.save()
+
+        profile = client.get('/api/auth/profile/')
+        self.assertEqual(profile.json()['currency'], 'USD')
+        with self.assertNumQueries(1):
+            # Stale claims: the row loaded by the previous request is reused
+            client.get('/api/wallets/wallets/', {'page': 1})
+        refreshed = APIClient().post('/api/auth/refresh/', {'refresh': tokens['refresh']}, format='json').json()
+        self.assertEqual(RefreshToken(refreshed['refresh'])['currency'], 'USD')
+
+    def test_inactive_user_rejected(self):
+        client = self.client_for(self.login()['access'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(client.get('/api/wallets/wallets/').status_code, 401)
+
+    @override_settings(JWT_TRUST_TOKEN_CLAIMS=False, JWT_USER_CACHE_TTL=0)
+    def test_untrusted_claims_see_other_workers_changes(self):
+        client = self.client_for(self.login()['access'])
+        self.assertEqual(client.get('/api/wallets/wallets/').status_code, 200)
+        # Deactivated by another worker: this one never sees a profile change marker
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(client.get('/api/wallets/wallets/').status_code, 401)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        refresh = self.login()['refresh']
+        first = APIClient().post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(first.status_code, 200)
+        again = APIClient().post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(again.status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        tokens = self.login()
+        client = self.client_for(tokens['access'])
+        self.assertEqual(client.post('/api/auth/logout/', {'refresh': tokens['refresh']}, format='json').status_code, 204)
+        self.assertEqual(client.get('/api/wallets/wallets/').status_code, 401)
+        refresh = APIClient().post('/api/auth/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refresh.status_code, 401)
+
+    def test_revocations_reach_other_processes_on_sync(self):
+        tokens = self.login()
+        client = self.client_for(tokens['access'])
+        client.post('/api/auth/logout/', format='json')
+        # Another process only knows the database
+        revocations.reset()
+        self.assertEqual(client.get('/api/wallets/wallets/').status_code, 401)
@@ -0,0 +1,114 @@
+"""
+JWT classes carrying the profile fields the API reads.
+
+Access tokens hold the user's currency and language next to the id, so
+the authentication can build the user from the token instead of loading
+the row, when JWT_TRUST_TOKEN_CLAIMS is set. When a profile changes, its time is stored in the cache for the
+lifetime of an access token; tokens issued before it are no longer
+trusted for those fields and the user is loaded (see authentication.py).
+The blacklist is checked through the in-memory filter of revocation.py.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .revocation import revocations
+
+# Profile fields copied into the tokens; every user field read on the hot paths
+PROFILE_CLAIMS = ('currency', 'language')
+CHANGED_KEY = 'auth:profile-changed:{}'
+
+
+def stamp_profile(token, user):
+    for claim in PROFILE_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+
+def mark_profile_changed(user_id):
+    """Stop trusting the profile claims of the tokens already issued to a user"""
+    timeout = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+    cache.set(CHANGED_KEY.format(user_id), time.time(), timeout)
+
+
+def profile_changed_at(user_id):
+    return cache.get(CHANGED_KEY.format(user_id))
+
+
+async def aprofile_changed_at(user_id):
+    return await cache.aget(CHANGED_KEY.format(user_id))
+
+
+def trusts_claims(validated_token, changed_at):
+    """Whether the token's profile claims are at least as recent as the profile"""
+    # The change times only reach every worker through a shared cache
+    if not settings.JWT_TRUST_TOKEN_CLAIMS:
+        return False
+    if any(claim not in validated_token for claim in PROFILE_CLAIMS):
+        return False
+    # `iat` has a one-second resolution: a change in the same second wins
+    return changed_at is None or changed_at < validated_token.get('iat', 0)
+
+
+def token_user(validated_token):
+    """
+    User built from the claims, without a query. Other fields are
+    deferred: reading one loads it from the database.
+    """
+    user_model = get_user_model()
+    # The claim holds the id as a string
+    user_id = user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(
+        validated_token[api_settings.USER_ID_CLAIM]
+    )
+    values = {
+        api_settings.USER_ID_FIELD: user_id,
+        'is_active': True,
+        **{claim: validated_token[claim] for claim in PROFILE_CLAIMS},
+    }
+    return user_model.from_db(router.db_for_read(user_model), list(values), list(values.values()))
+
+
+class RevocableMixin:
+    """Blacklist through the revocation filter, without loading the user"""
+
+    def check_blacklist(self):
+        if revocations.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise tokens.TokenError("Le jeton a été révoqué.")
+
+    def outstand(self):
+        return OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM],
+            defaults={
+                'user_id': self.payload.get(api_settings.USER_ID_CLAIM),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(self.payload['exp']),
+            },
+        )
+
+    def blacklist(self):
+        """Returns (BlacklistedToken, created): `created` is False if it already was"""
+        outstanding, _ = self.outstand()
+        result = BlacklistedToken.objects.get_or_create(token=outstanding)
+        revocations.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+class AccessToken(RevocableMixin, tokens.BlacklistMixin, tokens.AccessToken):
+    pass
+
+
+class RefreshToken(RevocableMixin, tokens.RefreshToken):
+    access_token_class = AccessToken
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        stamp_profile(token, user)
+        return token
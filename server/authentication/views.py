@@ -1,8 +1,13 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import TokenError
+from .authentication import full_user
 from .serializers import UserSerializer, UserRegistrationSerializer
 from .models import User
+from .tokens import RefreshToken
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -13,7 +18,7 @@ class UserProfileView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(full_user(request.user))
         return Response(serializer.data)
 
 class UpdateProfileView(generics.UpdateAPIView):
@@ -22,4 +27,21 @@ class UpdateProfileView(generics.UpdateAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        return full_user(self.request.user)
+
+class LogoutView(APIView):
+    """Revoke the access token of the request and the refresh token sent (`refresh`)"""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = RefreshToken(raw_refresh)
+            except TokenError as exc:
+                raise InvalidToken(exc.args[0])
+            if str(refresh.payload.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                raise InvalidToken("Le jeton de rafraîchissement appartient à un autre utilisateur.")
+            refresh.blacklist()
+        request.auth.blacklist()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Settings that differ under ASGI (database connections, see DB_POOL_MODE)
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
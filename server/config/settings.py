@@ -10,10 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,10 +46,12 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     
     # Local apps
+    'core',
     'authentication',
     'transactions',
     'wallets',
@@ -57,8 +61,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # CORS must be first
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,11 +91,30 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connection handling of the PostgreSQL database (DB_POOL_MODE):
+# - none: a new connection (TCP + TLS + auth) per request
+# - persistent: each worker thread keeps its connection DB_CONN_MAX_AGE seconds,
+#   checked before reuse (WSGI only)
+# - pool: psycopg 3 connection pool per process, from DB_POOL_MIN_SIZE to
+#   DB_POOL_MAX_SIZE connections (WSGI and ASGI)
+# - pgbouncer: through a transaction-pooling bouncer (PgBouncer, Supabase pooler
+#   on port 6543): no server-side cursors; connections to the bouncer are kept
+#   under WSGI, opened per request under ASGI
+# Under ASGI (config/asgi.py sets DJANGO_ASGI) the ORM runs in executor threads
+# that come and go: a connection kept per thread would leak, so persistent is
+# refused and the default is pool.
+ASGI = config('DJANGO_ASGI', default=False, cast=bool)
+DB_POOL_MODE = config('DB_POOL_MODE', default='pool' if ASGI else 'persistent')
+DB_POOL_MODES = ('none', 'persistent', 'pool', 'pgbouncer')
+if DB_POOL_MODE not in DB_POOL_MODES:
+    raise ImproperlyConfigured(f"DB_POOL_MODE must be one of {', '.join(DB_POOL_MODES)}.")
+
 if config('SUPABASE_DB_HOST', default=None) and config('SUPABASE_DB_PASSWORD', default=None):
     DATABASES = {
         'default': {
@@ -100,18 +124,105 @@ if config('SUPABASE_DB_HOST', default=None) and config('SUPABASE_DB_PASSWORD', d
             'PASSWORD': config('SUPABASE_DB_PASSWORD'),
             'HOST': config('SUPABASE_DB_HOST'),
             'PORT': config('SUPABASE_DB_PORT', default='5432'),
+            'OPTIONS': {
+                'sslmode': config('SUPABASE_DB_SSLMODE', default='prefer'),
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=10, cast=int),
+            },
         }
     }
+    if ASGI and DB_POOL_MODE == 'persistent':
+        raise ImproperlyConfigured("DB_POOL_MODE=persistent leaks connections under ASGI: use pool, pgbouncer or none.")
+    if DB_POOL_MODE == 'persistent' or (DB_POOL_MODE == 'pgbouncer' and not ASGI):
+        DATABASES['default'].update(
+            CONN_MAX_AGE=config('DB_CONN_MAX_AGE', default=600, cast=int),
+            CONN_HEALTH_CHECKS=True,
+        )
+    if DB_POOL_MODE == 'pgbouncer':
+        # A server connection only lasts a transaction: named cursors would not survive it
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    if DB_POOL_MODE == 'pool':
+        if importlib.util.find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured("DB_POOL_MODE=pool requires psycopg 3 with psycopg_pool.")
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds a request waits for a free connection
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
 else:
     print("WARNING: Supabase credentials not found. Using SQLite for local development.")
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # Concurrent writers wait for the lock instead of failing: transactions take
+                # the write lock when they start, and a busy database is retried for `timeout` seconds
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # A file rather than memory, so the tests of concurrent writers get several connections
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
 
+# Cache
+# A shared backend (Redis, Valkey, KeyDB...) is required as soon as several
+# worker processes serve requests: with the local-memory default each worker
+# keeps its own user versions and would not see the others' invalidations.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'monely',
+        }
+    }
+
+# Per-user response cache of the read endpoints (see core/cache.py)
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Bearer token giving access to /api/metrics/; without it, the metrics are
+# open in DEBUG only, otherwise reserved to staff users and METRICS_ALLOWED_IPS
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Client addresses (REMOTE_ADDR, so the proxy's one behind a reverse proxy) allowed to read the metrics
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+
+# Per-endpoint request instrumentation (see core/instrumentation.py)
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+# Seconds between two flushes of a worker's counters to the cache
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=10, cast=float)
+# Share of requests logged as JSON lines (0 to 1)
+REQUEST_LOG_SAMPLE_RATE = config('REQUEST_LOG_SAMPLE_RATE', default=0.0, cast=float)
+# Requests slower than this are logged with their slowest SQL queries (0 disables)
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=1000, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': config('LOG_LEVEL', default='INFO')},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -173,7 +284,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -189,7 +300,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # One write per login; disable when last_login is not needed
+    'UPDATE_LAST_LOGIN': config('JWT_UPDATE_LAST_LOGIN', default=True, cast=bool),
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -200,9 +312,28 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     
-    'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'AUTH_TOKEN_CLASSES': ('authentication.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.TokenRefreshSerializer',
 }
 
+# Stateless JWT authentication (see authentication/authentication.py): users of
+# tokens without up-to-date claims are cached this long per process, and the
+# in-memory blacklist filter is rebuilt from the database at this interval
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)
+# Build the user from the token claims. Deactivations and profile changes are
+# only seen by every worker through a shared cache: off by default without one
+JWT_TRUST_TOKEN_CLAIMS = config('JWT_TRUST_TOKEN_CLAIMS', default=bool(REDIS_URL), cast=bool)
+JWT_BLACKLIST_SYNC_INTERVAL = config('JWT_BLACKLIST_SYNC_INTERVAL', default=30, cast=int)
+
 # Gemini AI Configuration
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
+GEMINI_MODEL = config('GEMINI_MODEL', default='gemini-1.5-flash')
+# Dotted path of the insights backend; empty = Gemini when a key is set, else the local stub
+AI_INSIGHTS_BACKEND = config('AI_INSIGHTS_BACKEND', default='')
+
+# Exchange rates: pairs without a direct rate are crossed through this currency
+EXCHANGE_RATE_PIVOT = config('EXCHANGE_RATE_PIVOT', default='EUR')
+# Seconds a worker keeps using its memoized rates before checking the rate table for new ones
+EXCHANGE_RATES_CHECK_INTERVAL = config('EXCHANGE_RATES_CHECK_INTERVAL', default=60, cast=float)
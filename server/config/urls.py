@@ -16,10 +16,21 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from analytics.views import AsyncDashboardView, DashboardView
+from transactions.views import AsyncTransactionListView
+from wallets.views import AsyncWalletListView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),
     path('api/wallets/', include('wallets.urls')),
     path('api/transactions/', include('transactions.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/ai/', include('ai_insights.urls')),
+    path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
+    # Async read path of the hottest screens, for ASGI deployments (core/async_views.py)
+    path('api/async/wallets/', AsyncWalletListView.as_view(), name='async_wallet_list'),
+    path('api/async/transactions/', AsyncTransactionListView.as_view(), name='async_transaction_list'),
+    path('api/async/dashboard/', AsyncDashboardView.as_view(), name='async_dashboard'),
+    path('api/', include('core.urls')),
 ]
@@ -0,0 +1,12 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin configuration for Job model"""
+    list_display = ('name', 'status', 'run_at', 'attempts', 'locked_by', 'updated_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'key')
+    ordering = ('-run_at',)
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'result', 'created_at', 'updated_at')
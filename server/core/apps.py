@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from django.utils.module_loading import autodiscover_modules
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_wrapper, instrument_serializers
+
+        if settings.INSTRUMENTATION_ENABLED:
+            instrument_serializers()
+            connection_created.connect(install_query_wrapper)
+
+        # Register the handlers declared in each app's jobs.py
+        autodiscover_modules('jobs')
@@ -0,0 +1,116 @@
+"""
+Async read views for the high-traffic list endpoints.
+
+Under ASGI (`uvicorn config.asgi:application`) these views await the
+database through Django's async ORM instead of holding a worker thread
+for the whole request, so a worker keeps accepting connections while
+queries are in flight. They authenticate with the same JWT as the DRF
+views, share the per-user response cache and render the same JSON; only
+the read path of the hottest screens is duplicated, every write stays
+on the DRF viewsets. Under WSGI they still work, run through async_to_sync.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from authentication.authentication import StatelessJWTAuthentication
+from . import cache
+
+
+class AsyncJWTAuthentication(StatelessJWTAuthentication):
+    """StatelessJWTAuthentication for async views"""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        # The blacklist check may query the database (filter sync, possible match)
+        validated_token = await sync_to_async(self.get_validated_token)(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+
+class AsyncReadView(View):
+    """
+    Authenticated, cached GET rendered as JSON. Subclasses implement
+    `async build(request)` returning the response data; they may raise
+    DRF exceptions, rendered like DRF does.
+    """
+    http_method_names = ['get']
+    authentication = AsyncJWTAuthentication()
+    renderer = JSONRenderer()
+    # Whether the data depends on the current date (see core/cache.py)
+    cache_dated = False
+
+    async def get(self, request, *args, **kwargs):
+        # Lets the query parameter helpers shared with the DRF views read it
+        request.query_params = request.GET
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+            request.user, request.auth = authenticated
+            return await self.cached(request)
+        except APIException as exc:
+            return self.render_exception(exc)
+
+    async def cached(self, request):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return self.render(await self.build(request))
+        headers, key, data = await sync_to_async(cache.lookup)(request, self.cache_dated)
+        if data is cache.NOT_MODIFIED:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if data is None:
+            data = await self.build(request)
+            await django_cache.aset(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+        return self.render(data, headers=headers)
+
+    async def build(self, request):
+        raise NotImplementedError
+
+    async def paginate(self, request, queryset, serializer_class):
+        """Same page as DRF's PageNumberPagination: `count`, links and `results`"""
+        size = api_settings.PAGE_SIZE
+        try:
+            number = int(request.GET.get('page', 1))
+        except ValueError:
+            raise NotFound("Page invalide.")
+        count = await queryset.acount()
+        if not 1 <= number <= max(1, math.ceil(count / size)):
+            raise NotFound("Page invalide.")
+        rows = [row async for row in queryset[(number - 1) * size:number * size]]
+
+        url = request.build_absolute_uri()
+        previous = None
+        if number == 2:
+            previous = remove_query_param(url, 'page')
+        elif number > 2:
+            previous = replace_query_param(url, 'page', number - 1)
+        return {
+            'count': count,
+            'next': replace_query_param(url, 'page', number + 1) if number * size < count else None,
+            'previous': previous,
+            'results': serializer_class(rows, many=True).data,
+        }
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        return HttpResponse(
+            self.renderer.render(data), status=status_code, headers=headers,
+            content_type='application/json',
+        )
+
+    def render_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        headers = None
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            headers = {'WWW-Authenticate': self.authentication.authenticate_header(None)}
+        return self.render(data, exc.status_code, headers)
@@ -0,0 +1,379 @@
+"""
+In-process API benchmark.
+
+Every endpoint is called through the Django test client with a real JWT,
+so routing, authentication, middleware, serialization and SQL are all
+measured; only the network and the WSGI server are left out. Database
+connections are recycled around each request like the server does, so
+the cost of opening one shows in the latencies unless DB_POOL_MODE keeps
+them. For each endpoint the latency percentiles and the number of SQL
+queries per request are reported.
+
+ENDPOINTS must cover every route under /api/ (uncovered_routes(), checked
+by the tests). Writes are reverted after each endpoint: the rows they
+created are deleted, and updates write the values already stored.
+"""
+import platform
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from dataclasses import dataclass, field
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import close_old_connections, connections
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, resolve
+from django.utils import timezone
+
+from authentication.tokens import RefreshToken
+from transactions.models import Category, Transaction
+from transactions.pagination import TransactionKeysetPagination
+from wallets.models import Budget, FixedExpense, SavingGoal, Wallet
+from . import synthetic
+from .models import Job
+
+
+@dataclass
+class Endpoint:
+    name: str
+    path: str
+    method: str = 'get'
+    # Body of a write, formatted with the fixture like the path; `{iteration}`
+    # is unique per request
+    data: dict = field(default_factory=dict)
+    authenticated: bool = True
+    write: bool = False
+    # Endpoints that are slow by design (password hashing) run fewer times
+    max_iterations: int = None
+    # Models whose rows created by the endpoint are deleted afterwards, in this order
+    cleanup: tuple = ()
+    # (filename, content) sent as the multipart `file` field next to `data`
+    upload: tuple = None
+    # Each request gets its own token pair, as `{refresh}` (refresh, logout)
+    fresh_token: bool = False
+    # Extra request headers, formatted with the fixture
+    headers: dict = field(default_factory=dict)
+
+
+IMPORT_CSV = (
+    'name,amount,date,category,external_id\n'
+    'Benchmark,-12.50,{today},Alimentation,bench-{iteration}-1\n'
+    'Benchmark,40,{today},Salaire,bench-{iteration}-2\n'
+)
+
+ENDPOINTS = [
+    Endpoint('auth.login', '/api/auth/login/', 'post',
+             data={'email': '{email}', 'password': synthetic.PASSWORD},
+             authenticated=False, max_iterations=10),
+    Endpoint('auth.register', '/api/auth/register/', 'post', write=True, authenticated=False, max_iterations=10,
+             cleanup=(get_user_model(),), data={
+                 'email': 'bench-{iteration}@register.monely.test', 'username': 'bench-{iteration}',
+                 'name': 'Benchmark', 'password': synthetic.PASSWORD, 'password_confirm': synthetic.PASSWORD,
+             }),
+    Endpoint('auth.refresh', '/api/auth/refresh/', 'post', data={'refresh': '{refresh}'},
+             authenticated=False, fresh_token=True),
+    Endpoint('auth.logout', '/api/auth/logout/', 'post', data={'refresh': '{refresh}'}, fresh_token=True),
+    Endpoint('auth.profile', '/api/auth/profile/'),
+    Endpoint('wallets.list', '/api/wallets/wallets/'),
+    Endpoint('wallets.detail', '/api/wallets/wallets/{wallet}/'),
+    Endpoint('wallets.create', '/api/wallets/wallets/', 'post', write=True, cleanup=(Wallet,), data={
+        'name': 'Benchmark', 'type': 'cash', 'currency': 'EUR',
+    }),
+    Endpoint('wallets.update', '/api/wallets/wallets/{wallet}/', 'patch', write=True,
+             data={'name': '{wallet_name}'}),
+    Endpoint('wallets.projection', '/api/wallets/projection/'),
+    Endpoint('goals.list', '/api/wallets/goals/'),
+    Endpoint('goals.detail', '/api/wallets/goals/{goal}/'),
+    Endpoint('goals.create', '/api/wallets/goals/', 'post', write=True, cleanup=(SavingGoal,), data={
+        'name': 'Benchmark', 'target_amount': '1000', 'deadline': '{next_year}',
+    }),
+    Endpoint('fixed_expenses.list', '/api/wallets/fixed-expenses/'),
+    Endpoint('fixed_expenses.detail', '/api/wallets/fixed-expenses/{fixed_expense}/'),
+    Endpoint('fixed_expenses.create', '/api/wallets/fixed-expenses/', 'post', write=True,
+             cleanup=(FixedExpense,), data={'name': 'Benchmark', 'amount': '9.99', 'currency': 'EUR'}),
+    Endpoint('budgets.list', '/api/wallets/budgets/'),
+    Endpoint('budgets.detail', '/api/wallets/budgets/{budget}/'),
+    Endpoint('budgets.create', '/api/wallets/budgets/', 'post', write=True, cleanup=(Budget, Category), data={
+        'category': 'Benchmark {iteration}', 'period': 'monthly', 'limit': '100', 'currency': 'EUR',
+    }),
+    Endpoint('budget_alerts.list', '/api/wallets/budget-alerts/'),
+    Endpoint('budget_alerts.detail', '/api/wallets/budget-alerts/{budget_alert}/'),
+    Endpoint('transactions.list', '/api/transactions/transactions/'),
+    Endpoint('transactions.list_deep', '/api/transactions/transactions/?cursor={deep_cursor}'),
+    Endpoint('transactions.list_page', '/api/transactions/transactions/?page=1'),
+    Endpoint('transactions.list_filtered', '/api/transactions/transactions/?type=expense&wallet={wallet}'),
+    Endpoint('transactions.list_category', '/api/transactions/transactions/?category=Alimentation'),
+    Endpoint('transactions.search', '/api/transactions/transactions/?search=carrefour'),
+    Endpoint('transactions.detail', '/api/transactions/transactions/{transaction}/'),
+    Endpoint('transactions.create', '/api/transactions/transactions/', 'post', write=True,
+             cleanup=(Transaction,), data={
+                 'wallet': '{wallet}', 'name': 'Benchmark', 'amount': '12.50', 'category': 'Alimentation',
+                 'type': 'expense', 'date': '{now}',
+             }),
+    Endpoint('transactions.update', '/api/transactions/transactions/{transaction}/', 'patch', write=True,
+             data={'name': '{transaction_name}'}),
+    Endpoint('transactions.batch', '/api/transactions/transactions/batch/', 'post', write=True,
+             cleanup=(Transaction,), data={'operations': [
+                 {'op': 'create', 'data': {
+                     'wallet': '{wallet}', 'name': 'Benchmark', 'amount': '12.50', 'category': 'Alimentation',
+                     'type': 'expense', 'date': '{now}',
+                 }},
+             ] * 10}),
+    Endpoint('transactions.import', '/api/transactions/transactions/import/', 'post', write=True,
+             cleanup=(Transaction,), data={'wallet': '{wallet}'}, upload=('benchmark.csv', IMPORT_CSV)),
+    Endpoint('transactions.export', '/api/transactions/transactions/export/?date_from={last_month}'),
+    Endpoint('categories.list', '/api/transactions/categories/'),
+    Endpoint('categories.detail', '/api/transactions/categories/{category}/'),
+    Endpoint('categories.create', '/api/transactions/categories/', 'post', write=True, cleanup=(Category,),
+             data={'name': 'Benchmark {iteration}'}),
+    Endpoint('analytics.summary', '/api/analytics/summary/'),
+    Endpoint('analytics.categories', '/api/analytics/categories/'),
+    Endpoint('analytics.trends', '/api/analytics/trends/?months=12'),
+    Endpoint('analytics.balance_history', '/api/analytics/balance-history/'),
+    Endpoint('ai.insights', '/api/ai/insights/', cleanup=(Job,)),
+    Endpoint('dashboard', '/api/dashboard/'),
+    Endpoint('async.wallets', '/api/async/wallets/'),
+    Endpoint('async.transactions', '/api/async/transactions/'),
+    Endpoint('async.dashboard', '/api/async/dashboard/'),
+    Endpoint('sync', '/api/sync/?limit=100'),
+    Endpoint('metrics', '/api/metrics/', authenticated=False,
+             headers={'HTTP_AUTHORIZATION': 'Bearer {metrics_token}'}),
+    # Last: a profile change stops the claims of the tokens issued before it being trusted
+    Endpoint('auth.profile_update', '/api/auth/profile/update/', 'patch', write=True,
+             data={'currency': '{currency}'}),
+]
+
+
+def api_routes(patterns=None, prefix=''):
+    """Names of the routes under /api/ (format suffix variants share their route's name)"""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            names |= api_routes(pattern.url_patterns, route)
+        elif route.startswith('api/') and pattern.name != 'api-root':
+            names.add(pattern.name)
+    return names
+
+
+def uncovered_routes():
+    """API routes without any endpoint in ENDPOINTS"""
+    covered = {resolve(endpoint.path.split('?')[0]).url_name for endpoint in ENDPOINTS}
+    return sorted(api_routes() - covered)
+
+
+def percentile(sorted_values, fraction):
+    """Linear interpolation between closest ranks"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(durations, query_counts):
+    durations = sorted(durations)
+    return {
+        'iterations': len(durations),
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(durations, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'max_ms': round(durations[-1] * 1000, 3),
+        'queries': {
+            'min': min(query_counts),
+            'max': max(query_counts),
+            'mean': round(statistics.fmean(query_counts), 2),
+        },
+    }
+
+
+def build_fixture(user):
+    """Ids and values substituted in the endpoint paths and bodies"""
+    wallet = user.wallets.order_by('pk').first()
+    transactions = Transaction.objects.filter(user=user)
+    total = transactions.count()
+    latest = transactions.select_related('category').first()
+    # Cursor pointing far into the history, to show keyset pages stay flat
+    deep = transactions[max(total - 50, 0)] if total else None
+    cursor = TransactionKeysetPagination().encode_cursor(deep) if deep else ''
+    today = timezone.localdate()
+
+    def first_pk(queryset):
+        return queryset.order_by('pk').values_list('pk', flat=True).first() or 0
+
+    return {
+        'email': user.email,
+        'metrics_token': settings.METRICS_TOKEN,
+        'currency': user.currency,
+        'wallet': wallet.pk if wallet else 0,
+        'wallet_name': wallet.name if wallet else '',
+        'transaction': latest.pk if latest else 0,
+        'transaction_name': latest.name if latest else '',
+        'goal': first_pk(user.saving_goals),
+        'fixed_expense': first_pk(user.fixed_expenses),
+        'budget': first_pk(user.budgets),
+        'budget_alert': first_pk(user.budget_alerts),
+        'category': first_pk(user.categories),
+        'deep_cursor': cursor,
+        'now': timezone.now().isoformat(),
+        'today': today.isoformat(),
+        'last_month': (today - timedelta(days=31)).isoformat(),
+        'next_year': (today + timedelta(days=365)).isoformat(),
+    }
+
+
+def render(value, fixture):
+    if isinstance(value, str):
+        return value.format(**fixture)
+    if isinstance(value, dict):
+        return {key: render(item, fixture) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, fixture) for item in value]
+    return value
+
+
+def database_version(connection):
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version
+    if connection.vendor == 'postgresql':
+        return str(connection.pg_version)
+    return None
+
+
+def request_boundary(connection):
+    """
+    What the request handler does when a request starts and ends: close the
+    connections that are too old or unusable (every one with CONN_MAX_AGE=0,
+    or back to the pool). The test client skips it; inside a transaction
+    (tests) it must be skipped too.
+    """
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def connection_setup(connection, iterations=20):
+    """Time to get a usable connection and run a first query, as a request without a kept one does"""
+    if connection.in_atomic_block:
+        return None
+    durations = []
+    for _ in range(iterations):
+        connection.close()
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+    }
+
+
+def run(user, iterations=50, warmup=3, writes=True, only=None, using='default'):
+    """Benchmark every endpoint as `user` and return the JSON-serializable report"""
+    client = Client()
+    token = str(RefreshToken.for_user(user).access_token)
+    fixture = build_fixture(user)
+    connection = connections[using]
+
+    results = []
+    run_id = uuid.uuid4().hex[:8]
+    for endpoint in ENDPOINTS:
+        if endpoint.write and not writes:
+            continue
+        if only and endpoint.name not in only:
+            continue
+        path = render(endpoint.path, fixture)
+        send = getattr(client, endpoint.method)
+        count = min(iterations, endpoint.max_iterations or iterations)
+
+        durations, query_counts, statuses = [], [], set()
+        last_pks = {model: model.objects.aggregate(last=Max('pk'))['last'] or 0 for model in endpoint.cleanup}
+        for index in range(warmup + count):
+            values = {**fixture, 'iteration': f'{run_id}-{index}'}
+            access = token
+            if endpoint.fresh_token:
+                refresh = RefreshToken.for_user(user)
+                values['refresh'], access = str(refresh), str(refresh.access_token)
+            headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'} if endpoint.authenticated else {}
+            headers.update(render(endpoint.headers, values))
+            data = render(endpoint.data, values)
+            if endpoint.upload:
+                filename, content = endpoint.upload
+                data['file'] = SimpleUploadedFile(filename, render(content, values).encode())
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                request_boundary(connection)
+                if endpoint.method == 'get':
+                    response = send(path, **headers)
+                elif endpoint.upload:
+                    response = send(path, data, **headers)
+                else:
+                    response = send(path, data, content_type='application/json', **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                request_boundary(connection)
+                elapsed = time.perf_counter() - started
+            if index < warmup:
+                continue
+            durations.append(elapsed)
+            query_counts.append(len(queries))
+            statuses.add(response.status_code)
+
+        # Leave the dataset as it was; delete() one by one so the ledger reverts each transaction
+        for model in endpoint.cleanup:
+            for row in model.objects.filter(pk__gt=last_pks[model]):
+                row.delete()
+
+        results.append({
+            'name': endpoint.name,
+            'method': endpoint.method.upper(),
+            'path': endpoint.path,
+            'status': sorted(statuses),
+            **summarize(durations, query_counts),
+        })
+
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'database_version': database_version(connection),
+            'db_pool_mode': settings.DB_POOL_MODE if connection.vendor == 'postgresql' else None,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'connection_setup': connection_setup(connection),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'dataset': synthetic.dataset_summary(user),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Endpoints whose p95 latency or query count regressed against a previous
+    report; latency regressions below `tolerance` (a ratio) are ignored.
+    """
+    previous = {entry['name']: entry for entry in baseline.get('endpoints', [])}
+    regressions = []
+    for entry in report['endpoints']:
+        before = previous.get(entry['name'])
+        if before is None:
+            continue
+        if entry['queries']['max'] > before['queries']['max']:
+            regressions.append(
+                f"{entry['name']}: {before['queries']['max']} -> {entry['queries']['max']} requêtes"
+            )
+        if before['p95_ms'] and entry['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{entry['name']}: p95 {before['p95_ms']} -> {entry['p95_ms']} ms")
+    return regressions
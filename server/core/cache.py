@@ -0,0 +1,180 @@
+"""
+Per-user response cache for read endpoints.
+
+Every user owns a version number stored in the cache backend. Cached
+responses, ETags and Last-Modified dates are derived from it, and any
+write to the user's data bumps it once the transaction commits, so
+invalidation is a single INCR and stale entries simply expire. Responses
+that depend on the current date (month-to-date totals, upcoming
+occurrences) are also keyed by the day, so they expire at midnight.
+"""
+import hashlib
+import time
+from datetime import datetime, time as day_start
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'user-cache:version:{}'
+MODIFIED_KEY = 'user-cache:modified:{}'
+# Version of the data shared by all users (exchange rates), added to every user's
+SHARED_VERSION_KEY = 'user-cache:version:shared'
+SHARED_MODIFIED_KEY = 'user-cache:modified:shared'
+RESPONSE_KEY = 'user-cache:response:{}:{}:{}'
+HITS_KEY = 'user-cache:metrics:hits'
+MISSES_KEY = 'user-cache:metrics:misses'
+NOT_MODIFIED_KEY = 'user-cache:metrics:not_modified'
+
+# Versions outlive cached responses so an evicted version never reuses an old number
+VERSION_TIMEOUT = None
+
+
+def _ensure(values, key):
+    if values.get(key) is None:
+        # Seed from the clock: a re-created version can never collide with an evicted one
+        cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        values[key] = cache.get(key)
+    return values[key]
+
+
+def get_user_version(user_id):
+    """
+    Return (version, last_modified timestamp) for a user, initializing them
+    if needed. Both also move when the shared data changes.
+    """
+    keys = (VERSION_KEY.format(user_id), MODIFIED_KEY.format(user_id), SHARED_VERSION_KEY, SHARED_MODIFIED_KEY)
+    values = cache.get_many(keys)
+    version = _ensure(values, keys[0]) + _ensure(values, SHARED_VERSION_KEY)
+    modified = values.get(keys[1])
+    if modified is None:
+        modified = int(time.time())
+        cache.add(keys[1], modified, VERSION_TIMEOUT)
+    return version, max(modified, values.get(SHARED_MODIFIED_KEY) or 0)
+
+
+def _bump(version_key, modified_key):
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, time.time_ns(), VERSION_TIMEOUT)
+    cache.set(modified_key, int(time.time()), VERSION_TIMEOUT)
+
+
+def bump_user_version(user_id):
+    """
+    Invalidate everything cached for a user.
+    Deferred to commit so a concurrent read can never cache pre-commit
+    data under the new version.
+    """
+    if user_id is not None:
+        transaction.on_commit(lambda: _bump(VERSION_KEY.format(user_id), MODIFIED_KEY.format(user_id)))
+
+
+def bump_shared_version():
+    """Invalidate everything cached for every user, once the transaction commits"""
+    transaction.on_commit(lambda: _bump(SHARED_VERSION_KEY, SHARED_MODIFIED_KEY))
+
+
+def _count(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_metrics():
+    """Hit/miss counters, shared by all workers when the backend is shared"""
+    values = cache.get_many([HITS_KEY, MISSES_KEY, NOT_MODIFIED_KEY])
+    return {
+        'hits': values.get(HITS_KEY, 0),
+        'misses': values.get(MISSES_KEY, 0),
+        'not_modified': values.get(NOT_MODIFIED_KEY, 0),
+    }
+
+
+# Marker returned by lookup() when the client's copy is still valid
+NOT_MODIFIED = object()
+
+
+def lookup(request, dated=False):
+    """
+    Look a GET up in the user's cache; `dated` responses also depend on today.
+    Returns (headers, key, hit): hit is NOT_MODIFIED, the cached data or None.
+    """
+    user_id = request.user.pk
+    version, modified = get_user_version(user_id)
+    today = ''
+    if dated:
+        today = timezone.localdate()
+        midnight = timezone.make_aware(datetime.combine(today, day_start.min))
+        modified = max(modified, int(midnight.timestamp()))
+    renderer = getattr(request, 'accepted_renderer', None)
+    fingerprint = hashlib.md5(
+        f"{request.get_host()}|{request.get_full_path()}|{getattr(renderer, 'format', '')}|{today}".encode()
+    ).hexdigest()
+    etag = f'W/"{version:x}-{fingerprint[:16]}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(modified),
+        'Cache-Control': 'private, no-cache',
+    }
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if (if_none_match and etag in if_none_match) or (
+        not if_none_match and if_modified_since and modified <= if_modified_since
+    ):
+        _count(NOT_MODIFIED_KEY)
+        return headers, None, NOT_MODIFIED
+
+    key = RESPONSE_KEY.format(user_id, version, fingerprint)
+    data = cache.get(key)
+    _count(MISSES_KEY if data is None else HITS_KEY)
+    return headers, key, data
+
+
+def cached_response(request, build, dated=False):
+    """
+    Serve a GET from the user's cache, or build and store it.
+    `build` is called on a miss and must return a DRF Response; pass
+    `dated` when it depends on the current date.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED or not request.user.is_authenticated:
+        return build()
+
+    headers, key, data = lookup(request, dated)
+    if data is NOT_MODIFIED:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if data is not None:
+        response = Response(data)
+    else:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class CachedReadMixin:
+    """Cache `list` and `retrieve` of a ViewSet per user"""
+    # Whether the responses depend on the current date
+    cache_dated = False
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, lambda: super(CachedReadMixin, self).list(request, *args, **kwargs), self.cache_dated
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs), self.cache_dated
+        )
@@ -0,0 +1,367 @@
+"""
+Per-endpoint request instrumentation.
+
+`InstrumentationMiddleware` measures, for each request, the wall time,
+the number and duration of SQL queries (through an execute wrapper on
+every connection, which reports to the probe of the current context:
+under ASGI the ORM runs in other threads, which inherit that context
+through sync_to_async), the time spent in serializers (validation and representation)
+and the response size. Measures are aggregated per (route, method) under
+the URL pattern, not the raw path, so ids never multiply the series.
+
+Aggregates are accumulated in process and flushed every
+`METRICS_FLUSH_INTERVAL` seconds to the cache backend as integer
+counters, so with a shared backend /api/metrics/ reports every worker.
+Requests slower than `SLOW_REQUEST_THRESHOLD_MS` are logged with their
+slowest SQL queries, and a `REQUEST_LOG_SAMPLE_RATE` share of requests
+is logged as one JSON line each.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('core.slow_requests')
+
+# Upper bounds of the request duration histogram, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Queries kept per request for the slow request log
+MAX_CAPTURED_QUERIES = 500
+SLOW_QUERIES_LOGGED = 10
+
+SERIES_KEY = 'instrumentation:series'
+COUNTER_KEY = 'instrumentation:{}:{}'
+# Counters of a series; durations are stored in microseconds
+FIELDS = ('requests', 'duration_us', 'db_queries', 'db_duration_us', 'serializer_us', 'response_bytes') + tuple(
+    f'bucket:{bound}' for bound in DURATION_BUCKETS
+)
+
+# Probe of the request being processed, read by the query wrapper and the serializer timers
+_probe = ContextVar('instrumentation_probe', default=None)
+
+
+class RequestProbe:
+    """Measures of one request, collected while it is processed"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+        self.serializer_depth = 0
+        self.queries = []
+        self.lock = threading.Lock()
+        self.finished = False
+
+    def record_query(self, duration, sql):
+        # Queries of one request may run in several threads
+        with self.lock:
+            self.db_queries += 1
+            self.db_duration += duration
+            if len(self.queries) < MAX_CAPTURED_QUERIES:
+                self.queries.append((duration, sql))
+
+    def install(self):
+        _probe.set(self)
+
+    def uninstall(self):
+        # A streamed body may end in another context, where the probe is not set
+        if _probe.get() is self:
+            _probe.set(None)
+        self.finished = True
+
+
+def measure_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection: times the query for the current request, if any"""
+    probe = _probe.get()
+    if probe is None or probe.finished:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        probe.record_query(time.perf_counter() - started, sql)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """connection_created handler: connections are per thread, wrap each one once"""
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(measure_query)
+
+
+def timed_serializer(method):
+    """Add the time spent in a serializer method to the current request"""
+    def wrapper(*args, **kwargs):
+        probe = _probe.get()
+        if probe is None:
+            return method(*args, **kwargs)
+        # Nested serializers are already counted by the outermost one
+        probe.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            probe.serializer_depth -= 1
+            if not probe.serializer_depth:
+                probe.serializer_duration += time.perf_counter() - started
+    wrapper.__wrapped__ = method
+    return wrapper
+
+
+def instrument_serializers():
+    """Time DRF serializers' validation and representation (called once at startup)"""
+    from rest_framework.serializers import BaseSerializer
+
+    if hasattr(BaseSerializer.data.fget, '__wrapped__'):
+        return
+    BaseSerializer.is_valid = timed_serializer(BaseSerializer.is_valid)
+    BaseSerializer.data = property(timed_serializer(BaseSerializer.data.fget))
+
+
+def route_label(request):
+    """URL pattern of the request, ids replaced by their placeholder"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    route = match.route.replace('^', '').replace('$', '')
+    route = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', route)
+    return '/' + route
+
+
+class Registry:
+    """Per-process aggregates, flushed to the cache backend periodically"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.series = set()
+        self.flushed_at = time.monotonic()
+
+    def record(self, route, method, status, duration, probe, size):
+        series = (route, method, status)
+        values = {
+            'requests': 1,
+            'duration_us': int(duration * 1_000_000),
+            'db_queries': probe.db_queries,
+            'db_duration_us': int(probe.db_duration * 1_000_000),
+            'serializer_us': int(probe.serializer_duration * 1_000_000),
+            'response_bytes': size,
+        }
+        for bound in DURATION_BUCKETS:
+            if duration <= bound:
+                values[f'bucket:{bound}'] = 1
+        with self.lock:
+            counters = self.pending.setdefault(series, {})
+            for field, value in values.items():
+                counters[field] = counters.get(field, 0) + value
+            due = time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+            self.series |= pending.keys()
+            known = set(self.series)
+        for series, counters in pending.items():
+            for field, value in counters.items():
+                if not value:
+                    continue
+                key = COUNTER_KEY.format('|'.join(map(str, series)), field)
+                cache.add(key, 0, None)
+                try:
+                    cache.incr(key, value)
+                except ValueError:
+                    cache.set(key, value, None)
+        # Read-merge-write of the series index: a series lost to a concurrent
+        # writer (or an eviction) is re-added by the next flush of any worker
+        # that knows it
+        stored = {tuple(item) for item in cache.get(SERIES_KEY) or ()}
+        if not known <= stored:
+            cache.set(SERIES_KEY, sorted(stored | known), None)
+
+    def snapshot(self):
+        """{(route, method, status): {field: value}} of every worker"""
+        self.flush()
+        series = [tuple(item) for item in cache.get(SERIES_KEY) or ()]
+        keys = {
+            COUNTER_KEY.format('|'.join(map(str, item)), field): (item, field)
+            for item in series for field in FIELDS
+        }
+        values = cache.get_many(list(keys))
+        result = {item: dict.fromkeys(FIELDS, 0) for item in series}
+        for key, value in values.items():
+            item, field = keys[key]
+            result[item][field] = value
+        return result
+
+
+registry = Registry()
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_lines():
+    """Per-endpoint metrics in the Prometheus text format"""
+    snapshot = registry.snapshot()
+
+    by_endpoint = {}
+    for (route, method, status), counters in sorted(snapshot.items()):
+        endpoint = by_endpoint.setdefault((route, method), dict.fromkeys(FIELDS, 0))
+        for field, value in counters.items():
+            endpoint[field] += value
+
+    def labels(route, method, **extra):
+        pairs = {'route': route, 'method': method, **extra}
+        return ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs.items())
+
+    lines = [
+        '# HELP monely_http_requests_total Requests by route, method and status.',
+        '# TYPE monely_http_requests_total counter',
+    ]
+    for (route, method, status), counters in sorted(snapshot.items()):
+        lines.append(f'monely_http_requests_total{{{labels(route, method, status=status)}}} {counters["requests"]}')
+
+    lines += [
+        '# HELP monely_http_request_duration_seconds Wall time of the requests.',
+        '# TYPE monely_http_request_duration_seconds histogram',
+    ]
+    for (route, method), counters in by_endpoint.items():
+        for bound in DURATION_BUCKETS:
+            le = labels(route, method, le=bound)
+            lines.append(f'monely_http_request_duration_seconds_bucket{{{le}}} {counters[f"bucket:{bound}"]}')
+        lines += [
+            f'monely_http_request_duration_seconds_bucket{{{labels(route, method, le="+Inf")}}} '
+            f'{counters["requests"]}',
+            f'monely_http_request_duration_seconds_sum{{{labels(route, method)}}} '
+            f'{counters["duration_us"] / 1_000_000:.6f}',
+            f'monely_http_request_duration_seconds_count{{{labels(route, method)}}} {counters["requests"]}',
+        ]
+
+    totals = (
+        ('monely_http_db_queries_total', 'SQL queries run by the requests.', 'db_queries', False),
+        ('monely_http_db_duration_seconds_total', 'Time spent in SQL queries.', 'db_duration_us', True),
+        ('monely_http_serializer_duration_seconds_total', 'Time spent in serializers.', 'serializer_us', True),
+        ('monely_http_response_size_bytes_total', 'Size of the response bodies.', 'response_bytes', False),
+    )
+    for name, help_text, field, microseconds in totals:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (route, method), counters in by_endpoint.items():
+            value = f'{counters[field] / 1_000_000:.6f}' if microseconds else counters[field]
+            lines.append(f'{name}{{{labels(route, method)}}} {value}')
+    return lines
+
+
+class InstrumentationMiddleware:
+    """Measure every request and record it per endpoint (see module docstring)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            # Keeps the ASGI chain async down to the async views
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.INSTRUMENTATION_ENABLED:
+            return self.get_response(request)
+
+        probe = RequestProbe()
+        probe.install()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            probe.uninstall()
+            raise
+        return self.measure(request, response, probe)
+
+    async def __acall__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return await self.get_response(request)
+
+        probe = RequestProbe()
+        probe.install()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            probe.uninstall()
+            raise
+        return self.measure(request, response, probe)
+
+    def measure(self, request, response, probe):
+        if response.streaming:
+            # Queries and serialization continue while the body is streamed;
+            # the generator is closed with the response
+            stream = self.astream if response.is_async else self.stream
+            response.streaming_content = stream(request, response, response.streaming_content, probe)
+        else:
+            probe.uninstall()
+            self.finish(request, response, probe, len(response.content))
+        return response
+
+    def stream(self, request, response, content, probe):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            probe.uninstall()
+            self.finish(request, response, probe, size)
+
+    async def astream(self, request, response, content, probe):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            probe.uninstall()
+            self.finish(request, response, probe, size)
+
+    def finish(self, request, response, probe, size):
+        duration = time.perf_counter() - probe.started
+        route = route_label(request)
+        registry.record(route, request.method, response.status_code, duration, probe, size)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        slow = threshold and duration * 1000 >= threshold
+        sampled = random.random() < settings.REQUEST_LOG_SAMPLE_RATE
+        if not slow and not sampled:
+            return
+
+        entry = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_queries': probe.db_queries,
+            'db_ms': round(probe.db_duration * 1000, 2),
+            'serializer_ms': round(probe.serializer_duration * 1000, 2),
+            'response_bytes': size,
+            'user': getattr(getattr(request, 'user', None), 'pk', None),
+        }
+        if sampled:
+            logger.info(json.dumps(entry))
+        if slow:
+            entry['slow_queries'] = [
+                {'ms': round(query_duration * 1000, 2), 'sql': sql}
+                for query_duration, sql in sorted(probe.queries, key=lambda item: -item[0])[:SLOW_QUERIES_LOGGED]
+            ]
+            slow_logger.warning(json.dumps(entry))
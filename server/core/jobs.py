@@ -0,0 +1,161 @@
+"""
+Database-backed job queue.
+
+Apps declare their jobs in a `jobs.py` module (autodiscovered at startup):
+
+    @jobs.register('wallets.post_fixed_expenses', every=timedelta(minutes=15))
+    def post_fixed_expenses(payload):
+        ...
+
+`enqueue()` stores a Job row; `run_worker` claims and runs due rows.
+Claiming is a compare-and-swap UPDATE on the row's status, so two workers
+can never run the same job, and rows already locked by another worker are
+skipped with SELECT ... FOR UPDATE SKIP LOCKED where supported. A job whose
+worker died is picked up again once its lease expires.
+"""
+import logging
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# A running job not finished after this long is considered abandoned
+LEASE = timedelta(minutes=10)
+MAX_ATTEMPTS = 5
+
+
+@dataclass
+class JobType:
+    name: str
+    func: callable
+    # Periodic jobs are re-enqueued `every` after each run
+    every: timedelta = None
+    max_attempts: int = MAX_ATTEMPTS
+
+
+registry = {}
+
+
+def register(name, every=None, max_attempts=MAX_ATTEMPTS):
+    """Decorator declaring a job handler; the handler receives the payload dict"""
+    def decorator(func):
+        registry[name] = JobType(name, func, every, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, key=None):
+    """
+    Queue a job. With a `key`, nothing is queued while another job with
+    the same key is waiting or running; the existing job is returned.
+    """
+    if name not in registry:
+        raise KeyError(f"Tâche inconnue : {name}")
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name, payload=payload or {}, run_at=run_at or timezone.now(), key=key
+            )
+    except IntegrityError:
+        if key is None:
+            raise
+        return Job.objects.filter(key=key, status__in=['queued', 'running']).first()
+
+
+def schedule_periodic():
+    """Make sure every periodic job has a queued (or running) instance"""
+    active = set(
+        Job.objects.filter(status__in=['queued', 'running'], key__in=[
+            name for name, job_type in registry.items() if job_type.every
+        ]).values_list('key', flat=True)
+    )
+    for name, job_type in registry.items():
+        if job_type.every and name not in active:
+            enqueue(name, key=name)
+
+
+def claim(worker, limit=10, now=None):
+    """Claim up to `limit` due jobs for `worker` and return them"""
+    now = now or timezone.now()
+    due = Job.objects.filter(
+        Q(status='queued', run_at__lte=now) | Q(status='running', locked_at__lt=now - LEASE)
+    ).order_by('run_at', 'pk')
+
+    claimed = []
+    with transaction.atomic():
+        connection = connections[router.db_for_write(Job)]
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        for job in due.only('pk', 'status', 'locked_at')[:limit]:
+            # Compare-and-swap: only one worker sees its UPDATE match the row
+            won = Job.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+            )
+            if won:
+                claimed.append(job.pk)
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def run(job):
+    """Run one claimed job and record its outcome"""
+    job_type = registry.get(job.name)
+    now = timezone.now()
+    try:
+        if job_type is None:
+            raise KeyError(f"Tâche inconnue : {job.name}")
+        result = job_type.func(job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.name)
+        max_attempts = job_type.max_attempts if job_type else 1
+        retry = job.attempts < max_attempts
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            status='queued' if retry else 'failed',
+            # Exponential backoff: 30 s, 1 min, 2 min...
+            run_at=now + timedelta(seconds=30 * 2 ** (job.attempts - 1)) if retry else job.run_at,
+            last_error=traceback.format_exc(),
+            locked_by='', locked_at=None, updated_at=now,
+        )
+        if not retry and job_type and job_type.every:
+            enqueue(job.name, run_at=now + job_type.every, key=job.key)
+        return False
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status='done', result=result, last_error='', locked_by='', locked_at=None, updated_at=now,
+    )
+    if job_type.every:
+        enqueue(job.name, run_at=now + job_type.every, key=job.key)
+    return True
+
+
+def run_pending(worker, limit=10):
+    """Claim and run due jobs until none is left; returns the number run"""
+    count = 0
+    while jobs := claim(worker, limit):
+        for job in jobs:
+            run(job)
+            count += 1
+    return count
+
+
+def purge(older_than=timedelta(days=7)):
+    """Delete finished jobs"""
+    return Job.objects.filter(
+        status__in=['done', 'failed'], updated_at__lt=timezone.now() - older_than
+    ).delete()
+
+
+@register('core.cleanup', every=timedelta(days=1))
+def cleanup(payload):
+    """Delete finished jobs and expired sync tombstones"""
+    from .sync import purge_tombstones
+
+    jobs_deleted, _ = purge()
+    tombstones_deleted, _ = purge_tombstones()
+    return {'jobs': jobs_deleted, 'tombstones': tombstones_deleted}
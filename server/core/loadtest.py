@@ -0,0 +1,159 @@
+"""
+HTTP load test against a running server.
+
+Unlike the in-process benchmark, this goes through a real server and
+sockets: `concurrency` keep-alive connections each send requests back to
+back for `duration` seconds, and throughput, latency percentiles and
+failures are reported per path and concurrency level. Run it against the
+WSGI deployment (gunicorn) and the ASGI one (uvicorn) started with the
+same number of workers to compare how many concurrent connections each
+sustains. The client is a plain asyncio HTTP/1.1 client, so it needs no
+extra dependency and a single process drives hundreds of connections.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from .benchmark import percentile
+
+
+@dataclass
+class LevelStats:
+    latencies: list = field(default_factory=list)
+    statuses: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+class ConnectionClosed(Exception):
+    pass
+
+
+async def read_response(reader):
+    """Read one response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionClosed()
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(host, port, request, deadline, timeout, stats):
+    """One connection sending requests back to back until the deadline"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            stats.error('timeout')
+            keep_alive = False
+        except (OSError, ConnectionClosed, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats.error('connection')
+            keep_alive = False
+            # Refused or reset: do not spin on a saturated listen queue
+            await asyncio.sleep(0.05)
+        else:
+            stats.latencies.append(time.perf_counter() - started)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(url, headers, concurrency, duration, timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    stats = LevelStats()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(host, port, request, deadline, timeout, stats) for _ in range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+def summarize(stats, elapsed, concurrency):
+    latencies = sorted(stats.latencies)
+    ok = sum(count for status, count in stats.statuses.items() if status < 400)
+    failed = sum(stats.errors.values()) + sum(
+        count for status, count in stats.statuses.items() if status >= 400
+    )
+    summary = {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'ok': ok,
+        'failed': failed,
+        'rps': round(ok / elapsed, 1),
+        'statuses': {str(status): count for status, count in sorted(stats.statuses.items())},
+        'errors': stats.errors,
+    }
+    if latencies:
+        summary.update(
+            p50_ms=round(percentile(latencies, 0.50) * 1000, 1),
+            p95_ms=round(percentile(latencies, 0.95) * 1000, 1),
+            p99_ms=round(percentile(latencies, 0.99) * 1000, 1),
+            max_ms=round(latencies[-1] * 1000, 1),
+        )
+    return summary
+
+
+def capacity(levels, slo_ms):
+    """Highest concurrency served without failure and with p99 within the SLO"""
+    passing = [
+        level['concurrency'] for level in levels
+        if level['failed'] == 0 and level['requests'] and level['p99_ms'] <= slo_ms
+    ]
+    return max(passing, default=0)
+
+
+def run(base_url, paths, concurrency_levels, duration=10, timeout=10, slo_ms=1000, headers=None):
+    """Load each path at each concurrency level and return the JSON-serializable report"""
+    results = []
+    for path in paths:
+        levels = []
+        for concurrency in concurrency_levels:
+            stats, elapsed = asyncio.run(
+                run_level(base_url.rstrip('/') + path, headers or {}, concurrency, duration, timeout)
+            )
+            levels.append(summarize(stats, elapsed, concurrency))
+        results.append({'path': path, 'capacity': capacity(levels, slo_ms), 'levels': levels})
+    return {
+        'meta': {
+            'base_url': base_url,
+            'duration_s': duration,
+            'timeout_s': timeout,
+            'slo_p99_ms': slo_ms,
+        },
+        'paths': results,
+    }
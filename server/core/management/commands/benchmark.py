@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core import benchmark, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure p50/p95/p99 latency and SQL queries per request for each API endpoint "
+        "and print a JSON report. Runs against the configured database: run it once per "
+        "backend (SQLite, PostgreSQL) to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to benchmark as (default: first synthetic user)")
+        parser.add_argument('--iterations', type=int, default=50, help="Measured requests per endpoint")
+        parser.add_argument('--warmup', type=int, default=3, help="Unmeasured requests per endpoint")
+        parser.add_argument('--endpoint', action='append', help="Only run this endpoint (repeatable)")
+        parser.add_argument('--skip-writes', action='store_true', help="Only run read endpoints")
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help="Keep the response cache enabled (disabled by default to measure the database)"
+        )
+        parser.add_argument('--database', default='default', help="Database alias")
+        parser.add_argument('--output', help="Write the report to this file instead of stdout")
+        parser.add_argument('--baseline', help="Previous report to compare with")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help="Allowed p95 slowdown against the baseline, as a ratio (default 0.2)"
+        )
+
+    def handle(self, *args, **options):
+        users = synthetic.synthetic_users().order_by('pk')
+        if options['user']:
+            users = users.model.objects.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur à mesurer : lancez d'abord `generate_data`.")
+        if options['iterations'] < 1:
+            raise CommandError("--iterations doit être positif.")
+
+        # The test client talks to "testserver"
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            RESPONSE_CACHE_ENABLED=options['with_cache'],
+        ):
+            report = benchmark.run(
+                user,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                writes=not options['skip_writes'],
+                only=options['endpoint'],
+                using=options['database'],
+            )
+        report['meta']['response_cache'] = options['with_cache']
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as handle:
+                baseline = json.load(handle)
+            regressions = benchmark.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Régressions :\n" + '\n'.join(regressions))
+            self.stderr.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
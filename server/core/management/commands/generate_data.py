@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users with years of transactions, wallets, goals and fixed "
+        f"expenses (emails user<N>@{synthetic.EMAIL_DOMAIN}, password {synthetic.PASSWORD})."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Number of users to create")
+        parser.add_argument('--wallets', type=int, default=3, help="Wallets per user (1 to 5)")
+        parser.add_argument('--months', type=int, default=36, help="Months of history per user")
+        parser.add_argument(
+            '--transactions-per-month', type=int, default=60,
+            help="Average number of transactions per user and month"
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (same seed, same data)")
+        parser.add_argument(
+            '--reset', action='store_true',
+            help="Delete the previously generated users before generating"
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = synthetic.delete_synthetic_data()
+            self.stdout.write(f"{deleted} lignes supprimées.")
+
+        summary = synthetic.generate(
+            users=options['users'],
+            wallets_per_user=options['wallets'],
+            months=options['months'],
+            transactions_per_month=options['transactions_per_month'],
+            seed=options['seed'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['users']} utilisateurs et {summary['transactions']} transactions générés."
+        ))
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.tokens import RefreshToken
+from core import loadtest, synthetic
+
+DEFAULT_PATHS = [
+    '/api/wallets/wallets/',
+    '/api/async/wallets/',
+    '/api/transactions/transactions/',
+    '/api/async/transactions/',
+    '/api/dashboard/',
+    '/api/async/dashboard/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server with concurrent keep-alive connections and print a JSON "
+        "report (throughput, p50/p95/p99, failures and capacity per path). Start the WSGI "
+        "(gunicorn) and ASGI (uvicorn) deployments with the same number of workers and run "
+        "it against each to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the server")
+        parser.add_argument('--user', help="Email of the user to load as (default: first synthetic user)")
+        parser.add_argument('--path', action='append', help="Path to load (repeatable, default: hot read paths)")
+        parser.add_argument(
+            '--concurrency', default='10,50,100,200',
+            help="Comma-separated numbers of concurrent connections (default 10,50,100,200)"
+        )
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per path and level")
+        parser.add_argument('--timeout', type=float, default=10, help="Seconds before a request fails")
+        parser.add_argument('--slo', type=float, default=1000, help="p99 objective in ms for the capacity")
+        parser.add_argument('--output', help="Write the report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        users = synthetic.synthetic_users().order_by('pk')
+        if options['user']:
+            users = users.model.objects.filter(email=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur à charger : lancez d'abord `generate_data`.")
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency attend des entiers séparés par des virgules.")
+        if not levels or min(levels) < 1:
+            raise CommandError("--concurrency doit être positif.")
+
+        token = str(RefreshToken.for_user(user).access_token)
+        report = loadtest.run(
+            options['url'],
+            options['path'] or DEFAULT_PATHS,
+            levels,
+            duration=options['duration'],
+            timeout=options['timeout'],
+            slo_ms=options['slo'],
+            headers={'Authorization': f'Bearer {token}'},
+        )
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                handle.write(output + '\n')
+        else:
+            self.stdout.write(output)
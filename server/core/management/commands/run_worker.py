@@ -0,0 +1,45 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background job worker (database-backed queue). Several workers can run "
+        "at once, on one or several machines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the due jobs then exit (for cron)")
+        parser.add_argument('--sleep', type=float, default=5, help="Seconds between two polls when idle")
+        parser.add_argument('--batch', type=int, default=10, help="Jobs claimed per poll")
+        parser.add_argument('--name', help="Worker name (default: host:pid)")
+
+    def handle(self, *args, **options):
+        worker = options['name'] or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f"Worker {worker} : {', '.join(sorted(jobs.registry)) or 'aucune tâche'}")
+        while not self.stopping:
+            close_old_connections()
+            jobs.schedule_periodic()
+            count = jobs.run_pending(worker, options['batch'])
+            if count and options['verbosity'] > 1:
+                self.stdout.write(f"{count} tâche(s) exécutée(s)")
+            if options['once']:
+                break
+            if not count:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} arrêté."))
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit
+        self.stopping = True
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Background job stored in the database, run by `manage.py run_worker`.
+    No broker is needed: workers claim due rows with a conditional UPDATE
+    (and SKIP LOCKED where the database supports it).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Tâche")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Paramètres")
+    key = models.CharField(
+        max_length=150,
+        null=True,
+        blank=True,
+        verbose_name="Clé de déduplication",
+        help_text="Au plus une tâche en attente ou en cours par clé"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Statut")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Exécuter à partir de")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Pris en charge le")
+    last_error = models.TextField(blank=True, default='', verbose_name="Dernière erreur")
+    result = models.JSONField(null=True, blank=True, verbose_name="Résultat")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    class Meta:
+        verbose_name = "Tâche de fond"
+        verbose_name_plural = "Tâches de fond"
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Serves the claim query of every worker tick
+            models.Index(fields=['status', 'run_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_job_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class Tombstone(models.Model):
+    """
+    Trace of a deleted row, served by the sync endpoint so clients can drop
+    their local copy. Purged once older than the sync retention.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='tombstones',
+        verbose_name="Utilisateur"
+    )
+    model = models.CharField(max_length=50, verbose_name="Type d'objet")
+    object_id = models.BigIntegerField(verbose_name="Identifiant de l'objet")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Date de suppression")
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
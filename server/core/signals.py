@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+
+from authentication.authentication import user_cache
+from authentication.tokens import mark_profile_changed
+from transactions.models import Category, Transaction
+from wallets.models import Wallet, SavingGoal, FixedExpense, Budget, ExchangeRate
+from wallets.rates import bump_rates_version
+from . import sync
+from .cache import bump_user_version
+
+# Models whose writes invalidate the owner's cached responses
+CACHED_MODELS = (Wallet, Transaction, Category, SavingGoal, FixedExpense, Budget)
+
+
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Bump the owner's cache version on any write to a cached model"""
+    bump_user_version(instance.user_id)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_user_cache, sender=model, dispatch_uid=f'cache-{model.__name__}-save')
+    post_delete.connect(invalidate_user_cache, sender=model, dispatch_uid=f'cache-{model.__name__}-delete')
+
+
+def invalidate_own_cache(sender, instance, **kwargs):
+    """Profile fields (income, currency) feed cached projections"""
+    bump_user_version(instance.pk)
+
+
+post_save.connect(invalidate_own_cache, sender=get_user_model(), dispatch_uid='cache-user-save')
+
+
+def invalidate_token_claims(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Tokens issued before a profile change no longer stand for the user.
+    Deferred to commit so a concurrent request cannot cache the old row.
+    """
+    user_id = instance.pk
+    changed = not created and (update_fields is None or not set(update_fields) <= {'last_login'})
+
+    def forget():
+        user_cache.discard(user_id)
+        if changed:
+            mark_profile_changed(user_id)
+
+    transaction.on_commit(forget)
+
+
+post_save.connect(invalidate_token_claims, sender=get_user_model(), dispatch_uid='auth-user-save')
+post_delete.connect(invalidate_token_claims, sender=get_user_model(), dispatch_uid='auth-user-delete')
+
+
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """Let sync clients drop deleted rows, unless the whole account goes"""
+    user_model = get_user_model()
+    if isinstance(origin, user_model) or (isinstance(origin, QuerySet) and origin.model is user_model):
+        return
+    sync.record_deletion(instance)
+
+
+for model in sync.NAMES:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync-{model.__name__}-delete')
+
+
+def invalidate_rates(sender, instance, **kwargs):
+    """Rates edited one by one (admin); bulk loads bump the version themselves"""
+    bump_rates_version()
+
+
+post_save.connect(invalidate_rates, sender=ExchangeRate, dispatch_uid='cache-rate-save')
+post_delete.connect(invalidate_rates, sender=ExchangeRate, dispatch_uid='cache-rate-delete')
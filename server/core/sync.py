@@ -0,0 +1,173 @@
+"""
+Delta synchronization for the mobile and web clients.
+
+A client keeps an opaque cursor and asks for what changed since: rows
+whose `updated_at` moved (read through the (user, updated_at, id)
+indexes) and tombstones of deleted rows. A sync pass is frozen at the
+time of its first page, then served page by page in (updated_at, id)
+order, so its cost follows the volume of changes, not the history size.
+
+Timestamps are taken when a row is written, which can precede its commit:
+each pass re-reads an `OVERLAP` window before its start, and clients
+upsert rows by id, so a row committed late is never missed.
+"""
+import base64
+import binascii
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from transactions.models import Transaction
+from transactions.serializers import TransactionSerializer
+from wallets.models import Wallet, SavingGoal, FixedExpense
+from wallets.serializers import WalletSerializer, SavingGoalSerializer, FixedExpenseSerializer
+from .models import Tombstone
+
+OVERLAP = timedelta(minutes=2)
+# Tombstones are kept this long; older cursors restart with a full sync
+RETENTION = timedelta(days=90)
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+# Synced collections, in the order they are served (wallets before their transactions)
+COLLECTIONS = {
+    'wallets': (Wallet, WalletSerializer),
+    'saving_goals': (SavingGoal, SavingGoalSerializer),
+    'fixed_expenses': (FixedExpense, FixedExpenseSerializer),
+    'transactions': (Transaction, TransactionSerializer),
+}
+NAMES = {model: name for name, (model, _) in COLLECTIONS.items()}
+STAGES = tuple(COLLECTIONS) + ('deleted',)
+
+
+class CursorError(ValueError):
+    """Raised when a client cursor cannot be decoded"""
+
+
+_buffers = threading.local()
+
+
+@contextmanager
+def collect_tombstones():
+    """
+    Buffer the tombstones recorded inside the block and insert them with
+    one query at its end. Wrap bulk and cascading deletes with it.
+    """
+    stack = _buffers.__dict__.setdefault('stack', [])
+    stack.append([])
+    try:
+        yield
+    finally:
+        tombstones = stack.pop()
+    if tombstones:
+        Tombstone.objects.bulk_create(tombstones, batch_size=1000)
+
+
+def record_deletion(instance):
+    """Record the deletion of a synced row (post_delete receiver)"""
+    tombstone = Tombstone(user_id=instance.user_id, model=NAMES[type(instance)], object_id=instance.pk)
+    stack = getattr(_buffers, 'stack', None)
+    if stack:
+        stack[-1].append(tombstone)
+    else:
+        tombstone.save()
+
+
+def purge_tombstones(now=None):
+    return Tombstone.objects.filter(deleted_at__lt=(now or timezone.now()) - RETENTION).delete()
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Cursor -> state dict; an empty cursor starts a full sync"""
+    if not cursor:
+        return {'since': None}
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        for key in ('since', 'until'):
+            if state.get(key):
+                datetime.fromisoformat(state[key])
+        if 'stage' in state and state['stage'] not in STAGES:
+            raise ValueError(state['stage'])
+        if state.get('after') is not None:
+            datetime.fromisoformat(state['after'][0])
+            int(state['after'][1])
+    except (binascii.Error, ValueError, TypeError, KeyError, IndexError, AttributeError):
+        raise CursorError("Curseur invalide.")
+    return state
+
+
+def stage_queryset(user, stage, since, until):
+    if stage == 'deleted':
+        queryset, field = Tombstone.objects.filter(user=user), 'deleted_at'
+    else:
+        model, _ = COLLECTIONS[stage]
+        queryset, field = model.objects.filter(user=user), 'updated_at'
+        if model is Transaction:
+            queryset = queryset.select_related('wallet', 'category')
+    queryset = queryset.filter(**{f'{field}__lt': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gte': since - OVERLAP})
+    elif stage == 'deleted':
+        # A full sync has nothing to delete
+        queryset = queryset.none()
+    return queryset.order_by(field, 'id'), field
+
+
+def changes(user, cursor=None, limit=DEFAULT_LIMIT, now=None):
+    """One page of the changes since `cursor`, with the cursor of the next page"""
+    now = now or timezone.now()
+    state = decode_cursor(cursor)
+    since = datetime.fromisoformat(state['since']) if state.get('since') else None
+    reset = since is not None and since < now - RETENTION
+    if reset:
+        # Tombstones may have been purged: start over with a full sync
+        state, since = {'since': None}, None
+    until = datetime.fromisoformat(state['until']) if state.get('until') else now
+    stage_index = STAGES.index(state.get('stage', STAGES[0]))
+    after = state.get('after')
+
+    result = {name: [] for name in COLLECTIONS}
+    result['deleted'] = {name: [] for name in COLLECTIONS}
+    budget = limit
+    while stage_index < len(STAGES) and budget > 0:
+        stage = STAGES[stage_index]
+        queryset, field = stage_queryset(user, stage, since, until)
+        if after is not None:
+            moment, pk = datetime.fromisoformat(after[0]), int(after[1])
+            queryset = queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk}))
+        rows = list(queryset[:budget + 1])
+        more = len(rows) > budget
+        rows = rows[:budget]
+
+        if stage == 'deleted':
+            for tombstone in rows:
+                result['deleted'][tombstone.model].append(tombstone.object_id)
+        else:
+            result[stage] = COLLECTIONS[stage][1](rows, many=True).data
+        budget -= len(rows)
+
+        if more:
+            last = rows[-1]
+            after = [getattr(last, field).isoformat(), last.pk]
+            break
+        stage_index += 1
+        after = None
+
+    has_more = stage_index < len(STAGES)
+    if has_more:
+        next_state = {'since': state.get('since'), 'until': until.isoformat(), 'stage': STAGES[stage_index]}
+        if after is not None:
+            next_state['after'] = after
+    else:
+        next_state = {'since': until.isoformat()}
+    result.update(cursor=encode_cursor(next_state), has_more=has_more, reset=reset)
+    return result
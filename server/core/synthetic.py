@@ -0,0 +1,224 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+Users get a few wallets, a salary and rent every month, a realistic mix of
+everyday expenses and the occasional transfer, plus saving goals and fixed
+expenses. Rows are bulk inserted and their balance/rollup effects applied
+through the ledger, so the generated data is indistinguishable from data
+written through the API. Generation is deterministic for a given seed.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from transactions.ledger import LedgerBatch
+from transactions.models import Category, Transaction, category_key
+from wallets.budgets import refresh_budget
+from wallets.models import Wallet, SavingGoal, FixedExpense, Budget, add_months
+
+EMAIL_DOMAIN = 'bench.monely.test'
+PASSWORD = 'MonelyBench123!'
+
+WALLETS = [
+    ('Compte courant', 'checking', 'account_balance'),
+    ('Livret A', 'savings', 'savings'),
+    ('Carte Visa', 'credit', 'credit_card'),
+    ('Espèces', 'cash', 'payments'),
+    ('PEA', 'investment', 'trending_up'),
+]
+
+# (name, category, icon, min amount, max amount, relative frequency)
+EXPENSES = [
+    ('Carrefour', 'Alimentation', 'shopping_cart', 15, 180, 10),
+    ('Boulangerie', 'Alimentation', 'bakery_dining', 2, 15, 8),
+    ('Restaurant', 'Restaurants', 'restaurant', 12, 90, 5),
+    ('SNCF', 'Transport', 'train', 10, 120, 3),
+    ('Total Énergies', 'Transport', 'local_gas_station', 30, 90, 3),
+    ('Uber', 'Transport', 'local_taxi', 8, 40, 2),
+    ('Pharmacie', 'Santé', 'local_pharmacy', 5, 60, 2),
+    ('Amazon', 'Shopping', 'shopping_bag', 10, 250, 4),
+    ('Fnac', 'Loisirs', 'sports_esports', 10, 150, 2),
+    ('Cinéma', 'Loisirs', 'movie', 8, 30, 2),
+]
+
+FIXED_EXPENSES = [
+    ('Loyer', 'monthly', 650, 1400),
+    ('Netflix', 'monthly', 9, 20),
+    ('Spotify', 'monthly', 10, 17),
+    ('Assurance habitation', 'yearly', 120, 400),
+    ('Salle de sport', 'monthly', 20, 45),
+    ('Forfait mobile', 'monthly', 5, 30),
+    ('Panier bio', 'weekly', 15, 35),
+]
+
+# Categories of the salary, rent and transfers, next to the expenses' ones
+CATEGORIES = sorted({'Salaire', 'Logement', 'Épargne'} | {expense[1] for expense in EXPENSES})
+
+# (category, period, min limit, max limit): low enough for some alerts
+BUDGETS = [
+    ('Alimentation', 'monthly', 150, 500),
+    ('Loisirs', 'monthly', 30, 120),
+    ('Transport', 'weekly', 20, 80),
+]
+
+GOALS = [
+    ('Vacances', 1500, 5000),
+    ('Voiture', 5000, 20000),
+    ('Apport immobilier', 15000, 60000),
+    ("Fonds d'urgence", 2000, 10000),
+]
+
+
+def money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def aware(day, rng):
+    moment = datetime.combine(day, time(rng.randint(7, 21), rng.randint(0, 59), rng.randint(0, 59)))
+    return timezone.make_aware(moment, timezone.get_current_timezone())
+
+
+def month_transactions(rng, user, wallets, categories, month, transactions_per_month, today):
+    """Yield the unsaved transactions of one month for one user; `categories` maps names to the user's rows"""
+    checking = wallets[0]
+    days = min((add_months(month, 1) - month).days, (today - month).days + 1)
+
+    def day(at=None):
+        return month + timedelta(days=at if at is not None else rng.randrange(days))
+
+    yield Transaction(
+        user=user, wallet=checking, name='Salaire', amount=money(rng, 1800, 4200),
+        category=categories['Salaire'], type='income', date=aware(day(0), rng), icon='work',
+    )
+    if days > 4:
+        yield Transaction(
+            user=user, wallet=checking, name='Loyer', amount=money(rng, 650, 1400),
+            category=categories['Logement'], type='expense', date=aware(day(4), rng), icon='home',
+        )
+    if len(wallets) > 1 and rng.random() < 0.6:
+        yield Transaction(
+            user=user, wallet=checking, receiver_wallet=wallets[1], name='Virement épargne',
+            amount=money(rng, 50, 500), category=categories['Épargne'], type='transfer',
+            date=aware(day(), rng), icon='swap_horiz',
+        )
+
+    weights = [expense[5] for expense in EXPENSES]
+    # Shorter current month: scale the volume to the elapsed days
+    count = max(0, round(transactions_per_month * days / 30) - 3)
+    for name, category, icon, low, high, _ in rng.choices(EXPENSES, weights, k=count):
+        yield Transaction(
+            user=user, wallet=rng.choice(wallets), name=f'{name} {rng.randint(1, 999)}',
+            amount=money(rng, low, high), category=categories[category], type='expense',
+            date=aware(day(), rng), icon=icon,
+        )
+
+
+def generate_user(rng, index, wallets_per_user, months, transactions_per_month, password, chunk_size=5000):
+    """Create one user with its full history; returns the number of transactions"""
+    User = get_user_model()
+    email = f'user{index}@{EMAIL_DOMAIN}'
+    today = timezone.localdate()
+    first_month = add_months(today.replace(day=1), -(months - 1))
+
+    with transaction.atomic():
+        user = User.objects.create(
+            username=email, email=email, password=password,
+            name=f'Utilisateur {index}', currency='EUR', monthly_income=money(rng, 1800, 4200),
+        )
+        wallets = Wallet.objects.bulk_create([
+            Wallet(user=user, name=name, type=type, currency='EUR', icon=icon)
+            for name, type, icon in WALLETS[:wallets_per_user]
+        ])
+        categories = {
+            category.name: category
+            for category in Category.objects.bulk_create([
+                Category(user=user, name=name, key=category_key(name)) for name in CATEGORIES
+            ])
+        }
+        SavingGoal.objects.bulk_create([
+            SavingGoal(
+                user=user, name=name, target_amount=money(rng, low, high),
+                current_amount=money(rng, 0, low), deadline=today + timedelta(days=rng.randint(60, 1500)),
+            )
+            for name, low, high in rng.sample(GOALS, rng.randint(1, len(GOALS)))
+        ])
+        FixedExpense.objects.bulk_create([
+            FixedExpense(
+                user=user, name=name, amount=money(rng, low, high), currency='EUR',
+                periodicity=periodicity, start_date=first_month + timedelta(days=rng.randrange(28)),
+            )
+            for name, periodicity, low, high in rng.sample(FIXED_EXPENSES, rng.randint(2, len(FIXED_EXPENSES)))
+        ])
+
+        ledger = LedgerBatch()
+        created = 0
+        pending = []
+        for offset in range(months):
+            month = add_months(first_month, offset)
+            pending.extend(month_transactions(rng, user, wallets, categories, month, transactions_per_month, today))
+            if len(pending) >= chunk_size or offset == months - 1:
+                Transaction.objects.bulk_create(pending, batch_size=chunk_size)
+                ledger.add(pending)
+                created += len(pending)
+                pending = []
+        ledger.apply()
+
+        # After the transactions, so the budgets start with their current spending
+        for category, period, low, high in BUDGETS:
+            budget = Budget.objects.create(
+                user=user, category=categories[category], period=period, limit=money(rng, low, high), currency='EUR',
+            )
+            refresh_budget(budget, notify=True)
+    return created
+
+
+def generate(users=10, wallets_per_user=3, months=36, transactions_per_month=60, seed=0,
+             start_index=None, stdout=None):
+    """
+    Generate `users` synthetic users. Returns a summary dict.
+    All users share the PASSWORD so benchmarks can log in as any of them.
+    """
+    rng = random.Random(seed)
+    # Hashing is deliberately slow: do it once for everyone
+    password = make_password(PASSWORD)
+    if start_index is None:
+        start_index = synthetic_users().count()
+    wallets_per_user = max(1, min(wallets_per_user, len(WALLETS)))
+
+    total = 0
+    for index in range(start_index, start_index + users):
+        total += generate_user(rng, index, wallets_per_user, months, transactions_per_month, password)
+        if stdout is not None:
+            stdout.write(f'user{index}@{EMAIL_DOMAIN}: {total} transactions au total')
+    return {
+        'users': users,
+        'wallets': users * wallets_per_user,
+        'months': months,
+        'transactions': total,
+    }
+
+
+def synthetic_users():
+    return get_user_model().objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+
+
+def delete_synthetic_data():
+    """Remove every generated user (and, by cascade, their data)"""
+    return synthetic_users().delete()
+
+
+def dataset_summary(user=None):
+    """Row counts describing the data a benchmark ran against"""
+    summary = {
+        'users': get_user_model().objects.count(),
+        'wallets': Wallet.objects.count(),
+        'transactions': Transaction.objects.count(),
+    }
+    if user is not None:
+        summary['user_transactions'] = Transaction.objects.filter(user=user).count()
+    return summary
@@ -0,0 +1,401 @@
+import json
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.models import User
+from transactions.ledger import balance_effects
+from transactions.categories import category_for
+from transactions.models import Category, Transaction
+from wallets.models import Wallet
+from . import benchmark, jobs, sync, synthetic
+from .models import Job, Tombstone
+
+
+class ResponseCacheTests(TestCase):
+    """Per-user response cache with write-driven invalidation"""
+    url = '/api/wallets/wallets/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='user@monely.test', email='user@monely.test', password='MonelyPass123!', name='Test'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.data, second.data)
+
+    def test_write_invalidates(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.assertEqual(self.client.get(self.url).data['count'], 2)
+
+    def test_ledger_write_invalidates_wallet_balance(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=self.user, wallet=self.wallet, name='Salaire', amount=Decimal('100'),
+                type='income', category=category_for(self.user, 'Salaire'), date=timezone.now(),
+            )
+        self.assertEqual(self.client.get(self.url).data['results'][0]['balance'], '100.00')
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_users_do_not_share_entries(self):
+        self.client.get(self.url)
+        other = User.objects.create_user(
+            username='other@monely.test', email='other@monely.test', password='MonelyPass123!', name='Other'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0, METRICS_ALLOWED_IPS=['127.0.0.1'])
+class InstrumentationTests(TestCase):
+    """Per-endpoint request metrics, slow request and sampled logs"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='user@monely.test', email='user@monely.test', password='MonelyPass123!', name='Test'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def metrics(self):
+        lines = self.client.get('/api/metrics/').content.decode().splitlines()
+        return dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+
+    def test_metrics_per_route(self):
+        for _ in range(2):
+            self.client.get(f'/api/wallets/wallets/{self.wallet.pk}/')
+        self.client.get('/api/wallets/wallets/0/')
+        response = self.client.get('/api/transactions/transactions/export/', {'export_format': 'csv'})
+        size = len(b''.join(response.streaming_content))
+
+        metrics = self.metrics()
+        labels = 'route="/api/wallets/wallets/{pk}/",method="GET"'
+        self.assertEqual(metrics[f'monely_http_requests_total{{{labels},status="200"}}'], '2')
+        self.assertEqual(metrics[f'monely_http_requests_total{{{labels},status="404"}}'], '1')
+        self.assertEqual(metrics[f'monely_http_request_duration_seconds_count{{{labels}}}'], '3')
+        self.assertEqual(metrics[f'monely_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'], '3')
+        self.assertGreater(int(metrics[f'monely_http_db_queries_total{{{labels}}}']), 0)
+        self.assertGreater(float(metrics[f'monely_http_serializer_duration_seconds_total{{{labels}}}']), 0)
+        export = 'route="/api/transactions/transactions/export/",method="GET"'
+        self.assertEqual(metrics[f'monely_http_response_size_bytes_total{{{export}}}'], str(size))
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='')
+    def test_metrics_access(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/api/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(anonymous.get('/api/metrics/').status_code, 200)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(anonymous.get('/api/metrics/', REMOTE_ADDR='10.0.0.5').status_code, 200)
+        with self.settings(METRICS_TOKEN='secret', DEBUG=True):
+            self.assertEqual(anonymous.get('/api/metrics/').status_code, 403)
+            # Neither the metrics token nor a JWT
+            self.assertEqual(anonymous.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secreT').status_code, 401)
+            self.assertEqual(
+                anonymous.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').status_code, 200
+            )
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    async def test_queries_counted_under_asgi(self):
+        # The ORM runs in sync_to_async threads, not in the middleware's
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        client = AsyncClient()
+        with self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            for url in ('/api/async/wallets/', '/api/wallets/wallets/'):
+                response = await client.get(url, headers={'Authorization': f'Bearer {token}'})
+                self.assertEqual(response.status_code, 200)
+        for record in logs.records:
+            self.assertTrue(json.loads(record.getMessage())['slow_queries'])
+
+        metrics = await sync_to_async(self.metrics)()
+        for route in ('/api/async/wallets/', '/api/wallets/wallets/'):
+            labels = f'route="{route}",method="GET"'
+            self.assertGreater(int(metrics[f'monely_http_db_queries_total{{{labels}}}']), 0)
+            self.assertGreater(float(metrics[f'monely_http_db_duration_seconds_total{{{labels}}}']), 0)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001)
+    def test_slow_request_log(self):
+        with self.assertLogs('core.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/wallets/wallets/')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['route'], '/api/wallets/wallets/')
+        self.assertTrue(any('wallets_wallet' in query['sql'] for query in entry['slow_queries']))
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=1.0)
+    def test_sampled_request_log(self):
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            self.client.get('/api/wallets/wallets/')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['method'], entry['status'], entry['user']), ('GET', 200, self.user.pk))
+        self.assertNotIn('slow_queries', entry)
+
+
+class AsyncReadTests(TestCase):
+    """The async read views answer like their DRF counterparts"""
+
+    def setUp(self):
+        cache.clear()
+        synthetic.generate(users=1, months=2, transactions_per_month=30)
+        self.user = synthetic.synthetic_users().get()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = APIClient(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def assert_same(self, sync_url, async_url, params=None):
+        expected = self.client.get(sync_url, params)
+        response = self.client.get(async_url, params)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        if body.get('next'):
+            body['next'] = body['next'].replace(async_url, sync_url)
+        self.assertEqual(body, expected.json())
+        return body
+
+    def test_same_payloads(self):
+        self.assert_same('/api/wallets/wallets/', '/api/async/wallets/')
+        self.assert_same('/api/dashboard/', '/api/async/dashboard/', {'recent': 3})
+        page = self.assert_same('/api/transactions/transactions/', '/api/async/transactions/', {'type': 'expense'})
+        cursor = page['next'].split('cursor=')[1].split('&')[0]
+        self.assert_same('/api/transactions/transactions/', '/api/async/transactions/', {'cursor': cursor})
+
+    def test_cached_and_conditional(self):
+        first = self.client.get('/api/async/wallets/')
+        with self.assertNumQueries(0):
+            # Cached response; the user of a token without profile claims is cached too
+            second = self.client.get('/api/async/wallets/')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(self.client.get('/api/async/wallets/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_errors(self):
+        self.assertEqual(APIClient().get('/api/async/wallets/').status_code, 401)
+        response = APIClient(HTTP_AUTHORIZATION='Bearer nope').get('/api/async/transactions/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        self.assertEqual(self.client.get('/api/async/transactions/', {'type': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/async/transactions/', {'search': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/async/wallets/', {'page': 9}).status_code, 404)
+
+
+class SyntheticDataTests(TestCase):
+    """Generated data goes through the ledger like API writes"""
+
+    def test_generate(self):
+        summary = synthetic.generate(users=2, months=3, transactions_per_month=20)
+        self.assertEqual(synthetic.synthetic_users().count(), 2)
+        self.assertEqual(Transaction.objects.count(), summary['transactions'])
+
+        expected = defaultdict(Decimal)
+        for tx in Transaction.objects.all():
+            for wallet_id, amount in balance_effects(tx):
+                expected[wallet_id] += amount
+        for wallet in Wallet.objects.all():
+            self.assertEqual(wallet.balance, expected[wallet.pk])
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_report(self):
+        synthetic.generate(users=1, months=2, transactions_per_month=10)
+        out = StringIO()
+        call_command(
+            'benchmark', iterations=2, warmup=0, endpoint=['wallets.list', 'transactions.create'], stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual([entry['name'] for entry in report['endpoints']], ['wallets.list', 'transactions.create'])
+        self.assertEqual(report['endpoints'][0]['status'], [200])
+        self.assertEqual(report['endpoints'][1]['status'], [201])
+        self.assertEqual(report['endpoints'][0]['iterations'], 2)
+        # Benchmark writes are reverted
+        self.assertFalse(Transaction.objects.filter(name='Benchmark').exists())
+
+    def test_every_api_route_is_benchmarked(self):
+        self.assertIn('transaction-import-file', benchmark.api_routes())
+        self.assertEqual(benchmark.uncovered_routes(), [])
+
+    @override_settings(METRICS_TOKEN='bench')
+    def test_every_endpoint_succeeds_and_is_reverted(self):
+        synthetic.generate(users=1, months=2, transactions_per_month=10)
+        user = synthetic.synthetic_users().get()
+        before = synthetic.dataset_summary(user)
+        report = benchmark.run(user, iterations=1, warmup=0)
+        self.assertEqual(
+            [(entry['name'], entry['status']) for entry in report['endpoints'] if max(entry['status']) >= 400],
+            [],
+        )
+        self.assertEqual(len(report['endpoints']), len(benchmark.ENDPOINTS))
+        self.assertEqual(report['meta']['dataset'], before)
+        self.assertFalse(Category.objects.filter(name__startswith='Benchmark').exists())
+
+
+class JobQueueTests(TestCase):
+    """Database-backed queue: claiming, retries, periodic jobs"""
+
+    def setUp(self):
+        self.calls = []
+        self.registry = dict(jobs.registry)
+        jobs.register('tests.ok')(lambda payload: self.calls.append(payload) or {'ok': True})
+        jobs.register('tests.periodic', every=timedelta(minutes=5))(lambda payload: None)
+
+        def fail(payload):
+            raise ValueError('boom')
+        jobs.register('tests.fail', max_attempts=2)(fail)
+
+    def tearDown(self):
+        jobs.registry.clear()
+        jobs.registry.update(self.registry)
+
+    def test_run(self):
+        job = jobs.enqueue('tests.ok', {'n': 1})
+        self.assertEqual(jobs.run_pending('worker-1'), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), ('done', 1, {'ok': True}))
+        self.assertEqual(self.calls, [{'n': 1}])
+
+    def test_claimed_job_is_not_claimed_again(self):
+        jobs.enqueue('tests.ok')
+        self.assertEqual(len(jobs.claim('worker-1')), 1)
+        self.assertEqual(jobs.claim('worker-2'), [])
+        # Until its lease expires
+        later = timezone.now() + jobs.LEASE + timedelta(seconds=1)
+        self.assertEqual([job.locked_by for job in jobs.claim('worker-2', now=later)], ['worker-2'])
+
+    def test_future_jobs_wait(self):
+        jobs.enqueue('tests.ok', run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(jobs.run_pending('worker-1'), 0)
+
+    def test_retry_then_fail(self):
+        job = jobs.enqueue('tests.fail')
+        jobs.run_pending('worker-1')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('boom', job.last_error)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending('worker-1')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_key_deduplicates_and_periodic_requeues(self):
+        first = jobs.enqueue('tests.periodic', key='tests.periodic')
+        self.assertEqual(jobs.enqueue('tests.periodic', key='tests.periodic'), first)
+        jobs.schedule_periodic()
+        self.assertEqual(Job.objects.filter(name='tests.periodic').count(), 1)
+        jobs.run_pending('worker-1')
+        queued = Job.objects.get(name='tests.periodic', status='queued')
+        self.assertGreater(queued.run_at, timezone.now() + timedelta(minutes=4))
+
+
+class SyncTests(TestCase):
+    """Delta sync: paged changes since a cursor, deletions through tombstones"""
+    url = '/api/sync/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user@monely.test', email='user@monely.test', password='MonelyPass123!', name='Test'
+        )
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.other_wallet = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, wallet=self.wallet if i % 2 else self.other_wallet, name=f'Achat {i}',
+                amount=Decimal('10'), type='expense', category=category_for(self.user, 'Courses'),
+                date=timezone.now(),
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=None, limit=3):
+        """Follow the pages of one pass; returns (merged page, final cursor)"""
+        merged = defaultdict(list)
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            for name in sync.COLLECTIONS:
+                merged[name] += [row['id'] for row in response.data[name]]
+                merged['deleted_' + name] += response.data['deleted'][name]
+            cursor = response.data['cursor']
+            if not response.data['has_more']:
+                return merged, cursor
+
+    def age_everything(self):
+        """Move every row out of the overlap window of the next pass"""
+        past = timezone.now() - timedelta(days=1)
+        Wallet.objects.update(updated_at=past)
+        Transaction.objects.update(updated_at=past)
+
+    def test_full_then_delta(self):
+        full, cursor = self.sync()
+        self.assertEqual(sorted(full['wallets']), [self.wallet.pk, self.other_wallet.pk])
+        self.assertEqual(sorted(full['transactions']), [tx.pk for tx in self.transactions])
+
+        self.age_everything()
+        edited, removed = self.transactions[:2]
+        self.client.patch(f'/api/transactions/transactions/{edited.pk}/', {'amount': '20'}, format='json')
+        self.client.delete(f'/api/transactions/transactions/{removed.pk}/')
+        delta, _ = self.sync(cursor)
+        self.assertEqual(delta['transactions'], [edited.pk])
+        self.assertEqual(delta['deleted_transactions'], [removed.pk])
+        # Both writes moved the wallet balances
+        self.assertEqual(sorted(delta['wallets']), [self.wallet.pk, self.other_wallet.pk])
+
+    def test_cascading_deletes_are_recorded_in_one_insert(self):
+        _, cursor = self.sync()
+        self.age_everything()
+        cascaded = [tx.pk for tx in self.transactions if tx.wallet_id == self.other_wallet.pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/wallets/wallets/{self.other_wallet.pk}/')
+        self.assertEqual(response.status_code, 204)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "core_tombstone"')]
+        self.assertEqual(len(inserts), 1)
+        delta, _ = self.sync(cursor)
+        self.assertEqual(delta['deleted_wallets'], [self.other_wallet.pk])
+        self.assertEqual(sorted(delta['deleted_transactions']), cascaded)
+
+    def test_account_deletion_leaves_no_tombstones(self):
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_and_expired_cursors(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nope'}).status_code, 400)
+        expired = sync.encode_cursor({'since': (timezone.now() - sync.RETENTION - timedelta(days=1)).isoformat()})
+        response = self.client.get(self.url, {'cursor': expired, 'limit': 100})
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(len(response.data['transactions']), 5)
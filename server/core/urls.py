@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import MetricsView, SyncView
+
+urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('sync/', SyncView.as_view(), name='sync'),
+]
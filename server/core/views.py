@@ -0,0 +1,71 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import cache, instrumentation, sync
+
+
+class MetricsView(APIView):
+    """
+    Prometheus text exposition of the server metrics: response cache
+    counters and per-endpoint request metrics. Readable with `METRICS_TOKEN`
+    (sent as `Authorization: Bearer <token>`), from `METRICS_ALLOWED_IPS` or
+    by a staff user; open to anyone only in DEBUG without a token.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def perform_authentication(self, request):
+        # The metrics token is not a JWT: authenticate only when it is not sent
+        pass
+
+    def has_access(self, request):
+        token = settings.METRICS_TOKEN
+        scheme, _, sent = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if token and scheme == 'Bearer' and hmac.compare_digest(sent.encode(), token.encode()):
+            return True
+        if settings.DEBUG and not token:
+            return True
+        if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+            return True
+        return request.user.is_staff
+
+    def get(self, request):
+        if not self.has_access(request):
+            raise PermissionDenied()
+
+        counters = cache.get_metrics()
+        lines = [
+            '# HELP monely_response_cache_requests_total Per-user response cache lookups by result.',
+            '# TYPE monely_response_cache_requests_total counter',
+        ]
+        for result, value in counters.items():
+            lines.append(f'monely_response_cache_requests_total{{result="{result}"}} {value}')
+        lines += instrumentation.prometheus_lines()
+        return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
+
+
+class SyncView(APIView):
+    """
+    Rows created, updated or deleted since `?cursor=` (omit it for a full
+    sync). Follow `cursor` while `has_more` is true, then keep the last
+    cursor for the next sync. `reset` asks the client to drop its local
+    data first. `?limit=` caps the rows per page (500 by default).
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': "Nombre entier attendu."})
+        if not 1 <= limit <= sync.MAX_LIMIT:
+            raise ValidationError({'limit': f"Doit être compris entre 1 et {sync.MAX_LIMIT}."})
+        try:
+            return Response(sync.changes(request.user, request.query_params.get('cursor'), limit))
+        except sync.CursorError as exc:
+            raise ValidationError({'cursor': str(exc)})
@@ -1,13 +1,23 @@
 from django.contrib import admin
-from .models import Transaction
+from .models import Category, Transaction
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    """Admin configuration for Category model"""
+    list_display = ('name', 'user', 'created_at')
+    search_fields = ('name', 'user__email', 'user__name')
+    ordering = ('user', 'name')
+    readonly_fields = ('created_at',)
+    list_select_related = ('user',)
 
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     """Admin configuration for Transaction model"""
     list_display = ('name', 'type', 'amount', 'category', 'wallet', 'user', 'status', 'date')
-    list_filter = ('type', 'status', 'category', 'date', 'created_at')
-    search_fields = ('name', 'user__email', 'user__name', 'category')
+    list_filter = ('type', 'status', 'date', 'created_at')
+    search_fields = ('name', 'user__email', 'user__name', 'category__name')
     ordering = ('-date', '-created_at')
     readonly_fields = ('created_at', 'updated_at')
     date_hierarchy = 'date'
@@ -31,4 +41,4 @@ class TransactionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Optimize queryset with select_related"""
         qs = super().get_queryset(request)
-        return qs.select_related('user', 'wallet')
+        return qs.select_related('user', 'wallet', 'category')
@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
+
+
+def suspend_search_index(sender, using, **kwargs):
+    """The FTS triggers and view block SQLite table rebuilds: drop them while migrating"""
+    from django.db import connections
+    from .search import suspend_search_index
+
+    suspend_search_index(connections[using])
+
+
+def restore_search_index(sender, using, plan=None, **kwargs):
+    """Recreate them after each migrate, re-indexing if anything was migrated"""
+    from django.db import connections
+    from .search import install_search_index
+
+    connection = connections[using]
+    # Not on a database migrated back before the categories (see 0007_category)
+    if {'transactions_transaction', 'transactions_category'} <= set(connection.introspection.table_names()):
+        install_search_index(connection, rebuild=bool(plan))
 
 
 class TransactionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        pre_migrate.connect(suspend_search_index, sender=self)
+        post_migrate.connect(restore_search_index, sender=self)
@@ -0,0 +1,180 @@
+"""
+Batch writes: many creates, updates and deletes in one request.
+
+Every operation is validated before anything is written, then the whole
+batch is applied in one database transaction with a handful of queries
+(one read of the targeted rows, one read of their categories, one bulk
+INSERT, one bulk UPDATE, one DELETE and one INSERT of its tombstones)
+and a single ledger pass, so each wallet balance and rollup key is
+updated once whatever the number of operations.
+"""
+import copy
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.sync import collect_tombstones
+from . import categories
+from .ledger import LedgerBatch
+from .models import Category, Transaction
+from .serializers import TransactionBatchSerializer, TransactionSerializer
+
+OPERATIONS = ('create', 'update', 'delete')
+MAX_OPERATIONS = 1000
+BATCH_SIZE = 500
+
+
+class BatchError(ValueError):
+    """Raised when the request body is not a list of operations"""
+
+
+def parse_operations(payload):
+    operations = payload.get('operations') if isinstance(payload, dict) else payload
+    if not isinstance(operations, list):
+        raise BatchError("Liste d'opérations attendue.")
+    if not operations:
+        raise BatchError("Aucune opération fournie.")
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"Au plus {MAX_OPERATIONS} opérations par requête.")
+    return operations
+
+
+def target_id(operation):
+    try:
+        return int(operation.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_batch(user, operations, wallets):
+    """
+    Validate then apply `operations`; returns (results, errors). Nothing is
+    written when `errors` is not empty. Creates carrying an already known
+    `external_id` and deletes of missing rows are skipped, so a client can
+    safely resend a batch whose response it did not receive. An update
+    cannot take an `external_id` held by another row or by a create of
+    the batch.
+    """
+    context = {'wallets': wallets}
+    creator = TransactionBatchSerializer(context=context)
+    updater = TransactionBatchSerializer(context=context, partial=True)
+
+    with transaction.atomic():
+        ids = {target_id(operation) for operation in operations if isinstance(operation, dict)} - {None}
+        existing = {
+            row.pk: row for row in Transaction.objects.select_for_update().filter(user=user, pk__in=ids)
+        } if ids else {}
+        external_ids = {
+            operation['data']['external_id'] for operation in operations
+            if isinstance(operation, dict) and operation.get('op') in ('create', 'update')
+            and isinstance(operation.get('data'), dict) and operation['data'].get('external_id')
+        }
+        known_external_ids = dict(
+            Transaction.objects.filter(user=user, external_id__in=external_ids).values_list('external_id', 'pk')
+        ) if external_ids else {}
+
+        results, errors = [], []
+        seen_ids, seen_external_ids = set(), set()
+        to_create, to_update, to_delete = [], [], []
+        for index, operation in enumerate(operations):
+            result = {'index': index, 'op': None}
+            try:
+                if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+                    raise serializers.ValidationError({'op': f"Valeurs possibles : {', '.join(OPERATIONS)}."})
+                result['op'] = op = operation['op']
+                if 'ref' in operation:
+                    result['ref'] = operation['ref']
+
+                if op == 'create':
+                    data = creator.run_validation(operation.get('data'))
+                    external_id = data.get('external_id')
+                    if external_id in known_external_ids:
+                        result.update(status='skipped', id=known_external_ids[external_id])
+                    elif external_id and external_id in seen_external_ids:
+                        raise serializers.ValidationError({'external_id': "Identifiant externe en double."})
+                    else:
+                        seen_external_ids.add(external_id)
+                        to_create.append((result, data))
+                        result['status'] = 'created'
+                    results.append(result)
+                    continue
+
+                pk = target_id(operation)
+                if pk is None:
+                    raise serializers.ValidationError({'id': "Identifiant de transaction requis."})
+                if pk in seen_ids:
+                    raise serializers.ValidationError({'id': "Transaction déjà modifiée par ce lot."})
+                seen_ids.add(pk)
+                result['id'] = pk
+                instance = existing.get(pk)
+                if op == 'delete':
+                    if instance is None:
+                        result['status'] = 'skipped'
+                    else:
+                        to_delete.append(instance)
+                        result['status'] = 'deleted'
+                elif instance is None:
+                    raise serializers.ValidationError({'id': "Transaction introuvable."})
+                else:
+                    data = updater.run_validation(operation.get('data') or {})
+                    external_id = data.get('external_id')
+                    if external_id and known_external_ids.get(external_id, pk) != pk:
+                        raise serializers.ValidationError({'external_id': "Identifiant externe déjà utilisé."})
+                    if external_id and external_id in seen_external_ids:
+                        raise serializers.ValidationError({'external_id': "Identifiant externe en double."})
+                    seen_external_ids.add(external_id)
+                    to_update.append((result, instance, data))
+                    result['status'] = 'updated'
+                results.append(result)
+            except serializers.ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+
+        if errors:
+            transaction.set_rollback(True)
+            return [], errors
+
+        # Category names of every created and updated row, resolved at once
+        categories.attach(user, [data for _, data in to_create] + [data for _, _, data in to_update])
+        to_create = [(result, Transaction(user=user, **data)) for result, data in to_create]
+
+        ledger = LedgerBatch()
+        now = timezone.now()
+
+        created = [instance for _, instance in to_create]
+        Transaction.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        ledger.add(created)
+
+        updated_fields = {'updated_at'}
+        ledger.remove([copy.copy(instance) for _, instance, _ in to_update])
+        for _, instance, data in to_update:
+            for field, value in data.items():
+                setattr(instance, field, value)
+            instance.updated_at = now
+            updated_fields.update(data)
+        updated = [instance for _, instance, _ in to_update]
+        if updated:
+            Transaction.objects.bulk_update(updated, sorted(updated_fields), batch_size=BATCH_SIZE)
+        ledger.add(updated)
+
+        if to_delete:
+            ledger.remove(to_delete)
+            with collect_tombstones():
+                Transaction.objects.filter(pk__in=[instance.pk for instance in to_delete]).delete()
+        ledger.apply()
+
+    # wallet_name and category are rendered from rows loaded once, not one query per row
+    category_field = Transaction._meta.get_field('category')
+    unloaded = {instance.category_id for instance in updated if not category_field.is_cached(instance)}
+    loaded = Category.objects.in_bulk(unloaded) if unloaded else {}
+    for instance in created + updated:
+        instance.wallet = wallets[instance.wallet_id]
+        if instance.category_id in loaded:
+            instance.category = loaded[instance.category_id]
+    # One serializer for all rows: building one per row costs more than the writes
+    written = [(result, instance) for result, instance in to_create]
+    written += [(result, instance) for result, instance, _ in to_update]
+    data = TransactionSerializer([instance for _, instance in written], many=True).data
+    for (result, instance), row in zip(written, data):
+        result.update(id=instance.pk, data=row)
+    return results, []
@@ -0,0 +1,63 @@
+"""
+Category names of the API resolved to the per-user Category rows.
+
+Clients keep sending and reading category names; writes resolve them in
+bulk, creating the categories a user has not used yet: one SELECT when
+they all exist, an INSERT and a second SELECT otherwise.
+"""
+from .models import Category, category_key
+
+
+def resolve(pairs):
+    """
+    {(user_id, name): Category} for the given pairs, creating the missing
+    ones. Names match whatever their case and surrounding spaces; a new
+    category keeps the first spelling (sorted) it was requested with.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    keys = {pair: (pair[0], category_key(pair[1])) for pair in pairs}
+
+    def load():
+        rows = Category.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}, key__in={key for _, key in keys.values()}
+        )
+        by_key = {(row.user_id, row.key): row for row in rows}
+        return {pair: by_key[key] for pair, key in keys.items() if key in by_key}
+
+    found = load()
+    missing = pairs - found.keys()
+    if missing:
+        new = {}
+        for pair in sorted(missing):
+            new.setdefault(keys[pair], pair[1].strip()[:100])
+        # Conflicts are categories created meanwhile by another writer
+        Category.objects.bulk_create(
+            [Category(user_id=user_id, name=name, key=key) for (user_id, key), name in new.items()],
+            ignore_conflicts=True,
+        )
+        found = load()
+    return found
+
+
+def for_user(user, names):
+    """{name: Category} of one user"""
+    user_id = getattr(user, 'pk', user)
+    return {name: category for (_, name), category in resolve((user_id, name) for name in names).items()}
+
+
+def category_for(user, name):
+    return for_user(user, [name])[name]
+
+
+def attach(user, rows):
+    """Replace the category names of validated rows by their Category, in place"""
+    names = {row['category'] for row in rows if isinstance(row.get('category'), str)}
+    if not names:
+        return rows
+    categories = for_user(user, names)
+    for row in rows:
+        if isinstance(row.get('category'), str):
+            row['category'] = categories[row['category']]
+    return rows
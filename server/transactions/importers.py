@@ -0,0 +1,221 @@
+"""
+Streaming parsers for bank history imports.
+
+Each parser reads an uploaded file line by line and yields plain dicts
+shaped like the TransactionImportSerializer input, so that a file of any
+size is never loaded in memory at once.
+"""
+import csv
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from . import categories
+from .ledger import LedgerBatch
+from .models import Transaction
+from .serializers import TransactionImportSerializer
+
+DEFAULT_CATEGORY = 'Import'
+
+CHUNK_SIZE = 1000
+
+# Stop collecting validation errors past this many rows
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ('csv', 'ofx', 'jsonl')
+
+
+class ImportFormatError(ValueError):
+    """Raised when the uploaded file cannot be parsed at all"""
+
+
+def detect_format(filename, requested=None):
+    """Pick the parser from an explicit format or the file extension"""
+    if requested:
+        requested = requested.lower()
+        if requested == 'json':
+            requested = 'jsonl'
+        if requested not in FORMATS:
+            raise ImportFormatError(f"Format inconnu : {requested}.")
+        return requested
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    if extension in ('ofx', 'qfx'):
+        return 'ofx'
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def text_lines(uploaded_file):
+    """Decode an uploaded binary file lazily, tolerating a UTF-8 BOM"""
+    return io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def normalize_row(row):
+    """
+    Apply the conventions shared by every format: a missing type is
+    inferred from the sign of the amount, amounts are stored positive and
+    bare dates are read as midnight.
+    """
+    row = {key: value for key, value in row.items() if value not in (None, '')}
+    amount = row.get('amount')
+    if amount is not None:
+        try:
+            value = Decimal(str(amount).replace(',', '.').replace(' ', ''))
+        except InvalidOperation:
+            value = None
+        if value is not None:
+            row.setdefault('type', 'expense' if value < 0 else 'income')
+            row['amount'] = str(abs(value))
+    date = row.get('date')
+    if isinstance(date, str) and len(date) == 10:
+        row['date'] = f"{date}T00:00:00"
+    row.setdefault('category', DEFAULT_CATEGORY)
+    return row
+
+
+def parse_csv(uploaded_file):
+    """CSV with a header row using the API field names"""
+    reader = csv.DictReader(text_lines(uploaded_file))
+    for row in reader:
+        yield normalize_row({(key or '').strip().lower(): value for key, value in row.items()})
+
+
+def parse_jsonl(uploaded_file):
+    """One JSON object per line (blank lines are ignored)"""
+    for number, line in enumerate(text_lines(uploaded_file), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            raise ImportFormatError(f"Ligne {number} : JSON invalide.")
+        if not isinstance(row, dict):
+            raise ImportFormatError(f"Ligne {number} : un objet JSON est attendu.")
+        yield normalize_row(row)
+
+
+OFX_TAG = re.compile(r'<(/?[A-Za-z0-9.]+)>([^<\r\n]*)')
+
+
+def ofx_date(value):
+    """OFX dates look like 20240131[120000[.000][-5:EST]]"""
+    digits = re.match(r'(\d{8})(\d{6})?', value)
+    if not digits:
+        return value
+    day, time = digits.group(1), digits.group(2) or '000000'
+    return f"{day[:4]}-{day[4:6]}-{day[6:]}T{time[:2]}:{time[2:4]}:{time[4:]}"
+
+
+def parse_ofx(uploaded_file):
+    """
+    OFX 1.x (SGML) and 2.x (XML) statements. Only <STMTTRN> blocks are
+    read; the FITID becomes the external id so re-importing the same
+    statement is a no-op.
+    """
+    current = None
+    for line in text_lines(uploaded_file):
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                current = {}
+            elif tag == '/STMTTRN' and current is not None:
+                yield normalize_row(current)
+                current = None
+            elif current is None:
+                continue
+            elif tag == 'TRNAMT':
+                current['amount'] = value.strip()
+            elif tag == 'DTPOSTED':
+                current['date'] = ofx_date(value.strip())
+            elif tag == 'FITID':
+                current['external_id'] = value.strip()
+            elif tag == 'NAME':
+                current['name'] = value.strip()
+            elif tag == 'MEMO':
+                current.setdefault('name', value.strip())
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'jsonl': parse_jsonl,
+    'ofx': parse_ofx,
+}
+
+
+def parse(uploaded_file, file_format):
+    """Yield normalized rows from an uploaded file"""
+    return PARSERS[file_format](uploaded_file)
+
+
+def chunked(rows, size):
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_transactions(user, rows, wallets, default_wallet=None, chunk_size=CHUNK_SIZE):
+    """
+    Validate and insert rows chunk by chunk, then apply one aggregated
+    balance/rollup delta per wallet. The import is all-or-nothing: if any
+    row is invalid nothing is written and the errors are returned.
+    Rows whose external id was already imported are skipped.
+    """
+    context = {'wallets': wallets, 'default_wallet': default_wallet}
+    ledger = LedgerBatch()
+    seen_external_ids = set()
+    result = {'created': 0, 'skipped': 0, 'errors': []}
+
+    with transaction.atomic():
+        for index, chunk in enumerate(chunked(rows, chunk_size)):
+            first_row = index * chunk_size + 1
+            serializer = TransactionImportSerializer(data=chunk, many=True, context=context)
+            if not serializer.is_valid():
+                errors = serializer.errors
+                # Depending on the DRF version errors come as a list or an {index: errors} dict
+                items = errors.items() if isinstance(errors, dict) else enumerate(errors)
+                result['errors'].extend(
+                    {'row': first_row + position, 'errors': row_errors}
+                    for position, row_errors in items
+                    if row_errors
+                )
+                if len(result['errors']) >= MAX_REPORTED_ERRORS:
+                    break
+            if result['errors']:
+                continue
+
+            external_ids = {
+                data['external_id'] for data in serializer.validated_data if data.get('external_id')
+            }
+            existing = set(
+                Transaction.objects.filter(user=user, external_id__in=external_ids)
+                .values_list('external_id', flat=True)
+            ) if external_ids else set()
+
+            objects = []
+            categories.attach(user, serializer.validated_data)
+            for data in serializer.validated_data:
+                external_id = data.get('external_id')
+                if external_id:
+                    if external_id in existing or external_id in seen_external_ids:
+                        result['skipped'] += 1
+                        continue
+                    seen_external_ids.add(external_id)
+                objects.append(Transaction(user=user, **data))
+
+            Transaction.objects.bulk_create(objects, batch_size=chunk_size)
+            ledger.add(objects)
+            result['created'] += len(objects)
+
+        if result['errors']:
+            result['errors'] = result['errors'][:MAX_REPORTED_ERRORS]
+            result['created'] = 0
+            transaction.set_rollback(True)
+        else:
+            ledger.apply()
+    return result
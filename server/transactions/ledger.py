@@ -0,0 +1,105 @@
+"""
+Side effects of transaction writes on the rest of the schema.
+
+A write is described as the rows it removes and the rows it adds (an
+update removes the old version and adds the new one). Their effects are
+coalesced per wallet and applied with F() expressions, so concurrent
+writers never overwrite each other's balance and each wallet costs a
+single UPDATE whatever the number of rows involved. The same UPDATE
+maintains the wallet statistics (see wallets/stats.py); expenses also
+move the budgets of their category (see wallets/budgets.py).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F
+from django.utils import timezone
+
+from analytics import rollups
+from core.cache import bump_user_version
+from wallets import budgets, stats
+from wallets.models import Wallet
+
+
+def balance_effects(tx):
+    """Yield the (wallet_id, signed amount) pairs a transaction applies"""
+    if tx.type == 'income':
+        yield tx.wallet_id, tx.amount
+    elif tx.type == 'expense':
+        yield tx.wallet_id, -tx.amount
+    elif tx.type == 'transfer' and tx.receiver_wallet_id:
+        yield tx.wallet_id, -tx.amount
+        yield tx.receiver_wallet_id, tx.amount
+
+
+def apply_wallet_deltas(balances, stats_deltas=None, flows=None, now=None):
+    """Apply per-wallet balance and statistics deltas atomically in the database"""
+    now = now or timezone.now()
+    month = stats.current_month(now)
+    stats_deltas, flows = stats_deltas or {}, flows or {}
+    for wallet_id in set(balances) | set(stats_deltas) | set(flows):
+        fields = stats.update_fields(stats_deltas.get(wallet_id), *flows.get(wallet_id, (0, 0)), month)
+        if balances.get(wallet_id):
+            fields['balance'] = F('balance') + balances[wallet_id]
+        if not fields:
+            continue
+        Wallet.objects.filter(pk=wallet_id).update(updated_at=now, **fields)
+
+
+class LedgerBatch:
+    """
+    Accumulates the effects of any number of added/removed rows and
+    applies them at once. Bulk paths (imports, batch writes) feed it chunk
+    by chunk so each wallet and rollup key is updated a single time.
+    """
+
+    def __init__(self):
+        self.balances = defaultdict(Decimal)
+        self.stats = defaultdict(stats.StatsDelta)
+        self.rollups = None
+        self.expenses = None
+        self.user_ids = set()
+
+    def add(self, rows):
+        self.collect(rows, sign=1)
+
+    def remove(self, rows):
+        self.collect(rows, sign=-1)
+
+    def collect(self, rows, sign):
+        rows = list(rows)
+        for tx in rows:
+            self.user_ids.add(tx.user_id)
+            for wallet_id, amount in balance_effects(tx):
+                self.balances[wallet_id] += sign * amount
+            for wallet_id in stats.touched_wallets(tx):
+                self.stats[wallet_id].add(tx, sign)
+        self.expenses = budgets.collect(self.expenses, rows, sign)
+        if sign > 0:
+            self.rollups = rollups.collect_deltas(added=rows, deltas=self.rollups)
+        else:
+            self.rollups = rollups.collect_deltas(removed=rows, deltas=self.rollups)
+
+    def apply(self):
+        """Write the accumulated effects; call inside the write's atomic block"""
+        now = timezone.now()
+        # Rollups first: a wallet starting a new month reloads its flows from them
+        if self.rollups:
+            rollups.apply_deltas(self.rollups)
+        flows = stats.month_flows(self.rollups, stats.current_month(now))
+        apply_wallet_deltas(self.balances, self.stats, flows, now)
+        budgets.apply_deltas(self.expenses, now)
+        # Bulk paths bypass the model signals: invalidate cached responses here
+        for user_id in self.user_ids:
+            bump_user_version(user_id)
+
+
+def record_changes(added=(), removed=()):
+    """
+    Propagate added/removed transactions to wallet balances and rollups.
+    Must be called inside the transaction.atomic block of the write.
+    """
+    batch = LedgerBatch()
+    batch.remove(removed)
+    batch.add(added)
+    batch.apply()
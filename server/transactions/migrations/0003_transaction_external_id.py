@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_transaction_receiver_wallet_alter_transaction_type'),
+        ('wallets', '0003_alter_wallet_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Identifiant fourni par le client (ex. FITID bancaire) pour rendre les imports idempotents', max_length=255, null=True, verbose_name='Identifiant externe'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('external_id__isnull', False)), fields=('user', 'external_id'), name='unique_transaction_external_id'),
+        ),
+    ]
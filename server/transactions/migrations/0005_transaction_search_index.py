@@ -0,0 +1,77 @@
+from django.db import OperationalError, migrations
+
+# The search structures as they were at this migration, when the category
+# was a column of the transaction table (see 0007_category)
+FTS_TABLE = 'transactions_transaction_fts'
+
+POSTGRES_INDEXES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS transaction_name_trgm_idx '
+    'ON transactions_transaction USING gin ((UPPER(name::text)) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS transaction_category_trgm_idx '
+    'ON transactions_transaction USING gin ((UPPER(category::text)) gin_trgm_ops)',
+]
+
+POSTGRES_DROP_SQL = [
+    'DROP INDEX IF EXISTS transaction_name_trgm_idx',
+    'DROP INDEX IF EXISTS transaction_category_trgm_idx',
+]
+
+SQLITE_TRIGGERS_SQL = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, category ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+]
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_INDEXES_SQL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    "name, category, content='transactions_transaction', content_rowid='id', "
+                    "tokenize='trigram')"
+                )
+            except OperationalError:
+                # SQLite built without FTS5 or older than 3.34: keep the LIKE fallback
+                return
+            for statement in SQLITE_TRIGGERS_SQL:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_DROP_SQL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_transaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,138 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+from transactions.models import category_key
+
+# Name given to the transactions whose category was blank
+BLANK_CATEGORY = 'Autre'
+
+FTS_TABLE = 'transactions_transaction_fts'
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    Drop the SQLite FTS table, its triggers and view, whichever layout
+    they have: the one of 0005 indexes the category column, the current
+    one (see search.py) the category table. The post_migrate hook of the
+    app installs the current layout once migrations are done; a database
+    migrated back before this migration keeps the LIKE fallback.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS transaction_category_trgm_idx')
+        elif connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au', 'cu'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute('DROP VIEW IF EXISTS transactions_transaction_search')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def category_name(value):
+    return (value.strip() or BLANK_CATEGORY)[:100]
+
+
+def create_categories(apps, schema_editor):
+    """
+    One category per (user, name) trimmed and case-folded, named after the
+    spelling most transactions use; then point every transaction at its own
+    """
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    db = schema_editor.connection.alias
+    counts = (
+        Transaction.objects.using(db).order_by().values_list('user_id', 'category_name')
+        .annotate(count=Count('pk'))
+    )
+    spellings = {}
+    for user_id, value, count in counts:
+        name = category_name(value)
+        spelling = spellings.setdefault((user_id, category_key(name)), {})
+        spelling[name] = spelling.get(name, 0) + count
+    Category.objects.using(db).bulk_create(
+        [
+            # Most used spelling; ties go to the first in alphabetical order
+            Category(user_id=user_id, key=key, name=min(spelling, key=lambda name: (-spelling[name], name)))
+            for (user_id, key), spelling in spellings.items()
+        ],
+        batch_size=1000,
+    )
+    ids = {(row.user_id, row.key): row.pk for row in Category.objects.using(db).all()}
+    for user_id, value, _ in counts:
+        Transaction.objects.using(db).filter(user_id=user_id, category_name=value).update(
+            category_id=ids[(user_id, category_key(category_name(value)))]
+        )
+
+
+def restore_names(apps, schema_editor):
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    db = schema_editor.connection.alias
+    for category in Category.objects.using(db).all():
+        Transaction.objects.using(db).filter(category_id=category.pk).update(category_name=category.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_transaction_sync_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_index, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nom')),
+                ('key', models.CharField(editable=False, max_length=100, verbose_name='Clé')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Catégorie',
+                'verbose_name_plural': 'Catégories',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='unique_category_key')],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_categor_da82d6_idx',
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='category',
+            new_name='category_name',
+        ),
+        # Nullable, so that migrating back can add it again before filling it
+        migrations.AlterField(
+            model_name='transaction',
+            name='category_name',
+            field=models.CharField(max_length=100, null=True, verbose_name='Catégorie'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='transactions', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.RunPython(create_categories, restore_names),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='category_name',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='transactions', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'category', '-date', '-created_at', '-id'], name='transaction_user_id_801841_idx'),
+        ),
+        # Migrating back: the index of the category table would no longer be maintained
+        migrations.RunPython(migrations.RunPython.noop, drop_search_index),
+    ]
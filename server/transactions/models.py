@@ -1,6 +1,52 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
+from . import ledger
+
+# Fields read by the ledger when reverting a previous version of a row
+LEDGER_FIELDS = ('user', 'wallet', 'receiver_wallet', 'amount', 'category', 'type', 'date')
+
+
+def category_key(name):
+    """What category names are compared on: "Courses" and " courses" are the same category"""
+    return name.strip().casefold()[:100]
+
+
+class Category(models.Model):
+    """
+    A user's transaction category. Transactions, rollups and budgets
+    reference it by id instead of repeating its name on every row.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='categories',
+        verbose_name="Utilisateur"
+    )
+    name = models.CharField(max_length=100, verbose_name="Nom")
+    # category_key(name), set on save; bulk_create callers must fill it
+    key = models.CharField(max_length=100, editable=False, verbose_name="Clé")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Catégorie"
+        verbose_name_plural = "Catégories"
+        ordering = ['name']
+        constraints = [
+            # Also serves the lookups by name of the write path
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_category_key'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.key = category_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'key'}
+        super().save(*args, **kwargs)
+
 
 class Transaction(models.Model):
     """
@@ -38,7 +84,13 @@ class Transaction(models.Model):
     )
     name = models.CharField(max_length=255, verbose_name="Nom de la transaction")
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Montant")
-    category = models.CharField(max_length=100, verbose_name="Catégorie")
+    category = models.ForeignKey(
+        Category,
+        # Deleting a user deletes both; a category still in use cannot be deleted alone
+        on_delete=models.RESTRICT,
+        related_name='transactions',
+        verbose_name="Catégorie"
+    )
     type = models.CharField(
         max_length=10, 
         choices=TYPE_CHOICES + [('transfer', 'Transfert')], 
@@ -47,18 +99,36 @@ class Transaction(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='completed', verbose_name="Statut")
     date = models.DateTimeField(verbose_name="Date de la transaction")
     icon = models.CharField(max_length=50, default='attach_money', verbose_name="Icône")
+    external_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        verbose_name="Identifiant externe",
+        help_text="Identifiant fourni par le client (ex. FITID bancaire) pour rendre les imports idempotents"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
     
     class Meta:
         verbose_name = "Transaction"
         verbose_name_plural = "Transactions"
-        ordering = ['-date', '-created_at']
+        ordering = ['-date', '-created_at', '-id']
         indexes = [
-            models.Index(fields=['user', '-date']),
+            # Serves per-user date ranges and the keyset pagination of the transaction list
+            models.Index(fields=['user', '-date', '-created_at', '-id']),
             models.Index(fields=['wallet', '-date']),
             models.Index(fields=['type', '-date']),
-            models.Index(fields=['category', '-date']),
+            # Category filters of the transaction list, in its order, and category histories
+            models.Index(fields=['user', 'category', '-date', '-created_at', '-id']),
+            # Delta sync reads the rows changed since a cursor
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'external_id'],
+                condition=models.Q(external_id__isnull=False),
+                name='unique_transaction_external_id',
+            ),
         ]
     
     def __str__(self):
@@ -68,65 +138,36 @@ class Transaction(models.Model):
         return f"{self.name} ({sign}{self.amount})"
     
     def save(self, *args, **kwargs):
-        """Override save to update wallet balance"""
-        is_new = self.pk is None
-        old_amount = 0
-        old_type = None
-        old_wallet = None
-        old_receiver_wallet = None
-        
-        if not is_new:
-            old_transaction = Transaction.objects.get(pk=self.pk)
-            old_amount = old_transaction.amount
-            old_type = old_transaction.type
-            old_wallet = old_transaction.wallet
-            old_receiver_wallet = old_transaction.receiver_wallet
-        
-        super().save(*args, **kwargs)
-        
-        # Update wallet balance
-        if is_new:
-            if self.type == 'income':
-                self.wallet.balance += self.amount
-            elif self.type == 'expense':
-                self.wallet.balance -= self.amount
-            elif self.type == 'transfer' and self.receiver_wallet:
-                self.wallet.balance -= self.amount
-                self.receiver_wallet.balance += self.amount
-                self.receiver_wallet.save()
-        else:
-            # Revert old balance changes
-            if old_type == 'income':
-                old_wallet.balance -= old_amount
-            elif old_type == 'expense':
-                old_wallet.balance += old_amount
-            elif old_type == 'transfer' and old_receiver_wallet:
-                old_wallet.balance += old_amount
-                old_receiver_wallet.balance -= old_amount
-                old_receiver_wallet.save()
-            
-            if old_wallet != self.wallet:
-                old_wallet.save()
-            
-            # Apply new balance changes
-            if self.type == 'income':
-                self.wallet.balance += self.amount
-            elif self.type == 'expense':
-                self.wallet.balance -= self.amount
-            elif self.type == 'transfer' and self.receiver_wallet:
-                self.wallet.balance -= self.amount
-                self.receiver_wallet.balance += self.amount
-                self.receiver_wallet.save()
-        
-        self.wallet.save()
+        """
+        Override save to update wallet balances and analytics rollups.
+        The previous version of the row is reverted and the new one applied
+        with F() updates, all inside one atomic block.
+        """
+        with transaction.atomic():
+            old_transaction = None
+            if self.pk is not None:
+                old_transaction = (
+                    Transaction.objects.select_for_update()
+                    .only(*LEDGER_FIELDS)
+                    .filter(pk=self.pk)
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            ledger.record_changes(
+                added=[self],
+                removed=[old_transaction] if old_transaction else [],
+            )
     
     def delete(self, *args, **kwargs):
-        """Override delete to update wallet balance"""
-        # Revert the balance change
-        if self.type == 'income':
-            self.wallet.balance -= self.amount
-        else:
-            self.wallet.balance += self.amount
-        
-        self.wallet.save()
-        super().delete(*args, **kwargs)
+        """
+        Override delete to revert its effect on wallet balances and rollups.
+        The effect reverted is the one of the locked row, not of this
+        instance, which may be stale or already deleted elsewhere.
+        """
+        with transaction.atomic():
+            current = Transaction.objects.select_for_update().only(*LEDGER_FIELDS).filter(pk=self.pk).first()
+            # Deleted first, so a wallet's last transaction date is recomputed without it
+            result = super().delete(*args, **kwargs)
+            if result[0] and current is not None:
+                ledger.record_changes(removed=[current])
+            return result
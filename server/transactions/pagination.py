@@ -0,0 +1,117 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionKeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination on (date, created_at, id), following the
+    model ordering. Each page is fetched with a range condition on the
+    (user, -date, -created_at, -id) index, so page 5000 costs the same as
+    page 1 and no COUNT(*) is ever run.
+    """
+    ordering = ('-date', '-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = "Curseur invalide."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = self.seek(queryset, self.decode_cursor(request))
+        return self.page(list(queryset[:self.page_size + 1]))
+
+    def seek(self, queryset, position):
+        """Order the queryset and keep the rows after `position` (None for the first page)"""
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            date, created_at, pk = position
+            # The leading `date <= ...` bound lets the planner use an index range scan
+            queryset = queryset.filter(date__lte=date).filter(
+                Q(date__lt=date)
+                | Q(created_at__lt=created_at)
+                | Q(created_at=created_at, pk__lt=pk)
+            )
+        return queryset
+
+    def page(self, results):
+        """Trim the page_size + 1 rows fetched after the cursor to one page"""
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.last = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        return self.page_size_from(request.query_params)
+
+    def page_size_from(self, params):
+        try:
+            size = int(params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        return self.decode(request.query_params.get(self.cursor_query_param))
+
+    def decode(self, encoded):
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            date, created_at, pk = raw.split('|')
+            return datetime.fromisoformat(date), datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        raw = f"{instance.date.isoformat()}|{instance.created_at.isoformat()}|{instance.pk}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TransactionPagination(BasePagination):
+    """
+    Keyset pagination by default (infinite scroll in the clients).
+    Page-number pagination, with its total `count`, is used when the client
+    asks for `?page=N` or for an ordering/search the keyset cannot follow.
+    """
+    page_number_params = ('page', 'ordering', 'search')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if any(param in request.query_params for param in self.page_number_params):
+            self.paginator = PageNumberPagination()
+        else:
+            self.paginator = TransactionKeysetPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
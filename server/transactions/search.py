@@ -0,0 +1,197 @@
+"""
+Indexed free-text search over transaction names and categories.
+
+- PostgreSQL: pg_trgm GIN indexes on UPPER(name) of the transactions and
+  of the categories serve the `icontains` lookups, and results are
+  ranked by trigram similarity.
+- SQLite: an FTS5 table with the trigram tokenizer (substring matching,
+  like `icontains`) kept in sync by triggers, ranked by bm25. Its content
+  is a view joining each transaction to its category name, so nothing is
+  stored twice; a category rename re-indexes the rows of its transactions.
+- Anything else, or queries too short for trigrams, falls back to the
+  plain DRF SearchFilter.
+"""
+from functools import lru_cache
+
+from django.db import OperationalError, connections
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+
+from .models import Category
+
+FTS_TABLE = 'transactions_transaction_fts'
+FTS_VIEW = 'transactions_transaction_search'
+
+# Trigram indexes cannot match fewer than three characters
+MIN_TERM_LENGTH = 3
+
+POSTGRES_INDEXES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS transaction_name_trgm_idx '
+    'ON transactions_transaction USING gin ((UPPER(name::text)) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS category_name_trgm_idx '
+    'ON transactions_category USING gin ((UPPER(name::text)) gin_trgm_ops)',
+]
+
+POSTGRES_DROP_SQL = [
+    'DROP INDEX IF EXISTS transaction_name_trgm_idx',
+    'DROP INDEX IF EXISTS category_name_trgm_idx',
+]
+
+SQLITE_VIEW_SQL = f"""CREATE VIEW IF NOT EXISTS {FTS_VIEW} AS
+    SELECT transactions_transaction.id AS id, transactions_transaction.name AS name,
+           transactions_category.name AS category
+    FROM transactions_transaction
+    JOIN transactions_category ON transactions_category.id = transactions_transaction.category_id"""
+
+
+def category_name_sql(row):
+    return f'(SELECT name FROM transactions_category WHERE id = {row}.category_id)'
+
+
+# An external content table is updated with the values it indexed: the
+# category of a row is still there when the row changes or goes away
+SQLITE_TRIGGERS_SQL = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, {category_name_sql('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, {category_name_sql('old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, category_id ON transactions_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        VALUES ('delete', old.id, old.name, {category_name_sql('old')});
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, {category_name_sql('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_cu AFTER UPDATE OF name ON transactions_category BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category)
+        SELECT 'delete', id, name, old.name FROM transactions_transaction WHERE category_id = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, name, category)
+        SELECT id, name, new.name FROM transactions_transaction WHERE category_id = new.id;
+    END""",
+]
+
+SQLITE_TRIGGER_SUFFIXES = ('ai', 'ad', 'au', 'cu')
+
+
+def install_search_index(connection, rebuild=False):
+    """
+    Create the search structures for the given connection (idempotent).
+    On SQLite this runs after every `migrate` (see suspend_search_index)
+    and re-indexes when the FTS table is new or `rebuild` is set.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_INDEXES_SQL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            rebuild = rebuild or cursor.fetchone() is None
+            cursor.execute(SQLITE_VIEW_SQL)
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"name, category, content='{FTS_VIEW}', content_rowid='id', tokenize='trigram')"
+                )
+            except OperationalError:
+                # SQLite built without FTS5 or older than 3.34: keep the LIKE fallback
+                cursor.execute(f'DROP VIEW IF EXISTS {FTS_VIEW}')
+                return
+            for statement in SQLITE_TRIGGERS_SQL:
+                cursor.execute(statement)
+            if rebuild:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    sqlite_fts_available.cache_clear()
+
+
+def suspend_search_index(connection):
+    """
+    Drop the SQLite triggers and view, keeping the indexed data. They
+    reference both tables, and SQLite refuses to rebuild a table (as
+    migrations do) while another table's trigger or a view names it.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for suffix in SQLITE_TRIGGER_SUFFIXES:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP VIEW IF EXISTS {FTS_VIEW}')
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRES_DROP_SQL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            suspend_search_index(connection)
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    sqlite_fts_available.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def sqlite_fts_available(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def fts_phrase(term):
+    """Quote a term as an FTS5 phrase so user input is never parsed as syntax"""
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+class TransactionSearchFilter(filters.SearchFilter):
+    """SearchFilter backed by the database's indexed text search"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or any(len(term) < MIN_TERM_LENGTH for term in terms):
+            return super().filter_queryset(request, queryset, view)
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            queryset = self.postgres_search(queryset, terms, request.user)
+        elif vendor == 'sqlite' and sqlite_fts_available(queryset.db):
+            queryset = self.sqlite_search(queryset, terms)
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('-search_rank', '-date', '-created_at', '-id')
+        return queryset
+
+    def postgres_search(self, queryset, terms, user):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        condition = Q()
+        for term in terms:
+            # UPPER(col::text) LIKE UPPER(...): served by the gin_trgm_ops indexes
+            categories = Category.objects.filter(user=user, name__icontains=term).values('pk')
+            condition &= Q(name__icontains=term) | Q(category__in=categories)
+        query = ' '.join(terms)
+        return queryset.filter(condition).annotate(
+            search_rank=Greatest(
+                TrigramWordSimilarity(query, F('name')),
+                TrigramWordSimilarity(query, F('category__name')),
+            )
+        )
+
+    def sqlite_search(self, queryset, terms):
+        match = ' AND '.join(fts_phrase(term) for term in terms)
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                # Restricting the ids first keeps the planner from walking the
+                # user index and running the MATCH once per row (COUNT(*) has
+                # no ORDER BY to steer it towards the FTS table)
+                f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+                f'{FTS_TABLE}.rowid = "{table}"."id"',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match, match],
+            # bm25() is lower for better matches
+            select={'search_rank': f'-bm25({FTS_TABLE})'},
+        )
@@ -1,10 +1,56 @@
 from rest_framework import serializers
-from .models import Transaction
+from . import categories
+from .models import Category, Transaction, category_key
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class CategoryField(serializers.CharField):
+    """
+    A category read and written by name. Validated data keeps the name:
+    the serializers resolve it to the user's Category when saving (see
+    categories.attach), bulk paths resolve all their rows at once.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', 100)
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return value.name if isinstance(value, Category) else value
+
+
+class CategoryNameMixin:
+    """Resolves the `category` name of the validated data on save"""
+
+    def create(self, validated_data):
+        categories.attach(validated_data['user'], [validated_data])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        categories.attach(instance.user_id, [validated_data])
+        return super().update(instance, validated_data)
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    """Serializer for Category model"""
+
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'created_at')
+        read_only_fields = ('id', 'created_at')
+
+    def validate_name(self, value):
+        others = Category.objects.filter(user=self.context['request'].user, key=category_key(value))
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError("Cette catégorie existe déjà.")
+        return value
+
+
+class TransactionSerializer(CategoryNameMixin, serializers.ModelSerializer):
     """Serializer for Transaction model"""
     wallet_name = serializers.CharField(source='wallet.name', read_only=True)
+    category = CategoryField()
     type_display = serializers.CharField(source='get_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     
@@ -13,7 +59,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'wallet', 'wallet_name', 'name', 'amount', 'category',
             'type', 'type_display', 'status', 'status_display',
-            'date', 'icon', 'created_at', 'updated_at'
+            'date', 'icon', 'external_id', 'created_at', 'updated_at'
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
     
@@ -24,9 +70,56 @@ class TransactionSerializer(serializers.ModelSerializer):
         return value
 
 
-class TransactionCreateSerializer(serializers.ModelSerializer):
+class TransactionCreateSerializer(CategoryNameMixin, serializers.ModelSerializer):
     """Serializer for creating transactions"""
-    
+    category = CategoryField()
+
     class Meta:
         model = Transaction
         fields = ('wallet', 'name', 'amount', 'category', 'type', 'status', 'date', 'icon')
+
+
+class TransactionImportSerializer(TransactionCreateSerializer):
+    """
+    Validates one imported row.
+    Wallets are resolved from the `wallets` mapping in the context (the
+    user's own wallets, loaded once) instead of one query per row.
+    """
+    wallet = serializers.IntegerField(required=False)
+    external_id = serializers.CharField(max_length=255, required=False, allow_null=True)
+
+    class Meta(TransactionCreateSerializer.Meta):
+        fields = TransactionCreateSerializer.Meta.fields + ('external_id',)
+        validators = []
+
+    def validate_wallet(self, value):
+        try:
+            return self.context['wallets'][value]
+        except KeyError:
+            raise serializers.ValidationError("Portefeuille introuvable.")
+
+    def validate_amount(self, value):
+        """Ensure amount is positive"""
+        if value <= 0:
+            raise serializers.ValidationError("Le montant doit être positif.")
+        return value
+
+    def validate(self, attrs):
+        if 'wallet' not in attrs:
+            default_wallet = self.context.get('default_wallet')
+            if default_wallet is None:
+                raise serializers.ValidationError({'wallet': "Ce champ est obligatoire."})
+            attrs['wallet'] = default_wallet
+        return attrs
+
+
+class TransactionBatchSerializer(TransactionImportSerializer):
+    """
+    Validates the data of one batch operation. Bound with `partial=True`
+    for updates, which only carry the changed fields.
+    """
+
+    def validate(self, attrs):
+        if self.partial:
+            return attrs
+        return super().validate(attrs)
@@ -1,3 +1,622 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import zipfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from analytics.models import MonthlyRollup
+from authentication.models import User
+from core.models import Tombstone
+from wallets.models import Wallet
+from . import categories
+from .categories import category_for
+from .models import Category, Transaction
+from .search import TransactionSearchFilter
+
+
+def create_user(email='user@monely.test'):
+    return User.objects.create_user(username=email, email=email, password='MonelyPass123!', name='Test')
+
+
+def create_transaction(user, wallet, amount, type='expense', category='Courses', **kwargs):
+    kwargs.setdefault('date', timezone.now())
+    if isinstance(category, str):
+        category = category_for(user, category)
+    return Transaction.objects.create(
+        user=user, wallet=wallet, name='Transaction', amount=Decimal(amount), type=type,
+        category=category, **kwargs
+    )
+
+
+class WalletBalanceTests(TestCase):
+    """Wallet balances follow every create, update and delete"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking', balance=100)
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+
+    def balances(self):
+        return (
+            Wallet.objects.get(pk=self.wallet.pk).balance,
+            Wallet.objects.get(pk=self.savings.pk).balance,
+        )
+
+    def test_create_income_and_expense(self):
+        create_transaction(self.user, self.wallet, '50', type='income')
+        create_transaction(self.user, self.wallet, '30')
+        self.assertEqual(self.balances(), (Decimal('120'), Decimal('0')))
+
+    def test_update_moves_amount_between_wallets(self):
+        tx = create_transaction(self.user, self.wallet, '30')
+        tx.wallet = self.savings
+        tx.amount = Decimal('10')
+        tx.save()
+        self.assertEqual(self.balances(), (Decimal('100'), Decimal('-10')))
+
+    def test_transfer_create_and_delete(self):
+        tx = create_transaction(self.user, self.wallet, '40', type='transfer', receiver_wallet=self.savings)
+        self.assertEqual(self.balances(), (Decimal('60'), Decimal('40')))
+        tx.delete()
+        self.assertEqual(self.balances(), (Decimal('100'), Decimal('0')))
+
+    def test_delete_from_stale_instances(self):
+        tx = create_transaction(self.user, self.wallet, '50')
+        stale = Transaction.objects.get(pk=tx.pk)
+        stale.amount = Decimal('80')
+        tx.delete()
+        stale.delete()
+        self.assertEqual(self.balances(), (Decimal('100'), Decimal('0')))
+        stats = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(stats.transaction_count, 0)
+
+    def test_create_query_count(self):
+        category = create_transaction(self.user, self.wallet, '10').category
+        # INSERT, wallet UPDATE, rollup UPDATE and budget lookup, plus the savepoint pair
+        with self.assertNumQueries(6):
+            create_transaction(self.user, self.wallet, '30', category=category)
+
+
+class WalletBalanceConcurrencyTests(TransactionTestCase):
+    """Concurrent writers on one wallet must never lose a balance update"""
+    THREADS = 8
+    WRITES_PER_THREAD = 25
+
+    def test_concurrent_writes_do_not_drift_balance(self):
+        # SQLite's feature flag is always off; a file test database (see settings) shares its rows between connections
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Base de test en mémoire : une seule connexion.")
+        user = create_user()
+        wallet = Wallet.objects.create(user=user, name='Courant', type='checking')
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for _ in range(self.WRITES_PER_THREAD):
+                    type = 'income' if index % 2 else 'expense'
+                    create_transaction(user, wallet, '1.50' if type == 'income' else '1.00', type=type)
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        half = self.THREADS // 2 * self.WRITES_PER_THREAD
+        expected = half * Decimal('1.50') - half * Decimal('1.00')
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, expected)
+        self.assertEqual(Transaction.objects.filter(wallet=wallet).count(), self.THREADS * self.WRITES_PER_THREAD)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class TransactionQueryCountTests(TestCase):
+    """List and detail endpoints must run a constant number of queries"""
+    ROW_COUNTS = (10, 100, 1000)
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallets = [
+            Wallet.objects.create(user=self.user, name=f'Compte {i}', type='checking') for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def populate(self, rows):
+        Transaction.objects.filter(user=self.user).delete()
+        now = timezone.now()
+        category = category_for(self.user, 'Courses')
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user, wallet=self.wallets[i % 3], name=f'Transaction {i}',
+                amount=Decimal('10'), type='expense', category=category, date=now,
+            )
+            for i in range(rows)
+        )
+        return Transaction.objects.filter(user=self.user).first()
+
+    def test_list_keyset(self):
+        for rows in self.ROW_COUNTS:
+            with self.subTest(rows=rows):
+                self.populate(rows)
+                with self.assertNumQueries(1):
+                    response = self.client.get('/api/transactions/transactions/?page_size=100')
+                self.assertEqual(response.status_code, 200)
+
+    def test_list_page_number(self):
+        for rows in self.ROW_COUNTS:
+            with self.subTest(rows=rows):
+                self.populate(rows)
+                # COUNT(*) + page
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/transactions/transactions/?page=1')
+                self.assertEqual(response.data['count'], rows)
+
+    def test_detail(self):
+        for rows in self.ROW_COUNTS:
+            with self.subTest(rows=rows):
+                tx = self.populate(rows)
+                with self.assertNumQueries(1):
+                    response = self.client.get(f'/api/transactions/transactions/{tx.pk}/')
+                self.assertEqual(response.data['wallet_name'], tx.wallet.name)
+
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class TransactionSearchTests(TestCase):
+    """Search matches substrings of names and categories, for the owner only"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        for name, category in (('Carrefour Market', 'Alimentation'), ('SNCF carte', 'Transport')):
+            Transaction.objects.create(
+                user=self.user, wallet=self.wallet, name=name, amount=Decimal('10'),
+                type='expense', category=category_for(self.user, category), date=timezone.now(),
+            )
+        other = create_user('other@monely.test')
+        other_wallet = Wallet.objects.create(user=other, name='Courant', type='checking')
+        Transaction.objects.create(
+            user=other, wallet=other_wallet, name='Carrefour', amount=Decimal('10'),
+            type='expense', category=category_for(other, 'Alimentation'), date=timezone.now(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, term):
+        response = self.client.get('/api/transactions/transactions/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.data['results'])
+
+    def test_substring_of_name_and_category(self):
+        self.assertEqual(self.search('FOUR'), ['Carrefour Market'])
+        self.assertEqual(self.search('arte'), ['SNCF carte'])
+        self.assertEqual(self.search('ali'), ['Carrefour Market'])
+        self.assertEqual(self.search('zzz'), [])
+
+    def test_short_term_falls_back(self):
+        self.assertEqual(self.search('sn'), ['SNCF carte'])
+
+    def test_follows_updates_and_deletes(self):
+        tx = Transaction.objects.get(user=self.user, name='SNCF carte')
+        tx.name = 'Uber'
+        tx.save()
+        self.assertEqual(self.search('uber'), ['Uber'])
+        tx.delete()
+        self.assertEqual(self.search('uber'), [])
+
+    def test_postgres_query_scoped_to_user(self):
+        # Built (not run) here; the tests above run it on PostgreSQL
+        queryset = TransactionSearchFilter().postgres_search(
+            Transaction.objects.filter(user=self.user), ['four'], self.user
+        )
+        sql = str(queryset.query)
+        categories = sql[sql.index('FROM "transactions_category"'):]
+        self.assertIn(f'U0."user_id" = {self.user.pk}', categories)
+
+    def test_follows_category_changes(self):
+        tx = Transaction.objects.get(user=self.user, name='SNCF carte')
+        tx.category = category_for(self.user, 'Voyages')
+        tx.save()
+        self.assertEqual(self.search('voyage'), ['SNCF carte'])
+        Category.objects.filter(user=self.user, name='Voyages').update(name='Déplacements')
+        self.assertEqual(self.search('voyage'), [])
+        self.assertEqual(self.search('placement'), ['SNCF carte'])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class CategoryTests(TestCase):
+    """Category names of the API stored once per user"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, category, user=None):
+        client = self.client
+        if user is not None:
+            client = APIClient()
+            client.force_authenticate(user)
+            wallet = Wallet.objects.create(user=user, name='Courant', type='checking')
+        response = client.post('/api/transactions/transactions/', {
+            'wallet': (wallet if user is not None else self.wallet).pk, 'name': 'Achat', 'amount': '10',
+            'category': category, 'type': 'expense', 'date': timezone.now().isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_names_resolved_per_user(self):
+        self.assertEqual(self.post(' Courses ')['category'], 'Courses')
+        self.post('Courses')
+        self.post('Loisirs')
+        self.post('Courses', user=create_user('other@monely.test'))
+        self.assertEqual(
+            sorted(Category.objects.values_list('user__email', 'name')),
+            [('other@monely.test', 'Courses'), ('user@monely.test', 'Courses'), ('user@monely.test', 'Loisirs')],
+        )
+        response = self.client.get('/api/transactions/transactions/', {'category': 'Courses'})
+        self.assertEqual([row['category'] for row in response.data['results']], ['Courses', 'Courses'])
+        self.assertEqual(
+            [row['name'] for row in self.client.get('/api/transactions/categories/').data], ['Courses', 'Loisirs']
+        )
+
+    def test_names_compared_case_insensitively(self):
+        self.post('Courses')
+        self.assertEqual(self.post('courses ')['category'], 'Courses')
+        self.assertEqual(categories.for_user(self.user, ['COURSES'])['COURSES'].name, 'Courses')
+        self.assertEqual(Category.objects.count(), 1)
+        response = self.client.get('/api/transactions/transactions/', {'category': 'courses'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.post('/api/transactions/categories/', {'name': 'COURSES'})
+        self.assertEqual(response.status_code, 400)
+        # A new category keeps one spelling whatever the batch sends
+        found = categories.resolve([(self.user.pk, 'loisirs'), (self.user.pk, 'Loisirs')])
+        self.assertEqual({category.name for category in found.values()}, {'Loisirs'})
+        category = Category.objects.get(name='Courses')
+        response = self.client.patch(f'/api/transactions/categories/{category.pk}/', {'name': 'courses'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_rename_and_delete(self):
+        self.post('Courses')
+        tx_id = Transaction.objects.get().pk
+        category = Category.objects.get(name='Courses')
+        Transaction.objects.filter(pk=tx_id).update(updated_at=timezone.now() - timedelta(days=1))
+        response = self.client.patch(f'/api/transactions/categories/{category.pk}/', {'name': 'Alimentation'})
+        self.assertEqual(response.status_code, 200)
+        tx = self.client.get(f'/api/transactions/transactions/{tx_id}/').data
+        self.assertEqual(tx['category'], 'Alimentation')
+        # Delta sync sends the renamed rows again
+        self.assertGreater(Transaction.objects.get(pk=tx_id).updated_at, timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(self.client.delete(f'/api/transactions/categories/{category.pk}/').status_code, 400)
+        Transaction.objects.get(pk=tx_id).delete()
+        self.assertEqual(self.client.delete(f'/api/transactions/categories/{category.pk}/').status_code, 204)
+
+
+class CategoryMigrationTests(TransactionTestCase):
+    """0007_category merges the names differing by case or spaces"""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        # State of every applied migration, not only of the targets' dependencies
+        applied = MigrationExecutor(connection).loader.applied_migrations
+        return executor.loader.project_state(list(applied)).apps
+
+    def test_spellings_merged(self):
+        before = [('transactions', '0006_transaction_sync_index'), ('wallets', '0008_budgets')]
+        after = [('transactions', '0007_category'), ('wallets', '0009_budget_category')]
+        apps = self.migrate(before)
+        user = apps.get_model('authentication', 'User').objects.create(
+            username='user@monely.test', email='user@monely.test', name='Test'
+        )
+        wallet = apps.get_model('wallets', 'Wallet').objects.create(user=user, name='Courant', type='checking')
+        Transaction = apps.get_model('transactions', 'Transaction')
+        for name in ('courses', 'Courses ', 'Courses', 'Courses', 'Loisirs'):
+            Transaction.objects.create(
+                user=user, wallet=wallet, name='Achat', amount=10, category=name, type='expense', date=timezone.now()
+            )
+        Budget = apps.get_model('wallets', 'Budget')
+        Budget.objects.create(user=user, category='COURSES', period='monthly', limit=100)
+        Budget.objects.create(user=user, category='courses', period='monthly', limit=200)
+
+        try:
+            apps = self.migrate(after)
+            Category = apps.get_model('transactions', 'Category')
+            self.assertEqual(sorted(Category.objects.values_list('name', 'key')), [
+                ('Courses', 'courses'), ('Loisirs', 'loisirs'),
+            ])
+            self.assertEqual(
+                apps.get_model('transactions', 'Transaction').objects.filter(category__name='Courses').count(), 4
+            )
+            self.assertEqual(list(apps.get_model('wallets', 'Budget').objects.values_list('limit', flat=True)), [100])
+        finally:
+            call_command('migrate', verbosity=0)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class TransactionExportTests(TestCase):
+    """Streamed exports in every format, with filters"""
+    url = '/api/transactions/transactions/export/'
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        rows = ((3, self.wallet, 'Loyer'), (10, self.wallet, 'Café "noir" & co'), (20, self.savings, 'Intérêts'))
+        for day, wallet, category in rows:
+            create_transaction(
+                self.user, wallet, '12.50', date=timezone.make_aware(datetime(2024, 5, day, 12)), category=category
+            )
+        other = create_user('other@monely.test')
+        create_transaction(other, Wallet.objects.create(user=other, name='Courant', type='checking'), '1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export().decode('utf-8-sig'))))
+        self.assertEqual([row['category'] for row in rows], ['Loyer', 'Café "noir" & co', 'Intérêts'])
+        self.assertEqual(rows[0]['amount'], '12.50')
+        self.assertEqual(rows[2]['wallet_name'], 'Épargne')
+
+    def test_json_with_filters(self):
+        rows = json.loads(self.export(export_format='json', date_from='2024-05-10', wallet=self.wallet.pk))
+        self.assertEqual([row['category'] for row in rows], ['Café "noir" & co'])
+        rows = json.loads(self.export(export_format='json', date_to='2024-05-03'))
+        self.assertEqual([row['category'] for row in rows], ['Loyer'])
+        self.assertEqual(json.loads(self.export(export_format='json', date_from='2025-01-01')), [])
+
+    def test_jsonl_and_xlsx(self):
+        lines = self.export(export_format='jsonl').decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        with zipfile.ZipFile(io.BytesIO(self.export(export_format='xlsx'))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('Café "noir" &amp; co', sheet)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'export_format': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'date_from': '05/2024'}).status_code, 400)
+
+
+OFX_STATEMENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240305120000<TRNAMT>-45.50<FITID>FIT-1<NAME>Supermarché
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240301<TRNAMT>1500.00<FITID>FIT-2<MEMO>Salaire mars
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class TransactionImportTests(TestCase):
+    """Bank history imports, all-or-nothing and idempotent"""
+    url = '/api/transactions/transactions/import/'
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking', balance=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, filename, content, **data):
+        return self.client.post(self.url, {
+            'file': SimpleUploadedFile(filename, content.encode()), 'wallet': self.wallet.pk, **data,
+        }, format='multipart')
+
+    def balance(self):
+        return Wallet.objects.get(pk=self.wallet.pk).balance
+
+    def test_csv(self):
+        response = self.upload('releve.csv', (
+            'Name,Amount,Date,Category\n'
+            'Salaire,1500,2024-03-01,Salaire\n'
+            'Courses,"-45,50",2024-03-05T12:00:00,\n'
+            'Loyer,-800,2024-03-06,Logement\n'
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'created': 3, 'skipped': 0, 'errors': []})
+        rows = Transaction.objects.filter(user=self.user).order_by('date')
+        self.assertEqual([(tx.type, tx.amount, tx.category.name) for tx in rows], [
+            ('income', Decimal('1500'), 'Salaire'),
+            ('expense', Decimal('45.50'), 'Import'),
+            ('expense', Decimal('800'), 'Logement'),
+        ])
+        # One balance and rollup update for the whole file
+        self.assertEqual(self.balance(), Decimal('754.50'))
+        totals = {
+            (row.category.name, row.type): (row.total, row.count)
+            for row in MonthlyRollup.objects.filter(user=self.user)
+        }
+        self.assertEqual(totals[('Salaire', 'income')], (Decimal('1500'), 1))
+        self.assertEqual(totals[('Import', 'expense')], (Decimal('45.50'), 1))
+        out = io.StringIO()
+        call_command('rebuild_rollups', check=True, stdout=out)
+        self.assertIn('Agrégats cohérents', out.getvalue())
+
+    def test_ofx_reimport_is_idempotent(self):
+        first = self.upload('releve.ofx', OFX_STATEMENT)
+        self.assertEqual(first.data, {'created': 2, 'skipped': 0, 'errors': []})
+        self.assertEqual(
+            dict(Transaction.objects.values_list('external_id', 'name')),
+            {'FIT-1': 'Supermarché', 'FIT-2': 'Salaire mars'},
+        )
+        self.assertEqual(self.balance(), Decimal('1554.50'))
+
+        second = self.upload('releve.ofx', OFX_STATEMENT)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, {'created': 0, 'skipped': 2, 'errors': []})
+        self.assertEqual(self.balance(), Decimal('1554.50'))
+
+    def test_jsonl(self):
+        savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        content = '\n'.join([
+            json.dumps({'name': 'Virement', 'amount': '200', 'type': 'income', 'date': '2024-03-01',
+                        'wallet': savings.pk, 'external_id': 'json-1'}),
+            '',
+            json.dumps({'name': 'Café', 'amount': -3.2, 'date': '2024-03-02', 'category': 'Sorties'}),
+        ])
+        response = self.upload('export.txt', content, file_format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Wallet.objects.get(pk=savings.pk).balance, Decimal('200'))
+        self.assertEqual(self.balance(), Decimal('96.80'))
+
+        self.assertEqual(self.upload('export.jsonl', '{"name": "Café"\n').status_code, 400)
+
+    def test_invalid_row_writes_nothing(self):
+        response = self.upload('releve.csv', (
+            'name,amount,date\n'
+            'Salaire,1500,2024-03-01\n'
+            'Courses,abc,2024-03-02\n'
+            'Loyer,-800,pas une date\n'
+        ))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(MonthlyRollup.objects.exists())
+        self.assertEqual(self.balance(), Decimal('100'))
+
+    def test_concurrent_import_conflict(self):
+        attach = categories.attach
+
+        def attach_after_concurrent_import(user, rows):
+            # Another import commits the same statement between the lookup and the insert
+            create_transaction(self.user, self.wallet, '45.50', external_id='FIT-1')
+            return attach(user, rows)
+
+        with mock.patch.object(categories, 'attach', attach_after_concurrent_import):
+            response = self.upload('releve.ofx', OFX_STATEMENT)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(self.balance(), Decimal('100'))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class TransactionBatchTests(TestCase):
+    """Many writes in one request, applied atomically with coalesced side effects"""
+    url = '/api/transactions/transactions/batch/'
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking', balance=100)
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def data(self, amount, **kwargs):
+        return {
+            'wallet': self.wallet.pk, 'name': 'Courses', 'amount': amount, 'category': 'Courses',
+            'type': 'expense', 'date': '2024-03-10T12:00:00Z', **kwargs,
+        }
+
+    def test_mixed_operations(self):
+        edited = create_transaction(self.user, self.wallet, '30')
+        removed = create_transaction(self.user, self.wallet, '20')
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'create', 'ref': 'local-1', 'data': self.data('10')},
+            {'op': 'create', 'data': self.data('5', wallet=self.savings.pk, type='income')},
+            {'op': 'update', 'id': edited.pk, 'data': {'amount': '50', 'wallet': self.savings.pk}},
+            {'op': 'delete', 'id': removed.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([item['status'] for item in results], ['created', 'created', 'updated', 'deleted'])
+        self.assertEqual(results[0]['ref'], 'local-1')
+        self.assertEqual(results[0]['data']['wallet_name'], 'Courant')
+        self.assertEqual(results[2]['data']['amount'], '50.00')
+        self.assertFalse(Transaction.objects.filter(pk=removed.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(model='transactions', object_id=removed.pk).exists())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('90'))
+        self.assertEqual(Wallet.objects.get(pk=self.savings.pk).balance, Decimal('-45'))
+        out = io.StringIO()
+        call_command('rebuild_rollups', check=True, stdout=out)
+        self.assertIn('Agrégats cohérents', out.getvalue())
+
+    def test_invalid_operation_writes_nothing(self):
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'create', 'data': self.data('10')},
+            {'op': 'create', 'data': self.data('-1')},
+            {'op': 'update', 'id': 999999, 'data': {'amount': '1'}},
+            {'op': 'rename'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('100'))
+
+    def test_resent_batch_is_idempotent(self):
+        operations = {'operations': [{'op': 'create', 'data': self.data('10', external_id='device-1')}]}
+        first = self.client.post(self.url, operations, format='json').data['results'][0]
+        second = self.client.post(self.url, operations, format='json').data['results'][0]
+        self.assertEqual((second['status'], second['id']), ('skipped', first['id']))
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('90'))
+
+    def test_update_cannot_reuse_external_id(self):
+        taken = create_transaction(self.user, self.wallet, '10', external_id='device-1')
+        edited = create_transaction(self.user, self.wallet, '20')
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'update', 'id': edited.pk, 'data': {'external_id': 'device-1'}},
+            {'op': 'create', 'data': self.data('5', external_id='device-2')},
+            {'op': 'update', 'id': taken.pk, 'data': {'external_id': 'device-2'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 2])
+        # Keeping its own identifier is not a conflict
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'update', 'id': taken.pk, 'data': {'external_id': 'device-1', 'amount': '15'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow(self):
+        existing = [create_transaction(self.user, self.wallet, '1') for _ in range(100)]
+        operations = [
+            {'op': 'create', 'data': self.data('1', wallet=wallet.pk, category=f'Catégorie {index % 5}')}
+            for index, wallet in enumerate([self.wallet, self.savings] * 150)
+        ]
+        operations += [{'op': 'update', 'id': tx.pk, 'data': {'amount': '2'}} for tx in existing[:100]]
+        # Wallets, locked rows, the new categories (read, created, read
+        # again), the categories of the updated rows, INSERT, UPDATE, two
+        # wallet UPDATEs, rollup upsert, budget lookup and the savepoints;
+        # SQLite splits the INSERT at 999 parameters
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        inserts = connection.ops.bulk_batch_size(
+            [field for field in Transaction._meta.concrete_fields if not field.primary_key], operations[:300]
+        )
+        self.assertEqual(len(queries), 13 + -(-300 // inserts))
+        self.assertEqual(len(response.data['results']), 400)
+        # 100 - 100 existing - 150 created - 100 more from the updates
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('-250'))
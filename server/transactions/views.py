@@ -1,17 +1,49 @@
-from rest_framework import viewsets, permissions, filters
-from django_filters.rest_framework import DjangoFilterBackend
-from .serializers import TransactionSerializer, TransactionCreateSerializer
-from .models import Transaction
+from datetime import datetime, time
 
-class TransactionViewSet(viewsets.ModelViewSet):
+from django.db import IntegrityError, transaction
+from django.db.models import RestrictedError
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from django_filters.rest_framework import CharFilter, DjangoFilterBackend, FilterSet
+from core.async_views import AsyncReadView
+from core.cache import CachedReadMixin
+from wallets.models import Wallet
+from .serializers import TransactionSerializer, TransactionCreateSerializer, CategorySerializer
+from .models import Category, Transaction, category_key
+from .pagination import TransactionKeysetPagination, TransactionPagination
+from .search import TransactionSearchFilter
+from . import batch, exporters, importers
+
+class TransactionFilter(FilterSet):
+    """The `category` filter takes a category name, like the API fields"""
+    category = CharFilter(method='filter_category')
+
+    class Meta:
+        model = Transaction
+        fields = ['wallet', 'type', 'category', 'status']
+
+    def filter_category(self, queryset, name, value):
+        # Filtering on the id lets the database use the (user, category, date) index
+        category_id = Category.objects.filter(user=self.request.user, key=category_key(value)).values_list('pk', flat=True).first()
+        return queryset.filter(category_id=category_id) if category_id else queryset.none()
+
+
+class TransactionViewSet(CachedReadMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ['wallet', 'type', 'category', 'status']
+    pagination_class = TransactionPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, TransactionSearchFilter]
+    filterset_class = TransactionFilter
     ordering_fields = ['date', 'amount', 'created_at']
-    search_fields = ['name', 'category']
+    search_fields = ['name', 'category__name']
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        # wallet_name and category are rendered for every row: join them instead of one query per row
+        return Transaction.objects.filter(user=self.request.user).select_related('wallet', 'category')
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -20,3 +52,173 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_file(self, request):
+        """
+        Import a CSV, OFX or JSON-lines bank history file.
+        Form fields: `file`, optional `wallet` (default wallet for rows that
+        do not name one) and optional `file_format` (csv, ofx, jsonl).
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ["Aucun fichier fourni."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        wallets = {wallet.pk: wallet for wallet in Wallet.objects.filter(user=request.user)}
+        default_wallet = None
+        if request.data.get('wallet'):
+            try:
+                default_wallet = wallets[int(request.data['wallet'])]
+            except (KeyError, ValueError):
+                return Response({'wallet': ["Portefeuille introuvable."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_format = importers.detect_format(upload.name, request.data.get('file_format'))
+            result = importers.import_transactions(
+                request.user, importers.parse(upload, file_format), wallets, default_wallet
+            )
+        except importers.ImportFormatError as exc:
+            return Response({'file': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Another import inserted the same external ids first; nothing was written
+            return Response(
+                {'file': ["Import concurrent en cours pour ces transactions : réessayer."]},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        if result['errors']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch_write(self, request):
+        """
+        Apply a list of operations in one transaction:
+        `{"operations": [{"op": "create", "data": {...}, "ref": "..."},
+        {"op": "update", "id": 12, "data": {...}}, {"op": "delete", "id": 13}]}`.
+        Updates are partial. If any operation is invalid nothing is written
+        and the errors are returned by operation index.
+        """
+        try:
+            operations = batch.parse_operations(request.data)
+        except batch.BatchError as exc:
+            return Response({'operations': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        wallets = {wallet.pk: wallet for wallet in Wallet.objects.filter(user=request.user)}
+        results, errors = batch.apply_batch(request.user, operations, wallets)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the whole history, oldest first, as CSV, JSON, JSON lines or XLSX.
+        Query parameters: `export_format` (csv by default; `format` is taken by
+        DRF), `date_from` / `date_to` (YYYY-MM-DD, inclusive) and the list
+        filters (`wallet`, `category`, `type`, `status`, `search`).
+        """
+        file_format = request.query_params.get('export_format', 'csv').lower()
+        if file_format not in exporters.FORMATS:
+            return Response(
+                {'export_format': [f"Valeurs possibles : {', '.join(exporters.FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        bounds = {'date_from': ('date__gte', time.min), 'date_to': ('date__lte', time.max)}
+        for param, (lookup, clock) in bounds.items():
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                day = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({param: ["Format attendu : AAAA-MM-JJ."]}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookup: timezone.make_aware(datetime.combine(day, clock))})
+
+        response = StreamingHttpResponse(
+            exporters.export(queryset.order_by('date', 'created_at', 'id'), file_format),
+            content_type=exporters.CONTENT_TYPES[file_format],
+        )
+        filename = f"transactions-{timezone.localdate():%Y%m%d}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Let reverse proxies pass chunks through as they are produced
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class CategoryViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """
+    The user's categories. Writing a transaction with a new category name
+    creates it; renaming one renames it on all its transactions.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = CategorySerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return Category.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            category = serializer.save()
+            # Delta sync sends the rows changed since a cursor: the renamed ones are
+            Transaction.objects.filter(category=category).update(updated_at=timezone.now())
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except RestrictedError:
+            return Response(
+                {'detail': "Cette catégorie est utilisée par des transactions."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class AsyncTransactionListView(AsyncReadView):
+    """
+    Keyset-paginated transaction list of TransactionViewSet (infinite
+    scroll), served through the async ORM. Supports the `wallet`, `type`,
+    `category` and `status` filters and `cursor` / `page_size`; page
+    numbers, ordering and search stay on the DRF endpoint.
+    """
+    choices = {
+        'type': dict(Transaction._meta.get_field('type').choices),
+        'status': dict(Transaction.STATUS_CHOICES),
+    }
+
+    async def build(self, request):
+        for param in TransactionPagination.page_number_params:
+            if param in request.GET:
+                raise ValidationError({param: "Non pris en charge ici : utiliser /api/transactions/transactions/."})
+
+        queryset = Transaction.objects.filter(user=request.user).select_related('wallet', 'category')
+        if request.GET.get('wallet'):
+            try:
+                queryset = queryset.filter(wallet=int(request.GET['wallet']))
+            except ValueError:
+                raise ValidationError({'wallet': "Nombre entier attendu."})
+        for field in ('type', 'category', 'status'):
+            value = request.GET.get(field)
+            if not value:
+                continue
+            if field in self.choices and value not in self.choices[field]:
+                raise ValidationError({field: f"Valeurs possibles : {', '.join(self.choices[field])}."})
+            if field == 'category':
+                category_id = await Category.objects.filter(user=request.user, key=category_key(value)).values_list(
+                    'pk', flat=True
+                ).afirst()
+                queryset = queryset.filter(category_id=category_id) if category_id else queryset.none()
+            else:
+                queryset = queryset.filter(**{field: value})
+
+        paginator = TransactionKeysetPagination()
+        paginator.request = request
+        paginator.page_size = paginator.page_size_from(request.GET)
+        queryset = paginator.seek(queryset, paginator.decode(request.GET.get(paginator.cursor_query_param)))
+        rows = paginator.page([row async for row in queryset[:paginator.page_size + 1]])
+        return {'next': paginator.get_next_link(), 'results': TransactionSerializer(rows, many=True).data}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, SavingGoal
+from .models import Wallet, SavingGoal, Budget, BudgetAlert, ExchangeRate
 
 
 @admin.register(Wallet)
@@ -9,7 +9,10 @@ class WalletAdmin(admin.ModelAdmin):
     list_filter = ('type', 'currency', 'created_at')
     search_fields = ('name', 'user__email', 'user__name')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = (
+        'transaction_count', 'last_transaction_date', 'stats_month', 'month_inflow', 'month_outflow',
+        'created_at', 'updated_at',
+    )
     
     fieldsets = (
         ('Informations générales', {
@@ -18,6 +21,9 @@ class WalletAdmin(admin.ModelAdmin):
         ('Finances', {
             'fields': ('balance', 'currency')
         }),
+        ('Statistiques', {
+            'fields': ('transaction_count', 'last_transaction_date', 'stats_month', 'month_inflow', 'month_outflow')
+        }),
         ('Apparence', {
             'fields': ('color', 'icon')
         }),
@@ -52,3 +58,34 @@ class SavingGoalAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    """Admin configuration for Budget model"""
+    list_display = ('category', 'period', 'user', 'limit', 'spent', 'currency', 'period_start', 'alert_level')
+    list_filter = ('period', 'currency')
+    search_fields = ('category__name', 'user__email', 'user__name')
+    ordering = ('user', 'category__name')
+    readonly_fields = ('period_start', 'spent', 'alert_level', 'created_at', 'updated_at')
+    list_select_related = ('user', 'category')
+
+
+@admin.register(BudgetAlert)
+class BudgetAlertAdmin(admin.ModelAdmin):
+    """Admin configuration for BudgetAlert model"""
+    list_display = ('budget', 'user', 'threshold', 'period_start', 'spent', 'limit', 'created_at')
+    list_filter = ('threshold',)
+    search_fields = ('budget__category__name', 'user__email')
+    readonly_fields = ('created_at',)
+    list_select_related = ('user', 'budget__category')
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    """Admin configuration for ExchangeRate model"""
+    list_display = ('date', 'base', 'quote', 'rate', 'source')
+    list_filter = ('base', 'quote', 'source')
+    search_fields = ('base', 'quote')
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,163 @@
+"""
+Budgets maintained by the transaction write path.
+
+The ledger hands over the expense rows a write adds and removes; the
+budgets of their categories are locked, their `spent` moved by the
+rows dated in the current period, and the thresholds the write makes
+them cross are recorded as BudgetAlert rows in the same transaction. A
+write with no budget on its categories costs one indexed SELECT.
+
+A budget still holding a past period is reloaded from the monthly
+rollups (the transactions for weekly budgets) by the first write of the
+new period, or by the `wallets.roll_budgets` job; until then serializers
+show nothing spent. Only wallets in the budget's currency count: amounts
+are never converted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from analytics.models import MonthlyRollup
+from core.cache import bump_user_version
+from .models import Budget, BudgetAlert, Wallet
+
+THRESHOLDS = (80, 100)
+ZERO = Decimal('0')
+
+
+def all_transactions():
+    # Imported late: the transaction model imports the ledger, which imports this module
+    from transactions.models import Transaction
+    return Transaction.objects.all()
+
+
+def expense_entries(tx, sign):
+    """(category_id, (local day, wallet_id, signed amount)) of an expense row"""
+    if tx.type == 'expense':
+        yield tx.category_id, (timezone.localtime(tx.date).date(), tx.wallet_id, sign * tx.amount)
+
+
+def percent(spent, limit):
+    return spent * 100 / limit if limit > 0 else ZERO
+
+
+def reached(spent, limit):
+    """Highest threshold reached by `spent`"""
+    return max((threshold for threshold in THRESHOLDS if percent(spent, limit) >= threshold), default=0)
+
+
+def period_spent(budget, start, end):
+    """Expenses of the budget's category and currency between two days, from the rollups when possible"""
+    if budget.period == 'weekly':
+        rows = all_transactions().filter(
+            user_id=budget.user_id, category_id=budget.category_id, type='expense',
+            date__date__gte=start, date__date__lt=end, wallet__currency=budget.currency,
+        )
+        field = 'amount'
+    else:
+        rows = MonthlyRollup.objects.filter(
+            user_id=budget.user_id, category_id=budget.category_id, type='expense',
+            month__gte=start, month__lt=end, wallet__currency=budget.currency,
+        )
+        field = 'total'
+    return rows.aggregate(total=Sum(field))['total'] or ZERO
+
+
+def alerts_for(budget, level, spent, start):
+    return [
+        BudgetAlert(
+            user_id=budget.user_id, budget=budget, threshold=threshold,
+            period_start=start, spent=spent, limit=budget.limit,
+        )
+        for threshold in THRESHOLDS if level < threshold <= reached(spent, budget.limit)
+    ]
+
+
+def apply_deltas(expenses, now=None):
+    """
+    Apply {category_id: [(day, wallet_id, signed amount)]} to the
+    matching budgets and record the alerts. Call inside the write's atomic
+    block, after the rollups: a budget starting a new period reloads from them.
+    """
+    if not expenses:
+        return []
+    budgets = list(Budget.objects.select_for_update().filter(category_id__in=expenses).order_by())
+    if not budgets:
+        return []
+
+    wallet_ids = {entry[1] for budget in budgets for entry in expenses[budget.category_id]}
+    currencies = dict(Wallet.objects.filter(pk__in=wallet_ids).values_list('pk', 'currency'))
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    alerts = []
+    for budget in budgets:
+        start, end = budget.period_bounds(today)
+        if budget.period_start == start:
+            delta = sum(
+                (amount for day, wallet_id, amount in expenses[budget.category_id]
+                 if start <= day < end and currencies.get(wallet_id) == budget.currency),
+                ZERO,
+            )
+            if not delta:
+                continue
+            spent, level = budget.spent + delta, budget.alert_level
+        else:
+            spent, level = period_spent(budget, start, end), 0
+        new_alerts = alerts_for(budget, level, spent, start)
+        alerts.extend(new_alerts)
+        Budget.objects.filter(pk=budget.pk).update(
+            spent=spent, period_start=start, updated_at=now,
+            alert_level=max([level] + [alert.threshold for alert in new_alerts]),
+        )
+    BudgetAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return alerts
+
+
+def refresh_budget(budget, notify=False, now=None):
+    """
+    Recompute a budget's current period from scratch (creation, edit,
+    rollover). Thresholds already reached are recorded as alerts only
+    with `notify`; otherwise they are considered known.
+    """
+    now = now or timezone.now()
+    start, end = budget.period_bounds(timezone.localdate(now))
+    spent = period_spent(budget, start, end)
+    level = reached(spent, budget.limit)
+    if notify:
+        BudgetAlert.objects.bulk_create(alerts_for(budget, 0, spent, start), ignore_conflicts=True)
+    Budget.objects.filter(pk=budget.pk).update(spent=spent, period_start=start, alert_level=level, updated_at=now)
+    budget.spent, budget.period_start, budget.alert_level = spent, start, level
+    return budget
+
+
+def roll_budgets(now=None):
+    """Reload the budgets still holding a past period; returns how many were rolled"""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    stale = Q()
+    for period, _ in Budget.PERIOD_CHOICES:
+        start, _ = Budget(period=period).period_bounds(today)
+        stale |= Q(period=period) & (Q(period_start__lt=start) | Q(period_start__isnull=True))
+    rolled = 0
+    for budget in Budget.objects.filter(stale).iterator():
+        refresh_budget(budget, notify=True, now=now)
+        bump_user_version(budget.user_id)
+        rolled += 1
+    return rolled
+
+
+def current_spent(budget, today=None):
+    """What the budget has spent in the current period, zero while it still holds a past one"""
+    start, _ = budget.period_bounds(today)
+    return budget.spent if budget.period_start == start else ZERO
+
+
+def collect(expenses, rows, sign):
+    """Accumulate the expense entries of rows into a {category_id: [entries]} mapping"""
+    expenses = expenses if expenses is not None else defaultdict(list)
+    for tx in rows:
+        for key, entry in expense_entries(tx, sign):
+            expenses[key].append(entry)
+    return expenses
@@ -0,0 +1,99 @@
+from datetime import datetime, time, timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from core import jobs
+from transactions import categories
+from transactions.ledger import LedgerBatch
+from transactions.models import Transaction
+from .budgets import roll_budgets
+from .models import FixedExpense
+from .stats import roll_month_stats
+
+CATEGORY = 'Charges fixes'
+ICON = 'event_repeat'
+BATCH_SIZE = 500
+
+
+def due_dates(expense, today):
+    """Every occurrence from the expense's next due date up to today, and the one after"""
+    dates = []
+    due_date = expense.next_due_date
+    while due_date <= today:
+        dates.append(due_date)
+        due_date = expense.next_occurrence(due_date + timedelta(days=1))
+    return dates, due_date
+
+
+def occurrence_transaction(expense, due_date, category):
+    return Transaction(
+        user_id=expense.user_id,
+        wallet_id=expense.wallet_id,
+        name=expense.name,
+        amount=expense.amount,
+        category=category,
+        type='expense',
+        status='pending',
+        date=timezone.make_aware(datetime.combine(due_date, time()), timezone.get_current_timezone()),
+        icon=ICON,
+        # Unique per user: an occurrence can never be posted twice
+        external_id=f'fixed-expense:{expense.pk}:{due_date.isoformat()}',
+    )
+
+
+def post_due_fixed_expenses(today=None, batch_size=BATCH_SIZE):
+    """
+    Post every due occurrence of every user's fixed expenses as pending
+    transactions, batch by batch. Only rows whose next_due_date is past
+    are read (through its index). Each expense is claimed by moving its
+    next_due_date forward with a conditional UPDATE, so concurrent
+    workers never post the same occurrence. Returns the number posted.
+    """
+    today = today or timezone.localdate()
+    skip_locked = connections[router.db_for_write(FixedExpense)].features.has_select_for_update_skip_locked
+    posted = 0
+    while True:
+        with transaction.atomic():
+            due = FixedExpense.objects.filter(
+                next_due_date__lte=today, wallet__isnull=False
+            ).order_by('next_due_date', 'pk')
+            if skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+            expenses = list(due.only(
+                'user', 'wallet', 'name', 'amount', 'periodicity', 'start_date', 'created_at', 'next_due_date',
+            )[:batch_size])
+            if not expenses:
+                return posted
+
+            rows = []
+            posting = categories.resolve((expense.user_id, CATEGORY) for expense in expenses)
+            for expense in expenses:
+                dates, next_due_date = due_dates(expense, today)
+                claimed = FixedExpense.objects.filter(
+                    pk=expense.pk, next_due_date=expense.next_due_date
+                ).update(next_due_date=next_due_date, last_posted_date=dates[-1], updated_at=timezone.now())
+                if claimed:
+                    category = posting[(expense.user_id, CATEGORY)]
+                    rows.extend(occurrence_transaction(expense, due_date, category) for due_date in dates)
+
+            Transaction.objects.bulk_create(rows, batch_size=batch_size)
+            ledger = LedgerBatch()
+            ledger.add(rows)
+            ledger.apply()
+            posted += len(rows)
+
+
+@jobs.register('wallets.post_fixed_expenses', every=timedelta(minutes=15))
+def post_fixed_expenses(payload):
+    return {'posted': post_due_fixed_expenses()}
+
+
+@jobs.register('wallets.roll_stats', every=timedelta(hours=1))
+def roll_stats(payload):
+    return {'wallets': roll_month_stats()}
+
+
+@jobs.register('wallets.roll_budgets', every=timedelta(hours=1))
+def roll_budget_periods(payload):
+    return {'budgets': roll_budgets()}
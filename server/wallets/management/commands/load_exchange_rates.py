@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallets import rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a local file: CSV with a date,base,quote,rate header, "
+        "or JSON (list of such objects, or {\"base\", \"date\", \"rates\": {...}} documents)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Rates file")
+        parser.add_argument(
+            '--format', dest='file_format', choices=('csv', 'json'),
+            help="File format (guessed from the extension by default)"
+        )
+        parser.add_argument('--source', default='', help="Label stored with each rate")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['file_format'] or path.suffix.lstrip('.').lower()
+        try:
+            content = path.read_text(encoding='utf-8-sig')
+            parsed = rates.parse_rates(content, file_format)
+        except OSError as exc:
+            raise CommandError(f"Lecture impossible : {exc}")
+        except rates.RateFileError as exc:
+            raise CommandError(str(exc))
+
+        count = rates.load_rates(parsed, source=options['source'] or path.name)
+        self.stdout.write(self.style.SUCCESS(f"{count} taux de change chargés."))
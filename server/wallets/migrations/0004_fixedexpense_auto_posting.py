@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0003_alter_wallet_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fixedexpense',
+            name='last_posted_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Dernière échéance enregistrée'),
+        ),
+        migrations.AddField(
+            model_name='fixedexpense',
+            name='next_due_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Prochaine échéance'),
+        ),
+        migrations.AddField(
+            model_name='fixedexpense',
+            name='wallet',
+            field=models.ForeignKey(blank=True, help_text='Si renseigné, chaque échéance est enregistrée automatiquement comme transaction en attente', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fixed_expenses', to='wallets.wallet', verbose_name='Portefeuille débité'),
+        ),
+        migrations.AddIndex(
+            model_name='fixedexpense',
+            index=models.Index(fields=['next_due_date'], name='wallets_fix_next_du_76b77a_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0004_fixedexpense_auto_posting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base', models.CharField(max_length=3, verbose_name='Devise de base')),
+                ('quote', models.CharField(max_length=3, verbose_name='Devise cotée')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20, verbose_name='Taux')),
+                ('source', models.CharField(blank=True, default='', max_length=100, verbose_name='Source')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+            ],
+            options={
+                'verbose_name': 'Taux de change',
+                'verbose_name_plural': 'Taux de change',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('base', 'quote', 'date'), name='unique_exchange_rate')],
+            },
+        ),
+    ]
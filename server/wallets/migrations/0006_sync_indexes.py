@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0005_exchangerate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fixedexpense',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='wallets_fix_user_id_7afd2d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savinggoal',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='wallets_sav_user_id_fb5943_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallet',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='wallets_wal_user_id_fdc167_idx'),
+        ),
+    ]
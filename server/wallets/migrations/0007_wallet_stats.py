@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+from wallets.stats import refresh_wallet_stats
+
+
+def backfill(apps, schema_editor):
+    refresh_wallet_stats(
+        apps.get_model('wallets', 'Wallet').objects.all(),
+        transactions=apps.get_model('transactions', 'Transaction').objects.all(),
+        rollups=apps.get_model('analytics', 'MonthlyRollup').objects.all(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0006_sync_indexes'),
+        ('transactions', '0006_transaction_sync_index'),
+        ('analytics', '0002_backfill_monthly_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='last_transaction_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Date de la dernière transaction'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='month_inflow',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Entrées du mois'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='month_outflow',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Sorties du mois'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='stats_month',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Mois des statistiques'),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='transaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nombre de transactions'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallets', '0007_wallet_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100, verbose_name='Catégorie')),
+                ('period', models.CharField(choices=[('monthly', 'Mensuel'), ('weekly', 'Hebdomadaire'), ('yearly', 'Annuel')], default='monthly', max_length=20, verbose_name='Période')),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Plafond')),
+                ('currency', models.CharField(default='USD', max_length=3, verbose_name='Devise')),
+                ('period_start', models.DateField(blank=True, editable=False, null=True, verbose_name='Début de la période')),
+                ('spent', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Dépensé')),
+                ('alert_level', models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Seuil atteint')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de mise à jour')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Budget',
+                'verbose_name_plural': 'Budgets',
+                'ordering': ['category', 'period'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.PositiveSmallIntegerField(verbose_name='Seuil (%)')),
+                ('period_start', models.DateField(verbose_name='Début de la période')),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Dépensé')),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Plafond')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='wallets.budget', verbose_name='Budget')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_alerts', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Alerte de budget',
+                'verbose_name_plural': 'Alertes de budget',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='budget',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'period'), name='unique_budget'),
+        ),
+        migrations.AddIndex(
+            model_name='budgetalert',
+            index=models.Index(fields=['user', '-created_at'], name='wallets_bud_user_id_b03a59_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='budgetalert',
+            constraint=models.UniqueConstraint(fields=('budget', 'period_start', 'threshold'), name='unique_budget_alert'),
+        ),
+    ]
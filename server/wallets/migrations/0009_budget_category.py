@@ -0,0 +1,83 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+from transactions.models import category_key
+
+
+def attach_categories(apps, schema_editor):
+    """
+    Point every budget at its user's category of that name (compared like
+    categories.resolve does), created if no transaction uses it. Budgets
+    whose names only differed by case now share their category and period:
+    the oldest is kept.
+    """
+    Category = apps.get_model('transactions', 'Category')
+    Budget = apps.get_model('wallets', 'Budget')
+    db = schema_editor.connection.alias
+    kept = set()
+    for budget in Budget.objects.using(db).order_by('pk'):
+        name = budget.category_name.strip() or 'Autre'
+        budget.category, _ = Category.objects.using(db).get_or_create(
+            user_id=budget.user_id, key=category_key(name), defaults={'name': name}
+        )
+        if (budget.user_id, budget.category.pk, budget.period) in kept:
+            budget.delete()
+            continue
+        kept.add((budget.user_id, budget.category.pk, budget.period))
+        budget.save(update_fields=['category'])
+
+
+def restore_names(apps, schema_editor):
+    Budget = apps.get_model('wallets', 'Budget')
+    for budget in Budget.objects.using(schema_editor.connection.alias).select_related('category'):
+        budget.category_name = budget.category.name
+        budget.save(update_fields=['category_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_category'),
+        ('wallets', '0008_budgets'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='budget',
+            name='unique_budget',
+        ),
+        migrations.RenameField(
+            model_name='budget',
+            old_name='category',
+            new_name='category_name',
+        ),
+        # Nullable, so that migrating back can add it again before filling it
+        migrations.AlterField(
+            model_name='budget',
+            name='category_name',
+            field=models.CharField(max_length=100, null=True, verbose_name='Catégorie'),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='category',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.RunPython(attach_categories, restore_names),
+        migrations.RemoveField(
+            model_name='budget',
+            name='category_name',
+        ),
+        migrations.AlterField(
+            model_name='budget',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='transactions.category', verbose_name='Catégorie'),
+        ),
+        migrations.AlterModelOptions(
+            name='budget',
+            options={'ordering': ['category__name', 'period'], 'verbose_name': 'Budget', 'verbose_name_plural': 'Budgets'},
+        ),
+        migrations.AddConstraint(
+            model_name='budget',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'period'), name='unique_budget'),
+        ),
+    ]
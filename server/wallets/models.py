@@ -1,5 +1,9 @@
-from django.db import models
+import calendar
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 
 
 class Wallet(models.Model):
@@ -27,6 +31,18 @@ class Wallet(models.Model):
     currency = models.CharField(max_length=3, default='USD', verbose_name="Devise")
     color = models.CharField(max_length=50, default='blue', verbose_name="Couleur")
     icon = models.CharField(max_length=50, default='account_balance', verbose_name="Icône")
+    # Statistics maintained by the transaction write path (see wallets/stats.py)
+    transaction_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre de transactions")
+    last_transaction_date = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Date de la dernière transaction"
+    )
+    stats_month = models.DateField(null=True, blank=True, editable=False, verbose_name="Mois des statistiques")
+    month_inflow = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Entrées du mois"
+    )
+    month_outflow = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Sorties du mois"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
     
@@ -36,6 +52,8 @@ class Wallet(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
+            # Delta sync reads the rows changed since a cursor
+            models.Index(fields=['user', 'updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -66,6 +84,7 @@ class SavingGoal(models.Model):
         ordering = ['deadline']
         indexes = [
             models.Index(fields=['user', 'deadline']),
+            models.Index(fields=['user', 'updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -100,6 +119,19 @@ class FixedExpense(models.Model):
     currency = models.CharField(max_length=3, default='USD', verbose_name="Devise")
     periodicity = models.CharField(max_length=20, choices=PERIODICITY_CHOICES, default='monthly', verbose_name="Périodicité")
     start_date = models.DateField(verbose_name="Date de début", null=True, blank=True)
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='fixed_expenses',
+        verbose_name="Portefeuille débité",
+        help_text="Si renseigné, chaque échéance est enregistrée automatiquement comme transaction en attente"
+    )
+    next_due_date = models.DateField(null=True, blank=True, editable=False, verbose_name="Prochaine échéance")
+    last_posted_date = models.DateField(
+        null=True, blank=True, editable=False, verbose_name="Dernière échéance enregistrée"
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
 
@@ -109,7 +141,194 @@ class FixedExpense(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
+            # Each scheduler tick only reads the rows that are due
+            models.Index(fields=['next_due_date']),
+            models.Index(fields=['user', 'updated_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.name} - {self.amount} {self.currency}"
+
+    # Fields the occurrences depend on
+    SCHEDULE_FIELDS = ('wallet_id', 'periodicity', 'start_date')
+
+    def save(self, *args, **kwargs):
+        """
+        Schedule a new expense from today. An edit keeps the stored schedule
+        (the posting job may have moved it since this instance was loaded)
+        and only recomputes it when a schedule field changed, from the
+        pending occurrence if one is due: it is never skipped.
+        """
+        with transaction.atomic():
+            stored = None
+            if self.pk is not None:
+                stored = FixedExpense.objects.select_for_update().filter(pk=self.pk).values(
+                    *self.SCHEDULE_FIELDS, 'next_due_date', 'last_posted_date'
+                ).first()
+            if stored is None:
+                self.next_due_date = self.compute_next_due_date()
+            else:
+                self.next_due_date, self.last_posted_date = stored['next_due_date'], stored['last_posted_date']
+                if any(getattr(self, field) != stored[field] for field in self.SCHEDULE_FIELDS):
+                    today = timezone.localdate()
+                    if self.next_due_date is not None:
+                        today = min(today, self.next_due_date)
+                    self.next_due_date = self.compute_next_due_date(today)
+            super().save(*args, **kwargs)
+
+    @property
+    def anchor_date(self):
+        """First occurrence; expenses without a start date recur from their creation"""
+        if self.start_date:
+            return self.start_date
+        return self.created_at.date() if self.created_at else timezone.localdate()
+
+    def compute_next_due_date(self, today=None):
+        """
+        Next occurrence to post, or None when the expense is not posted
+        automatically. Occurrences already posted are never due again.
+        """
+        if self.wallet_id is None:
+            return None
+        after = today or timezone.localdate()
+        if self.last_posted_date is not None:
+            after = max(after, self.last_posted_date + timedelta(days=1))
+        return self.next_occurrence(after)
+
+    def next_occurrence(self, on_or_after):
+        """Date of the first occurrence falling on or after `on_or_after`"""
+        anchor = self.anchor_date
+        if on_or_after <= anchor:
+            return anchor
+        if self.periodicity == 'weekly':
+            weeks = -(-(on_or_after - anchor).days // 7)
+            return anchor + timedelta(weeks=weeks)
+        step = 12 if self.periodicity == 'yearly' else 1
+        months = (on_or_after.year - anchor.year) * 12 + on_or_after.month - anchor.month
+        months -= months % step
+        while True:
+            candidate = add_months(anchor, months)
+            if candidate >= on_or_after:
+                return candidate
+            months += step
+
+
+def add_months(anchor, months):
+    """Shift a date by whole months, clipping the day to the target month's length"""
+    index = anchor.year * 12 + anchor.month - 1 + months
+    year, month = index // 12, index % 12 + 1
+    return anchor.replace(year=year, month=month, day=min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+class Budget(models.Model):
+    """
+    Spending limit of a category over a period. `spent` holds the expenses
+    of the current period (`period_start`) from the wallets in the budget's
+    currency; the transaction write path maintains it (see wallets/budgets.py).
+    """
+    PERIOD_CHOICES = [
+        ('monthly', 'Mensuel'),
+        ('weekly', 'Hebdomadaire'),
+        ('yearly', 'Annuel'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='budgets',
+        verbose_name="Utilisateur"
+    )
+    category = models.ForeignKey(
+        'transactions.Category',
+        on_delete=models.CASCADE,
+        related_name='budgets',
+        verbose_name="Catégorie"
+    )
+    period = models.CharField(max_length=20, choices=PERIOD_CHOICES, default='monthly', verbose_name="Période")
+    limit = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Plafond")
+    currency = models.CharField(max_length=3, default='USD', verbose_name="Devise")
+    period_start = models.DateField(null=True, blank=True, editable=False, verbose_name="Début de la période")
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Dépensé")
+    # Highest threshold (percent of the limit) already signalled in the period
+    alert_level = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Seuil atteint")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    class Meta:
+        verbose_name = "Budget"
+        verbose_name_plural = "Budgets"
+        ordering = ['category__name', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'period'], name='unique_budget'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} ({self.get_period_display()}) - {self.limit} {self.currency}"
+
+    def period_bounds(self, today=None):
+        """(first day, first day of the next period) of the period containing `today`"""
+        today = today or timezone.localdate()
+        if self.period == 'weekly':
+            start = today - timedelta(days=today.weekday())
+            return start, start + timedelta(weeks=1)
+        if self.period == 'yearly':
+            start = today.replace(month=1, day=1)
+            return start, start.replace(year=start.year + 1)
+        start = today.replace(day=1)
+        return start, add_months(start, 1)
+
+
+class BudgetAlert(models.Model):
+    """A budget crossing one of its thresholds, recorded by the write that made it cross"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='budget_alerts',
+        verbose_name="Utilisateur"
+    )
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='alerts', verbose_name="Budget")
+    threshold = models.PositiveSmallIntegerField(verbose_name="Seuil (%)")
+    period_start = models.DateField(verbose_name="Début de la période")
+    spent = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Dépensé")
+    limit = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Plafond")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+
+    class Meta:
+        verbose_name = "Alerte de budget"
+        verbose_name_plural = "Alertes de budget"
+        ordering = ['-created_at', '-id']
+        constraints = [
+            # Each threshold is signalled once per period
+            models.UniqueConstraint(fields=['budget', 'period_start', 'threshold'], name='unique_budget_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.budget.category.name} {self.threshold}% ({self.period_start})"
+
+
+class ExchangeRate(models.Model):
+    """
+    Value of one unit of `base` in `quote` on a given date.
+    Loaded from a rates file with `manage.py load_exchange_rates`.
+    """
+    base = models.CharField(max_length=3, verbose_name="Devise de base")
+    quote = models.CharField(max_length=3, verbose_name="Devise cotée")
+    date = models.DateField(verbose_name="Date")
+    rate = models.DecimalField(max_digits=20, decimal_places=10, verbose_name="Taux")
+    source = models.CharField(max_length=100, blank=True, default='', verbose_name="Source")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
+
+    class Meta:
+        verbose_name = "Taux de change"
+        verbose_name_plural = "Taux de change"
+        ordering = ['-date']
+        constraints = [
+            # Also serves the "latest rate on or before a date" lookups
+            models.UniqueConstraint(fields=['base', 'quote', 'date'], name='unique_exchange_rate'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} 1 {self.base} = {self.rate} {self.quote}"
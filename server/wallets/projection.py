@@ -0,0 +1,193 @@
+"""
+Cash-flow projection from fixed expenses and the user's declared income.
+
+Recurrences are expanded with NumPy date arithmetic: every recurrence of
+a periodicity becomes one row of a (recurrences x occurrences) grid of
+datetime64 values, so the cost does not depend on Python loops over
+dates. Amounts are handled in integer cents to stay exact.
+
+Occurrences follow the same rules as FixedExpense.next_occurrence: the
+anchor day is kept every month and clipped to the month's length.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Wallet, FixedExpense, add_months
+from .rates import Converter
+
+GRANULARITIES = ('daily', 'monthly')
+
+MONTH_STEPS = {'monthly': 1, 'yearly': 12}
+
+
+def to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value())
+
+
+def from_cents(cents):
+    return Decimal(int(cents)) / 100
+
+
+def expand_monthly(anchors, steps, start, end):
+    """
+    Occurrences in (start, end] of recurrences repeating every `steps`
+    months from `anchors`. Returns (recurrence index, date) arrays.
+    """
+    anchor_months = anchors.astype('datetime64[M]')
+    anchor_days = (anchors - anchor_months.astype('datetime64[D]')).astype(np.int64)
+    start_month = np.datetime64(start, 'M')
+    # First candidate: the month of `start` (or the anchor month if later)
+    elapsed = (start_month - anchor_months).astype(np.int64)
+    first = np.maximum(0, elapsed // steps)
+    count = int((np.datetime64(end, 'M') - start_month).astype(np.int64) // steps.min()) + 2
+
+    offsets = (first[:, None] + np.arange(count)) * steps[:, None]
+    months = anchor_months[:, None] + offsets.astype('timedelta64[M]')
+    month_days = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+    dates = months.astype('datetime64[D]') + np.minimum(anchor_days[:, None], month_days - 1)
+    return select(dates, start, end)
+
+
+def expand_weekly(anchors, start, end):
+    """Occurrences in (start, end] of recurrences repeating every 7 days from `anchors`"""
+    elapsed = (np.datetime64(start, 'D') - anchors).astype(np.int64)
+    first = np.maximum(0, elapsed // 7)
+    count = (end - start).days // 7 + 2
+    dates = anchors[:, None] + ((first[:, None] + np.arange(count)) * 7).astype('timedelta64[D]')
+    return select(dates, start, end)
+
+
+def select(dates, start, end):
+    mask = (dates > np.datetime64(start, 'D')) & (dates <= np.datetime64(end, 'D'))
+    rows, _ = np.nonzero(mask)
+    return rows, dates[mask]
+
+
+def expand(recurrences, start, end):
+    """
+    Expand (anchor date, periodicity, amount) recurrences into dated
+    occurrences within (start, end]. Returns (recurrence index, date,
+    amount in cents) arrays sorted by date.
+    """
+    indexes, dates = [np.empty(0, np.int64)], [np.empty(0, 'datetime64[D]')]
+    periodicities = np.array([periodicity for _, periodicity, _ in recurrences])
+    anchors = np.array([anchor for anchor, _, _ in recurrences], dtype='datetime64[D]')
+    amounts = np.array([to_cents(amount) for _, _, amount in recurrences], dtype=np.int64)
+
+    if len(recurrences):
+        monthly = np.flatnonzero(np.isin(periodicities, list(MONTH_STEPS)))
+        if monthly.size:
+            steps = np.array([MONTH_STEPS[value] for value in periodicities[monthly]], dtype=np.int64)
+            rows, found = expand_monthly(anchors[monthly], steps, start, end)
+            indexes.append(monthly[rows])
+            dates.append(found)
+        weekly = np.flatnonzero(periodicities == 'weekly')
+        if weekly.size:
+            rows, found = expand_weekly(anchors[weekly], start, end)
+            indexes.append(weekly[rows])
+            dates.append(found)
+
+    index, date = np.concatenate(indexes), np.concatenate(dates)
+    order = np.argsort(date, kind='stable')
+    index, date = index[order], date[order]
+    return index, date, amounts[index]
+
+
+def daily_totals(dates, amounts, start, days):
+    """Sum amounts per day offset from `start` (index 0 is `start` itself)"""
+    totals = np.zeros(days + 1, dtype=np.int64)
+    np.add.at(totals, (dates - np.datetime64(start, 'D')).astype(np.int64), amounts)
+    return totals
+
+
+def income_recurrence(user, today):
+    """
+    The declared income as a recurrence. It is anchored on the first day
+    of the current month: monthly and yearly incomes arrive on the 1st,
+    weekly ones every 7 days from it.
+    """
+    if not user.monthly_income:
+        return []
+    return [(today.replace(day=1), user.income_frequency, user.monthly_income)]
+
+
+def project(user, months=12, granularity='monthly', today=None):
+    """
+    Forecast the total balance of the user's wallets over the next
+    `months` months, from the fixed expenses and the declared income.
+    Balances and expenses are converted into the user's currency at
+    today's rate, once per wallet or expense before the expansion.
+    """
+    today = today or timezone.localdate()
+    end = add_months(today, months)
+    days = (end - today).days
+
+    converter = Converter(user.currency, today)
+    expenses = list(FixedExpense.objects.filter(user=user).order_by().only(
+        'amount', 'currency', 'periodicity', 'start_date', 'created_at'
+    ))
+    _, expense_dates, expense_amounts = expand(
+        [
+            (expense.anchor_date, expense.periodicity, converter.convert(expense.amount, expense.currency))
+            for expense in expenses
+        ],
+        today, end,
+    )
+    _, income_dates, income_amounts = expand(income_recurrence(user, today), today, end)
+
+    balances = Wallet.objects.filter(user=user).order_by().values('currency').annotate(total=Sum('balance'))
+    starting_balance = to_cents(converter.total((row['currency'], row['total']) for row in balances))
+    income = daily_totals(income_dates, income_amounts, today, days)
+    expense = daily_totals(expense_dates, expense_amounts, today, days)
+    balance = starting_balance + np.cumsum(income - expense)
+
+    if granularity == 'daily':
+        day_dates = np.datetime64(today, 'D') + np.arange(1, days + 1)
+        points = [
+            {
+                'date': day_date.item(),
+                'income': from_cents(income[offset]),
+                'expense': from_cents(expense[offset]),
+                'net': from_cents(income[offset] - expense[offset]),
+                'balance': from_cents(balance[offset]),
+            }
+            for offset, day_date in enumerate(day_dates, start=1)
+        ]
+    else:
+        points = monthly_points(today, days, income, expense, balance)
+
+    return {
+        'start': today,
+        'end': end,
+        'granularity': granularity,
+        'currency': user.currency,
+        'starting_balance': from_cents(starting_balance),
+        'income': from_cents(income.sum()),
+        'expense': from_cents(expense.sum()),
+        'ending_balance': from_cents(balance[-1]),
+        'points': points,
+    }
+
+
+def monthly_points(today, days, income, expense, balance):
+    """Per-month totals, with the balance at the end of each month (or of the horizon)"""
+    day_dates = np.datetime64(today, 'D') + np.arange(1, days + 1)
+    month_of_day = day_dates.astype('datetime64[M]')
+    month_starts, first_days = np.unique(month_of_day, return_index=True)
+    bounds = np.append(first_days, days)
+
+    income_by_month = np.add.reduceat(income[1:], first_days)
+    expense_by_month = np.add.reduceat(expense[1:], first_days)
+    return [
+        {
+            'date': month.astype('datetime64[D]').item(),
+            'income': from_cents(income_by_month[position]),
+            'expense': from_cents(expense_by_month[position]),
+            'net': from_cents(income_by_month[position] - expense_by_month[position]),
+            'balance': from_cents(balance[bounds[position + 1]]),
+        }
+        for position, month in enumerate(month_starts)
+    ]
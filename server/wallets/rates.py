@@ -0,0 +1,201 @@
+"""
+Currency conversion of aggregated amounts.
+
+Callers group their sums by currency in the database and convert each
+group once, so the cost is one rate per currency and date whatever the
+number of rows. Rate lookups are memoized in-process by an LRU keyed by
+(base, quote, date, rates version). The version is the last update and
+the row count of the rate table, read again at most every
+`EXCHANGE_RATES_CHECK_INTERVAL` seconds: rates loaded by another process
+(the `load_exchange_rates` command) retire every memoized entry of the
+web workers within that delay, immediately in the loading process.
+"""
+import csv
+import io
+import json
+import threading
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from core.cache import bump_shared_version
+from .models import ExchangeRate
+
+CENT = Decimal('0.01')
+ONE = Decimal('1')
+LRU_SIZE = 4096
+
+
+class RateFileError(ValueError):
+    """Raised when a rates file cannot be read"""
+
+
+class RatesVersion:
+    """Per-process copy of the rate table version, checked at most every EXCHANGE_RATES_CHECK_INTERVAL"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+        self.checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.value is not None and now - self.checked_at < settings.EXCHANGE_RATES_CHECK_INTERVAL:
+                return self.value
+        row = ExchangeRate.objects.aggregate(last=Max('updated_at'), count=Count('pk'))
+        value = (row['last'], row['count'])
+        with self.lock:
+            self.value, self.checked_at = value, now
+        return value
+
+    def forget(self):
+        with self.lock:
+            self.value = None
+
+
+_version = RatesVersion()
+
+
+def rates_version():
+    return _version.get()
+
+
+def forget_rates_version():
+    """Read the version from the table again at the next lookup"""
+    _version.forget()
+
+
+def bump_rates_version():
+    """
+    Retire the memoized rates of this process (other ones follow within
+    EXCHANGE_RATES_CHECK_INTERVAL) and the cached responses built with
+    them, once the transaction commits
+    """
+    transaction.on_commit(forget_rates_version)
+    bump_shared_version()
+
+
+def stored_rate(base, quote, day):
+    """
+    Rate of a pair from the table, direct or inverted: the latest one on
+    or before `day`, else the first one after it.
+    """
+    pair = Q(base=base, quote=quote) | Q(base=quote, quote=base)
+    rates = ExchangeRate.objects.filter(pair).values_list('base', 'rate')
+    row = rates.filter(date__lte=day).order_by('-date').first() or rates.filter(date__gt=day).order_by('date').first()
+    if row is None:
+        return None
+    row_base, rate = row
+    return rate if row_base == base else ONE / rate
+
+
+@lru_cache(maxsize=LRU_SIZE)
+def lookup(base, quote, day, version):
+    """Rate from `base` to `quote` on `day`, crossed through the pivot currency if needed"""
+    if base == quote:
+        return ONE
+    rate = stored_rate(base, quote, day)
+    pivot = settings.EXCHANGE_RATE_PIVOT
+    if rate is None and pivot not in (base, quote):
+        to_pivot = stored_rate(base, pivot, day)
+        from_pivot = stored_rate(pivot, quote, day) if to_pivot is not None else None
+        if from_pivot is not None:
+            rate = to_pivot * from_pivot
+    return rate
+
+
+class Converter:
+    """
+    Converts amounts into `currency`. Amounts in a currency without any
+    known rate are counted as is and reported in `unconverted`.
+    """
+
+    def __init__(self, currency, day=None):
+        self.currency = currency
+        self.day = day or timezone.localdate()
+        self.version = None
+        self.unconverted = set()
+
+    def rate(self, currency, day=None):
+        if not currency or currency == self.currency:
+            return ONE
+        if self.version is None:
+            # Read once, and only when an amount needs converting
+            self.version = rates_version()
+        rate = lookup(currency, self.currency, day or self.day, self.version)
+        if rate is None:
+            self.unconverted.add(currency)
+            return ONE
+        return rate
+
+    def convert(self, amount, currency, day=None):
+        rate = self.rate(currency, day)
+        return amount if rate == ONE else (amount * rate).quantize(CENT)
+
+    def total(self, amounts, day=None):
+        """Sum (currency, amount) pairs, typically the rows of a GROUP BY currency"""
+        return sum((self.convert(amount or 0, currency, day) for currency, amount in amounts), Decimal('0.00'))
+
+
+def parse_rates(content, file_format):
+    """
+    Read rates from CSV (`date,base,quote,rate` header) or JSON: a list of
+    such objects, or `{"base": "EUR", "date": "...", "rates": {"USD": 1.08}}`
+    documents (alone or in a list).
+    """
+    if file_format == 'csv':
+        records = list(csv.DictReader(io.StringIO(content)))
+    elif file_format == 'json':
+        try:
+            data = json.loads(content)
+        except ValueError as exc:
+            raise RateFileError(f"JSON invalide : {exc}")
+        records = []
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and isinstance(item.get('rates'), dict):
+                records.extend(
+                    {'date': item.get('date'), 'base': item.get('base'), 'quote': quote, 'rate': rate}
+                    for quote, rate in item['rates'].items()
+                )
+            else:
+                records.append(item)
+    else:
+        raise RateFileError(f"Format inconnu : {file_format}")
+
+    rates = {}
+    for line, record in enumerate(records, start=1):
+        try:
+            key = (
+                str(record['base']).strip().upper(),
+                str(record['quote']).strip().upper(),
+                date.fromisoformat(str(record['date']).strip()),
+            )
+            rate = Decimal(str(record['rate']).strip())
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise RateFileError(f"Ligne {line} : date, base, quote et rate sont requis.")
+        if len(key[0]) != 3 or len(key[1]) != 3 or rate <= 0:
+            raise RateFileError(f"Ligne {line} : taux ou devise invalide.")
+        rates[key] = rate
+    return rates
+
+
+def load_rates(rates, source='', batch_size=1000):
+    """Insert or update {(base, quote, date): rate}; returns the number of rows written"""
+    rows = [
+        ExchangeRate(base=base, quote=quote, date=day, rate=rate, source=source)
+        for (base, quote, day), rate in rates.items()
+    ]
+    with transaction.atomic():
+        ExchangeRate.objects.bulk_create(
+            rows, batch_size=batch_size, update_conflicts=True,
+            unique_fields=['base', 'quote', 'date'], update_fields=['rate', 'source', 'updated_at'],
+        )
+        bump_rates_version()
+    return len(rows)
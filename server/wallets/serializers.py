@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import Wallet, SavingGoal, FixedExpense
+from transactions.models import category_key
+from transactions.serializers import CategoryField, CategoryNameMixin
+from .budgets import current_spent, percent
+from .models import Wallet, SavingGoal, FixedExpense, Budget, BudgetAlert
+from .stats import current_month
 
 
 class WalletSerializer(serializers.ModelSerializer):
@@ -9,10 +13,18 @@ class WalletSerializer(serializers.ModelSerializer):
         model = Wallet
         fields = (
             'id', 'name', 'type', 'type_display', 'balance', 
-            'currency', 'color', 'icon', 'created_at', 'updated_at'
+            'currency', 'color', 'icon', 'transaction_count', 'last_transaction_date',
+            'month_inflow', 'month_outflow', 'created_at', 'updated_at'
         )
         read_only_fields = ('user', 'created_at', 'updated_at')
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Flows of a past month not rolled over yet: nothing recorded this month
+        if instance.stats_month != current_month():
+            data['month_inflow'] = data['month_outflow'] = '0.00'
+        return data
+
 
 class WalletCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -39,10 +51,100 @@ class FixedExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = FixedExpense
         fields = '__all__'
-        read_only_fields = ('user', 'created_at', 'updated_at')
+        read_only_fields = ('user', 'next_due_date', 'last_posted_date', 'created_at', 'updated_at')
 
 
 class FixedExpenseCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = FixedExpense
-        fields = ('name', 'amount', 'currency', 'periodicity', 'start_date')
+        fields = ('name', 'amount', 'currency', 'periodicity', 'start_date', 'wallet')
+
+    def validate_wallet(self, value):
+        if value is not None and value.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError("Portefeuille introuvable.")
+        return value
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+    """Budget and the status of its current period"""
+    category = CategoryField(read_only=True)
+    period_display = serializers.CharField(source='get_period_display', read_only=True)
+
+    class Meta:
+        model = Budget
+        fields = (
+            'id', 'category', 'period', 'period_display', 'limit', 'currency',
+            'alert_level', 'created_at', 'updated_at',
+        )
+        read_only_fields = fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        start, end = instance.period_bounds()
+        spent = current_spent(instance)
+        # A past period not rolled over yet: nothing spent, no threshold reached
+        if instance.period_start != start:
+            data['alert_level'] = 0
+        data.update(
+            period_start=start.isoformat(),
+            period_end=end.isoformat(),
+            spent=f'{spent:.2f}',
+            remaining=f'{instance.limit - spent:.2f}',
+            percent=round(float(percent(spent, instance.limit)), 1),
+        )
+        return data
+
+
+class BudgetCreateSerializer(CategoryNameMixin, serializers.ModelSerializer):
+    category = CategoryField()
+
+    class Meta:
+        model = Budget
+        fields = ('category', 'period', 'limit', 'currency')
+
+    def validate_limit(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Le plafond doit être positif.")
+        return value
+
+    def validate(self, attrs):
+        category = attrs['category'] if 'category' in attrs else self.instance.category.name
+        period = attrs.get('period', getattr(self.instance, 'period', 'monthly'))
+        others = Budget.objects.filter(
+            user=self.context['request'].user, category__key=category_key(category), period=period
+        )
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError("Un budget existe déjà pour cette catégorie et cette période.")
+        return attrs
+
+
+class BudgetAlertSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='budget.category.name', read_only=True)
+
+    class Meta:
+        model = BudgetAlert
+        fields = ('id', 'budget', 'category', 'threshold', 'period_start', 'spent', 'limit', 'created_at')
+        read_only_fields = fields
+
+
+class ProjectionPointSerializer(serializers.Serializer):
+    """Cash flow of one day or month of the projection, and the balance at its end"""
+    date = serializers.DateField()
+    income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ProjectionSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.CharField()
+    currency = serializers.CharField()
+    starting_balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+    income = serializers.DecimalField(max_digits=14, decimal_places=2)
+    expense = serializers.DecimalField(max_digits=14, decimal_places=2)
+    ending_balance = serializers.DecimalField(max_digits=14, decimal_places=2)
+    points = ProjectionPointSerializer(many=True)
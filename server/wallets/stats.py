@@ -0,0 +1,174 @@
+"""
+Per-wallet statistics stored on the Wallet row.
+
+The transaction count, the date of the last transaction and the in/out
+flows of the current month are maintained by the ledger in the same
+UPDATE as the balance, so the wallet list reads them without touching
+the transactions. Transfers count for both wallets; the month flows
+include transfers, like the balance.
+
+The month flows belong to `stats_month`: the first write of a new month
+reloads them from the monthly rollups, and the `wallets.roll_stats` job
+does it for wallets without writes. Until then, serializers show zero.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from analytics.models import MonthlyRollup
+from analytics.rollups import month_of
+from core.cache import bump_user_version
+from .models import Wallet
+
+IN_TYPES = ('income', 'transfer_in')
+OUT_TYPES = ('expense', 'transfer_out')
+ZERO = Decimal('0')
+
+
+def all_transactions():
+    # Imported late: the transaction model imports the ledger, which imports this module
+    from transactions.models import Transaction
+    return Transaction.objects.all()
+
+
+def current_month(now=None):
+    return month_of(now or timezone.now())
+
+
+def touched_wallets(tx):
+    """Wallets a transaction is listed under"""
+    if tx.type == 'transfer' and tx.receiver_wallet_id and tx.receiver_wallet_id != tx.wallet_id:
+        return (tx.wallet_id, tx.receiver_wallet_id)
+    return (tx.wallet_id,)
+
+
+@dataclass
+class StatsDelta:
+    """Effect of a batch of rows on one wallet's count and last date"""
+    count: int = 0
+    latest_added: datetime = None
+    latest_removed: datetime = None
+
+    def add(self, tx, sign):
+        self.count += sign
+        if sign > 0:
+            self.latest_added = max(self.latest_added or tx.date, tx.date)
+        else:
+            self.latest_removed = max(self.latest_removed or tx.date, tx.date)
+
+
+def month_flow(types, month, rollups=None):
+    """The wallet's rollup total of `types` for `month`, as a subquery"""
+    rows = (
+        (rollups if rollups is not None else MonthlyRollup.objects.all())
+        .filter(user=OuterRef('user'), wallet=OuterRef('pk'), month=month, type__in=types)
+        .order_by().values('wallet').annotate(sum=Sum('total')).values('sum')
+    )
+    money = DecimalField(max_digits=14, decimal_places=2)
+    return Coalesce(Subquery(rows, output_field=money), Value(ZERO, output_field=money))
+
+
+def latest_transaction_date(transactions=None):
+    """Date of the wallet's last sent or received transaction, as a subquery"""
+    transactions = transactions if transactions is not None else all_transactions()
+
+    def latest(field):
+        return Subquery(transactions.filter(**{field: OuterRef('pk')}).order_by('-date').values('date')[:1])
+
+    sent, received = latest('wallet'), latest('receiver_wallet')
+    # On SQLite GREATEST is NULL as soon as one side is
+    return Greatest(Coalesce(sent, received), Coalesce(received, sent))
+
+
+def transaction_count(transactions=None):
+    transactions = transactions if transactions is not None else all_transactions()
+
+    def count(queryset, field):
+        rows = queryset.order_by().values(field).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(rows), 0)
+
+    sent = transactions.filter(wallet=OuterRef('pk'))
+    received = transactions.filter(type='transfer', receiver_wallet=OuterRef('pk')).exclude(wallet=OuterRef('pk'))
+    return count(sent, 'wallet') + count(received, 'receiver_wallet')
+
+
+def update_fields(delta, inflow, outflow, month):
+    """
+    UPDATE expressions applying a batch to a wallet's statistics.
+    The last date is only recomputed when a removed row may have been it.
+    """
+    fields = {}
+    if delta is not None:
+        if delta.count:
+            fields['transaction_count'] = F('transaction_count') + delta.count
+        last = F('last_transaction_date')
+        if delta.latest_added is not None:
+            added = Value(delta.latest_added)
+            last = Greatest(Coalesce(last, added), added)
+        if delta.latest_removed is not None:
+            last = Case(
+                When(last_transaction_date__lte=delta.latest_removed, then=latest_transaction_date()),
+                default=last,
+            )
+        if delta.latest_added is not None or delta.latest_removed is not None:
+            fields['last_transaction_date'] = last
+    if inflow or outflow:
+        # A wallet still holding a past month's flows reloads them from the
+        # rollups, which already include this batch
+        same_month = Q(stats_month=month)
+        fields['month_inflow'] = Case(
+            When(same_month, then=F('month_inflow') + inflow), default=month_flow(IN_TYPES, month)
+        )
+        fields['month_outflow'] = Case(
+            When(same_month, then=F('month_outflow') + outflow), default=month_flow(OUT_TYPES, month)
+        )
+        fields['stats_month'] = Value(month)
+    return fields
+
+
+def month_flows(rollup_deltas, month):
+    """{wallet_id: (inflow, outflow)} of the current month from coalesced rollup deltas"""
+    flows = {}
+    for (_, wallet_id, key_month, _, type), (total, _) in (rollup_deltas or {}).items():
+        if key_month != month or not total:
+            continue
+        inflow, outflow = flows.get(wallet_id, (ZERO, ZERO))
+        if type in IN_TYPES:
+            inflow += total
+        else:
+            outflow += total
+        flows[wallet_id] = (inflow, outflow)
+    return flows
+
+
+def refresh_wallet_stats(wallets, transactions=None, rollups=None, now=None):
+    """Recompute the statistics of a wallet queryset from scratch, in one UPDATE"""
+    month = current_month(now)
+    return wallets.update(
+        transaction_count=transaction_count(transactions),
+        last_transaction_date=latest_transaction_date(transactions),
+        stats_month=month,
+        month_inflow=month_flow(IN_TYPES, month, rollups),
+        month_outflow=month_flow(OUT_TYPES, month, rollups),
+    )
+
+
+def roll_month_stats(now=None):
+    """Reload the month flows of the wallets still holding a past month's"""
+    month = current_month(now)
+    stale = Wallet.objects.filter(Q(stats_month__lt=month) | Q(stats_month__isnull=True))
+    user_ids = set(stale.values_list('user_id', flat=True))
+    if not user_ids:
+        return 0
+    updated = stale.update(
+        stats_month=month,
+        month_inflow=month_flow(IN_TYPES, month),
+        month_outflow=month_flow(OUT_TYPES, month),
+    )
+    for user_id in user_ids:
+        bump_user_version(user_id)
+    return updated
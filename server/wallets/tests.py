@@ -1,3 +1,482 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from transactions.categories import category_for
+from transactions.models import Transaction
+from analytics import services
+from . import budgets, projection, rates, stats
+from .jobs import post_due_fixed_expenses
+from .models import Wallet, SavingGoal, FixedExpense, Budget, BudgetAlert, ExchangeRate
+
+
+def create_user(email='user@monely.test'):
+    return User.objects.create_user(username=email, email=email, password='MonelyPass123!', name='Test')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class QueryCountTests(TestCase):
+    """List and detail endpoints must run a constant number of queries"""
+    ROW_COUNTS = (10, 100, 1000)
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def populate(self, model, rows, **fields):
+        model.objects.filter(user=self.user).delete()
+        model.objects.bulk_create(model(user=self.user, **fields) for _ in range(rows))
+        return model.objects.filter(user=self.user).first()
+
+    def assert_constant_queries(self, url, model, **fields):
+        for rows in self.ROW_COUNTS:
+            with self.subTest(model=model.__name__, rows=rows):
+                instance = self.populate(model, rows, **fields)
+                # COUNT(*) + page
+                with self.assertNumQueries(2):
+                    response = self.client.get(url)
+                self.assertEqual(response.data['count'], rows)
+                with self.assertNumQueries(1):
+                    response = self.client.get(f'{url}{instance.pk}/')
+                self.assertEqual(response.status_code, 200)
+
+    def test_wallets(self):
+        self.assert_constant_queries(
+            '/api/wallets/wallets/', Wallet, name='Courant', type='checking'
+        )
+
+    def test_saving_goals(self):
+        self.assert_constant_queries(
+            '/api/wallets/goals/', SavingGoal,
+            name='Vacances', target_amount=Decimal('1000'), deadline=date(2030, 1, 1)
+        )
+
+    def test_fixed_expenses(self):
+        self.assert_constant_queries(
+            '/api/wallets/fixed-expenses/', FixedExpense, name='Loyer', amount=Decimal('500')
+        )
+
+
+class WalletStatsTests(TestCase):
+    """Per-wallet statistics maintained by the transaction write path"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.savings = Wallet.objects.create(user=self.user, name='Épargne', type='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, amount, type='expense', date=None, wallet=None, **fields):
+        return Transaction.objects.create(
+            user=self.user, wallet=wallet or self.wallet, name='Opération', amount=Decimal(amount), type=type,
+            category=category_for(self.user, 'Divers'), date=date or timezone.now(), **fields
+        )
+
+    def assert_consistent(self):
+        """Maintained statistics equal the ones recomputed from scratch"""
+        fields = ('transaction_count', 'last_transaction_date', 'stats_month', 'month_inflow', 'month_outflow')
+        maintained = list(Wallet.objects.order_by('pk').values_list(*fields))
+        stats.refresh_wallet_stats(Wallet.objects.all())
+        self.assertEqual(maintained, list(Wallet.objects.order_by('pk').values_list(*fields)))
+
+    def test_maintained_on_write(self):
+        last_month = timezone.now() - timedelta(days=40)
+        self.add('1000', 'income')
+        self.add('30')
+        old = self.add('50', date=last_month)
+        transfer = self.add('200', 'transfer', receiver_wallet=self.savings)
+        self.assert_consistent()
+
+        response = self.client.get(f'/api/wallets/wallets/{self.wallet.pk}/')
+        self.assertEqual(response.data['transaction_count'], 4)
+        self.assertEqual((response.data['month_inflow'], response.data['month_outflow']), ('1000.00', '230.00'))
+        savings = self.client.get(f'/api/wallets/wallets/{self.savings.pk}/').data
+        self.assertEqual((savings['transaction_count'], savings['month_inflow']), (1, '200.00'))
+
+        # Removing the latest row recomputes the last date; a move to this month counts in its flows
+        transfer.delete()
+        old.date = timezone.now()
+        old.save()
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.month_outflow, Decimal('80'))
+        self.assert_consistent()
+
+    def delete_wallet(self, wallet):
+        self.assertEqual(self.client.delete(f'/api/wallets/wallets/{wallet.pk}/').status_code, 204)
+        self.assert_consistent()
+        call_command('rebuild_rollups', check=True, stdout=StringIO())
+
+    def test_delete_source_wallet(self):
+        self.add('100', 'income', wallet=self.savings)
+        self.add('40', 'transfer', receiver_wallet=self.savings)
+        self.delete_wallet(self.wallet)
+        self.savings.refresh_from_db()
+        self.assertEqual((self.savings.balance, self.savings.transaction_count), (Decimal('100'), 1))
+
+    def test_delete_receiver_wallet(self):
+        self.add('100', 'income')
+        transfer = self.add('40', 'transfer', receiver_wallet=self.savings)
+        self.delete_wallet(self.savings)
+        # A transfer without a receiver no longer moves money
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100'))
+        Transaction.objects.get(pk=transfer.pk).delete()
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100'))
+        self.assert_consistent()
+        call_command('rebuild_rollups', check=True, stdout=StringIO())
+
+    def test_new_month_reloads_flows(self):
+        previous = stats.current_month() - timedelta(days=1)
+        self.add('40')
+        Wallet.objects.update(stats_month=previous, month_outflow=Decimal('999'))
+        self.assertEqual(self.client.get(f'/api/wallets/wallets/{self.wallet.pk}/').data['month_outflow'], '0.00')
+
+        self.add('10')
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.month_outflow, Decimal('50'))
+
+        Wallet.objects.update(stats_month=previous)
+        self.assertEqual(stats.roll_month_stats(), 2)
+        self.assert_consistent()
+
+
+class BudgetTests(TestCase):
+    """Budgets spent and alerts maintained by the transaction write path"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, amount, category='Courses', wallet=None, date=None, type='expense'):
+        return Transaction.objects.create(
+            user=self.user, wallet=wallet or self.wallet, name='Achat', amount=Decimal(amount), type=type,
+            category=category_for(self.user, category), date=date or timezone.now(),
+        )
+
+    def create_budget(self, limit='100', category='Courses', period='monthly'):
+        response = self.client.post(
+            '/api/wallets/budgets/', {'category': category, 'period': period, 'limit': limit}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Budget.objects.get(category__name=category, period=period)
+
+    def test_spent_follows_writes(self):
+        self.add('20')
+        budget = self.create_budget()
+        self.assertEqual(budget.spent, Decimal('20'))
+
+        tx = self.add('30')
+        self.add('500', category='Loisirs')
+        self.add('1000', type='income')
+        self.add('40', date=timezone.now() - timedelta(days=400))
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('50'))
+
+        tx.amount = Decimal('10')
+        tx.save()
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('30'))
+        tx.delete()
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('20'))
+
+    def test_spent_after_wallet_delete(self):
+        budget = self.create_budget()
+        self.add('10')
+        other = Wallet.objects.create(user=self.user, name='Carte', type='credit')
+        self.add('30', wallet=other)
+        self.assertEqual(self.client.delete(f'/api/wallets/wallets/{other.pk}/').status_code, 204)
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('10'))
+
+    def test_other_currency_ignored(self):
+        budget = self.create_budget()
+        euros = Wallet.objects.create(user=self.user, name='Euros', type='checking', currency='EUR')
+        self.add('60', wallet=euros)
+        budget.refresh_from_db()
+        self.assertEqual(budget.spent, Decimal('0'))
+
+    def test_thresholds_alert_once(self):
+        budget = self.create_budget()
+        self.add('50')
+        self.assertFalse(BudgetAlert.objects.exists())
+        self.add('35')
+        self.add('5')
+        self.assertEqual(list(BudgetAlert.objects.values_list('threshold', flat=True)), [80])
+
+        tx = self.add('20')
+        alert = BudgetAlert.objects.get(threshold=100)
+        self.assertEqual((alert.budget, alert.spent), (budget, Decimal('110')))
+        # Going back under and over again in the same period does not repeat them
+        tx.delete()
+        self.add('20')
+        self.assertEqual(BudgetAlert.objects.count(), 2)
+
+        response = self.client.get('/api/wallets/budget-alerts/')
+        self.assertEqual([alert['threshold'] for alert in response.data['results']], [100, 80])
+        self.assertEqual(response.data['results'][0]['category'], 'Courses')
+
+    def test_status_in_one_query(self):
+        for index in range(10):
+            self.create_budget(category=f'Catégorie {index}')
+        self.create_budget(limit='50', period='weekly')
+        self.add('40')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/wallets/budgets/')
+        self.assertEqual(len(response.data), 11)
+        weekly = next(row for row in response.data if row['period'] == 'weekly')
+        self.assertEqual((weekly['spent'], weekly['remaining'], weekly['percent']), ('40.00', '10.00', 80.0))
+
+    def test_duplicate_rejected(self):
+        self.create_budget()
+        response = self.client.post(
+            '/api/wallets/budgets/', {'category': 'Courses', 'period': 'monthly', 'limit': '10'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_period_reloads(self):
+        budget = self.create_budget()
+        self.add('90')
+        previous = budget.period_bounds()[0] - timedelta(days=1)
+        Budget.objects.update(period_start=previous.replace(day=1), spent=Decimal('999'), alert_level=100)
+        self.assertEqual(self.client.get(f'/api/wallets/budgets/{budget.pk}/').data['spent'], '0.00')
+
+        BudgetAlert.objects.all().delete()
+        self.assertEqual(budgets.roll_budgets(), 1)
+        budget.refresh_from_db()
+        self.assertEqual((budget.spent, budget.alert_level), (Decimal('90'), 80))
+        self.assertEqual(list(BudgetAlert.objects.values_list('threshold', flat=True)), [80])
+        self.assertEqual(budgets.roll_budgets(), 0)
+
+
+class ProjectionTests(TestCase):
+    """Fixed expenses and income expanded into a balance forecast"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.user.monthly_income = Decimal('3000')
+        self.user.save()
+        Wallet.objects.create(user=self.user, name='Courant', type='checking', balance=Decimal('500'))
+        FixedExpense.objects.create(
+            user=self.user, name='Loyer', amount=Decimal('1000'), start_date=date(2024, 1, 31)
+        )
+        FixedExpense.objects.create(
+            user=self.user, name='Panier', amount=Decimal('20.50'), periodicity='weekly',
+            start_date=date(2024, 1, 3)
+        )
+        FixedExpense.objects.create(
+            user=self.user, name='Assurance', amount=Decimal('300'), periodicity='yearly',
+            start_date=date(2023, 3, 15)
+        )
+
+    def test_monthly(self):
+        result = projection.project(self.user, months=3, today=date(2024, 1, 15))
+        self.assertEqual(result['end'], date(2024, 4, 15))
+        self.assertEqual([point['date'] for point in result['points']], [
+            date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 1), date(2024, 4, 1),
+        ])
+        january, february, march, april = result['points']
+        # Rent on the 31st, groceries on the 17th, 24th and 31st
+        self.assertEqual(january['expense'], Decimal('1061.50'))
+        self.assertEqual(january['income'], Decimal('0'))
+        # Rent clipped to the 29th, four weekly baskets, income on the 1st
+        self.assertEqual(february['expense'], Decimal('1082.00'))
+        self.assertEqual(february['income'], Decimal('3000'))
+        # Yearly insurance on the 15th
+        self.assertEqual(march['expense'], Decimal('1382.00'))
+        self.assertEqual(april['date'], date(2024, 4, 1))
+        self.assertEqual(result['ending_balance'], april['balance'])
+        self.assertEqual(
+            result['ending_balance'],
+            result['starting_balance'] + result['income'] - result['expense'],
+        )
+
+    def test_daily_matches_monthly(self):
+        today = date(2024, 1, 15)
+        daily = projection.project(self.user, months=12, granularity='daily', today=today)
+        monthly = projection.project(self.user, months=12, today=today)
+        self.assertEqual(len(daily['points']), 366)
+        self.assertEqual(daily['points'][-1]['balance'], monthly['ending_balance'])
+        self.assertEqual(daily['expense'], monthly['expense'])
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/wallets/projection/', {'months': 24})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['starting_balance'], '500.00')
+        self.assertEqual(len(response.data['points']), 25)
+        self.assertEqual(client.get('/api/wallets/projection/', {'months': 500}).status_code, 400)
+        self.assertEqual(client.get('/api/wallets/projection/', {'granularity': 'hourly'}).status_code, 400)
+
+
+class FixedExpensePostingTests(TestCase):
+    """Due fixed expenses become pending transactions exactly once"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.wallet = Wallet.objects.create(user=self.user, name='Courant', type='checking', balance=Decimal('2000'))
+        self.today = timezone.localdate()
+
+    def test_next_due_date(self):
+        expense = FixedExpense.objects.create(user=self.user, name='Loyer', amount=Decimal('800'))
+        self.assertIsNone(expense.next_due_date)
+        expense.wallet = self.wallet
+        expense.start_date = self.today - timedelta(days=3)
+        expense.periodicity = 'weekly'
+        expense.save()
+        self.assertEqual(expense.next_due_date, self.today + timedelta(days=4))
+
+    def test_post_due_occurrences(self):
+        expense = FixedExpense.objects.create(
+            user=self.user, wallet=self.wallet, name='Panier', amount=Decimal('25'),
+            periodicity='weekly', start_date=self.today,
+        )
+        FixedExpense.objects.create(user=self.user, name='Sans portefeuille', amount=Decimal('10'))
+
+        # Two weeks without a tick: three occurrences to catch up
+        later = self.today + timedelta(days=14)
+        self.assertEqual(post_due_fixed_expenses(today=later), 3)
+        self.assertEqual(post_due_fixed_expenses(today=later), 0)
+
+        posted = Transaction.objects.filter(user=self.user).order_by('date')
+        self.assertEqual([timezone.localtime(tx.date).date() for tx in posted], [
+            self.today, self.today + timedelta(days=7), later,
+        ])
+        self.assertTrue(all(tx.status == 'pending' and tx.wallet_id == self.wallet.pk for tx in posted))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('1925'))
+
+        expense.refresh_from_db()
+        self.assertEqual(expense.last_posted_date, later)
+        self.assertEqual(expense.next_due_date, later + timedelta(days=7))
+        # Editing the expense never makes a posted occurrence due again
+        expense.name = 'Panier bio'
+        expense.save()
+        self.assertEqual(expense.next_due_date, later + timedelta(days=7))
+
+    def test_edit_keeps_due_occurrence(self):
+        expense = FixedExpense.objects.create(
+            user=self.user, wallet=self.wallet, name='Loyer', amount=Decimal('800'), start_date=self.today,
+        )
+        # Due two days ago, not posted yet
+        due = self.today - timedelta(days=2)
+        FixedExpense.objects.filter(pk=expense.pk).update(start_date=due, next_due_date=due)
+        expense.refresh_from_db()
+
+        expense.amount = Decimal('850')
+        expense.save()
+        self.assertEqual(expense.next_due_date, due)
+        expense.periodicity = 'weekly'
+        expense.save()
+        self.assertEqual(expense.next_due_date, due)
+
+        self.assertEqual(post_due_fixed_expenses(today=self.today), 1)
+        posted = Transaction.objects.get(user=self.user)
+        self.assertEqual((timezone.localtime(posted.date).date(), posted.amount), (due, Decimal('850')))
+
+    def test_wallet_must_belong_to_user(self):
+        other = create_user('other@monely.test')
+        other_wallet = Wallet.objects.create(user=other, name='Courant', type='checking')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/wallets/fixed-expenses/', {
+            'name': 'Loyer', 'amount': '800', 'wallet': other_wallet.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(EXCHANGE_RATE_PIVOT='EUR', EXCHANGE_RATES_CHECK_INTERVAL=3600)
+class ExchangeRateTests(TestCase):
+    """Aggregates converted into the user's currency"""
+
+    RATES = (
+        'date,base,quote,rate\n'
+        '2024-01-01,EUR,USD,1.10\n'
+        '2024-02-01,EUR,USD,1.25\n'
+        '2024-01-01,EUR,GBP,0.80\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.user.currency = 'EUR'
+        self.user.save()
+        self.load(self.RATES)
+        self.addCleanup(rates.forget_rates_version)
+
+    def load(self, content, suffix='.csv'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8') as handle:
+            handle.write(content)
+            handle.flush()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('load_exchange_rates', handle.name, stdout=StringIO())
+
+    def test_lookup(self):
+        converter = rates.Converter('EUR', date(2024, 1, 15))
+        # Inverted pair, latest rate on or before the date
+        self.assertEqual(converter.convert(Decimal('110'), 'USD'), Decimal('100.00'))
+        self.assertEqual(converter.convert(Decimal('125'), 'USD', date(2024, 3, 1)), Decimal('100.00'))
+        # Crossed through the pivot currency
+        self.assertEqual(rates.Converter('GBP', date(2024, 1, 15)).convert(Decimal('110'), 'USD'), Decimal('80.00'))
+        # Before the first known rate, the earliest one is used
+        self.assertEqual(converter.convert(Decimal('110'), 'USD', date(2023, 6, 1)), Decimal('100.00'))
+        # Unknown currency: counted as is and reported
+        self.assertEqual(converter.convert(Decimal('5'), 'JPY'), Decimal('5'))
+        self.assertEqual(converter.unconverted, {'JPY'})
+
+    def test_memoized_until_reload(self):
+        rates.Converter('EUR', date(2024, 1, 15)).rate('USD')
+        with self.assertNumQueries(0):
+            rates.Converter('EUR', date(2024, 1, 15)).rate('USD')
+        # Reloading updates existing rows and retires memoized rates
+        self.load('[{"base": "EUR", "date": "2024-01-01", "rates": {"USD": "2"}}]', suffix='.json')
+        self.assertEqual(ExchangeRate.objects.count(), 3)
+        self.assertEqual(rates.Converter('EUR', date(2024, 1, 15)).rate('USD'), Decimal('0.5'))
+
+    def test_rates_loaded_by_another_process(self):
+        converter = rates.Converter('EUR', date(2024, 1, 15))
+        self.assertEqual(converter.convert(Decimal('160'), 'JPY'), Decimal('160'))
+        # Written without bumping this process' version, like the load command run elsewhere
+        ExchangeRate.objects.bulk_create([ExchangeRate(base='EUR', quote='JPY', date=date(2024, 1, 1), rate=160)])
+        self.assertEqual(rates.Converter('EUR', date(2024, 1, 15)).convert(Decimal('160'), 'JPY'), Decimal('160'))
+        with self.settings(EXCHANGE_RATES_CHECK_INTERVAL=0):
+            self.assertEqual(rates.Converter('EUR', date(2024, 1, 15)).convert(Decimal('160'), 'JPY'), Decimal('1.00'))
+
+    def test_invalid_file(self):
+        with self.assertRaisesMessage(CommandError, 'Ligne 1'):
+            self.load('date,base,quote,rate\n2024-01-01,EUR,USD,-1\n')
+
+    def test_converted_totals(self):
+        euros = Wallet.objects.create(user=self.user, name='Courant', type='checking', currency='EUR')
+        dollars = Wallet.objects.create(user=self.user, name='US', type='checking', currency='USD')
+        month = timezone.make_aware(datetime(2024, 1, 1))
+        for wallet, amount in ((euros, '100'), (dollars, '220')):
+            Transaction.objects.create(
+                user=self.user, wallet=wallet, name='Salaire', amount=Decimal(amount), type='income',
+                category=category_for(self.user, 'Salaire'), date=month.replace(day=10),
+            )
+
+        totals = services.monthly_totals(self.user, month)
+        self.assertEqual((totals['income'], totals['currency']), (Decimal('300.00'), 'EUR'))
+        # Today's rate for the balances
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/dashboard/')
+        self.assertEqual(response.data['total_balance'], '276.00')
+        self.assertEqual(response.data['unconverted_currencies'], [])
@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WalletViewSet, SavingGoalViewSet, FixedExpenseViewSet
+from .views import (
+    WalletViewSet, SavingGoalViewSet, FixedExpenseViewSet, BudgetViewSet, BudgetAlertViewSet, ProjectionView,
+)
 
 router = DefaultRouter()
 router.register(r'wallets', WalletViewSet, basename='wallet')
 router.register(r'goals', SavingGoalViewSet, basename='saving-goal')
 router.register(r'fixed-expenses', FixedExpenseViewSet, basename='fixed-expense')
+router.register(r'budgets', BudgetViewSet, basename='budget')
+router.register(r'budget-alerts', BudgetAlertViewSet, basename='budget-alert')
 
 urlpatterns = [
+    path('projection/', ProjectionView.as_view(), name='wallet_projection'),
     path('', include(router.urls)),
 ]
@@ -1,14 +1,34 @@
+import copy
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import viewsets, permissions, filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Wallet, SavingGoal, FixedExpense
+from authentication.authentication import full_user
+from core.async_views import AsyncReadView
+from core.cache import CachedReadMixin, cached_response
+from core.sync import collect_tombstones
+from transactions.ledger import LedgerBatch
+from transactions.models import LEDGER_FIELDS, Transaction
+from . import projection
+from .budgets import refresh_budget
+from .models import Wallet, SavingGoal, FixedExpense, Budget, BudgetAlert
 from .serializers import (
     WalletSerializer, WalletCreateSerializer,
     SavingGoalSerializer, SavingGoalCreateSerializer,
-    FixedExpenseSerializer, FixedExpenseCreateSerializer
+    FixedExpenseSerializer, FixedExpenseCreateSerializer,
+    BudgetSerializer, BudgetCreateSerializer, BudgetAlertSerializer,
+    ProjectionSerializer,
 )
 
+MAX_PROJECTION_MONTHS = 120
+
 
-class WalletViewSet(viewsets.ModelViewSet):
+class WalletViewSet(CachedReadMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -22,8 +42,42 @@ class WalletViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        """
+        The wallet's transactions go with it (one INSERT for all their
+        tombstones) and the transfers it received lose their receiver. Both
+        go through the ledger, once the rows are gone so the last dates are
+        recomputed without them, but before the wallet itself.
+        """
+        with transaction.atomic(), collect_tombstones():
+            rows = list(
+                Transaction.objects.select_for_update().only(*LEDGER_FIELDS)
+                .filter(Q(wallet=instance) | Q(receiver_wallet=instance))
+            )
+            kept = []
+            for tx in rows:
+                if tx.wallet_id != instance.pk:
+                    kept.append(copy.copy(tx))
+                    kept[-1].receiver_wallet_id = None
+            Transaction.objects.filter(wallet=instance).delete()
+            Transaction.objects.filter(receiver_wallet=instance).update(
+                receiver_wallet=None, updated_at=timezone.now()
+            )
+            batch = LedgerBatch()
+            batch.remove(rows)
+            batch.add(kept)
+            batch.apply()
+            instance.delete()
+
+
+class AsyncWalletListView(AsyncReadView):
+    """Wallet list of WalletViewSet, served through the async ORM"""
 
-class SavingGoalViewSet(viewsets.ModelViewSet):
+    async def build(self, request):
+        return await self.paginate(request, Wallet.objects.filter(user=request.user), WalletSerializer)
+
+
+class SavingGoalViewSet(CachedReadMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -38,7 +92,7 @@ class SavingGoalViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class FixedExpenseViewSet(viewsets.ModelViewSet):
+class FixedExpenseViewSet(CachedReadMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ['periodicity', 'currency']
@@ -55,3 +109,67 @@ class FixedExpenseViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+class BudgetViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """
+    Budgets with the status of their current period. The list is not
+    paginated: every budget's status comes from one query on the
+    (user, category, period) index.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+    # A budget shows nothing spent once its period is over
+    cache_dated = True
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user).select_related('category')
+
+    def get_serializer_class(self):
+        if self.action in ['create', 'update', 'partial_update']:
+            return BudgetCreateSerializer
+        return BudgetSerializer
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            refresh_budget(serializer.save(user=self.request.user))
+
+    def perform_update(self, serializer):
+        # The category, period, currency or limit may have changed: start over
+        with transaction.atomic():
+            refresh_budget(serializer.save())
+
+
+class BudgetAlertViewSet(CachedReadMixin, viewsets.ReadOnlyModelViewSet):
+    """Thresholds crossed by the budgets, most recent first (`?budget=` to filter)"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BudgetAlertSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['budget', 'threshold']
+
+    def get_queryset(self):
+        return BudgetAlert.objects.filter(user=self.request.user).select_related('budget__category')
+
+
+class ProjectionView(APIView):
+    """
+    Balance forecast from the fixed expenses and the declared income.
+    `?months=` sets the horizon (1 to 120, default 12) and
+    `?granularity=daily|monthly` the resolution of the points.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            raise ValidationError({'months': "Nombre entier attendu."})
+        if not 1 <= months <= MAX_PROJECTION_MONTHS:
+            raise ValidationError({'months': f"Doit être compris entre 1 et {MAX_PROJECTION_MONTHS}."})
+        granularity = request.query_params.get('granularity', 'monthly')
+        if granularity not in projection.GRANULARITIES:
+            raise ValidationError({'granularity': "Valeurs possibles : daily, monthly."})
+
+        return cached_response(request, lambda: Response(ProjectionSerializer(
+            projection.project(full_user(request.user), months=months, granularity=granularity)
+        ).data), dated=True)